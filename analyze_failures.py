@@ -1,19 +1,18 @@
 #!/usr/bin/env python3
 """Analyze failed URLs to find patterns."""
-import pandas as pd
 import re
 from collections import Counter
-from pathlib import Path
+from results_store import RESULTS_DB, load_results, resolve_results_path
 
 def analyze_failures():
     """Analyze failed URLs and find patterns."""
-    excel_file = 'scraped_car_data.xlsx'
+    results_file = resolve_results_path()
     
-    if not Path(excel_file).exists():
-        print(f"ERROR: {excel_file} not found!")
+    if results_file is None:
+        print(f"ERROR: {RESULTS_DB} not found!")
         return
     
-    df = pd.read_excel(excel_file)
+    df = load_results(results_file)
     errors = df[df['error'].notna()].copy()
     success = df[df['error'].isna()].copy()
     
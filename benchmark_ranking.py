@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Benchmark the rank_dealers pipeline (normalize -> fairness -> scoring) on
+synthetic datasets (synthetic_data.py), comparing the vectorized code against
+the original row-wise implementation, (--engines) the installed columnar
+engines on Step 2 and the enrichment join, (--dedup) batch vs streaming
+deduplication and the results store writer, (--near-duplicates) MinHash/LSH
+near-duplicate detection with planted syndicated copies, or (--sensitivity)
+weight-sensitivity scoring over many weight vectors.
+
+Usage: python3 benchmark_ranking.py [--sizes 10000 100000 1000000] [--max-reference-rows 100000] [--memory]
+       python3 benchmark_ranking.py --engines [--sizes 100000 1000000 10000000]
+       python3 benchmark_ranking.py --dedup [--sizes 10000 100000 1000000]
+       python3 benchmark_ranking.py --near-duplicates [--sizes 10000 100000]
+       python3 benchmark_ranking.py --sensitivity 20000 [--sizes 2000 10000]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import pandas as pd
+
+import rank_dealers
+import ranking_engines
+from synthetic_data import RANKING_COLUMNS, make_dealers, make_enrichment, make_listings
+from test_vectorized_scoring import (
+    reference_normalize, reference_pricing_fairness, reference_score_and_rank,
+)
+
+
+def run_vectorized(raw: pd.DataFrame, enrichment: pd.DataFrame) -> pd.DataFrame:
+    df = rank_dealers.normalize_data(raw.copy())
+    stats = rank_dealers.compute_pricing_fairness(df)
+    stats = stats.merge(enrichment, on='dealer_name', how='left')
+    return rank_dealers.score_and_rank(stats)
+
+
+def run_reference(raw: pd.DataFrame, enrichment: pd.DataFrame) -> pd.DataFrame:
+    df = reference_normalize(raw.copy())
+    stats = reference_pricing_fairness(df)
+    stats = stats.merge(enrichment, on='dealer_name', how='left')
+    return reference_score_and_rank(stats)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def run_engine(df: pd.DataFrame, info_df: pd.DataFrame, engine) -> pd.DataFrame:
+    stats = ranking_engines.pricing_fairness(df.copy(), engine)
+    return ranking_engines.join_enrichment(stats, info_df, engine)
+
+
+def make_dataset(n: int, seed: int = 0):
+    """Ranking-shaped raw listings (one dealer per 20 listings) and their enrichment."""
+    dealers = make_dealers(max(10, n // 20), seed=seed)
+    raw = make_listings(n, dealers=dealers, columns=RANKING_COLUMNS, seed=seed)
+    return raw, make_enrichment(dealers, seed=seed)
+
+
+def compare_engines(sizes):
+    """Step 2 + enrichment join per installed engine; each engine's output is checked against pandas."""
+    import contextlib, io
+    names = ranking_engines.available_engines()
+    print(f"{'listings':>10} {'dealers':>8} " + ' '.join(f"{name:>10}" for name in names) + f" {'fastest':>8}")
+    for n in sizes:
+        raw, enrichment = make_dataset(n)
+        with contextlib.redirect_stdout(io.StringIO()):
+            df = rank_dealers.normalize_data(raw)
+        info_df = enrichment.set_index('dealer_name')
+        times, expected = {}, None
+        for name in ['pandas'] + [name for name in names if name != 'pandas']:
+            engine = ranking_engines.get_engine(name)
+            run_engine(df.head(1000), info_df, engine)  # warm up (imports, thread pools)
+            start = time.perf_counter()
+            out = run_engine(df, info_df, engine)
+            times[name] = time.perf_counter() - start
+            if expected is None:
+                expected = out
+            else:
+                pd.testing.assert_frame_equal(out, expected, check_exact=True)
+        fastest = min(times, key=times.get)
+        print(f"{n:>10,} {len(info_df):>8,} " + ' '.join(f"{times[name]:9.2f}s" for name in names) + f" {fastest:>8}")
+
+
+def benchmark_dedup(sizes):
+    """Batch deduplicate_results vs streaming dedup (in memory, and spilled to disk), then
+    results_store.save_results, on rows with 5% re-scrapes and 1% errors."""
+    import contextlib, io
+    from full_scraper import deduplicate_results
+    from results_store import save_results
+    from streaming_dedup import dedupe_frame
+    print(f"{'rows':>10} {'duplicates':>10} {'errors':>8} {'dedup':>8} {'stream':>8} {'on disk':>8} {'kept':>10} {'save':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            rows = make_listings(n, duplicate_rate=0.05, error_rate=0.01,
+                                 missing={'trim': 0.02, 'dealer_address': 0.02})
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                deduped = deduplicate_results(rows)
+                t_dedup = time.perf_counter() - start
+                t_stream = timed(dedupe_frame, rows)
+                t_disk = timed(dedupe_frame, rows, n // 10)  # Spills to disk after 10% of the keys
+            t_save = timed(save_results, deduped, os.path.join(tmp, f'results_{n}.db'))
+            print(f"{n:>10,} {rows['vin'].dropna().duplicated().sum():>10,} {rows['error'].notna().sum():>8,} "
+                  f"{t_dedup:7.2f}s {t_stream:7.2f}s {t_disk:7.2f}s {len(deduped):>10,} {t_save:7.2f}s")
+
+
+def benchmark_near_duplicates(sizes):
+    """near_duplicates.find_near_duplicates on listings with 2% syndicated copies: time, matches and recall."""
+    from near_duplicates import find_near_duplicates
+    from synthetic_data import make_syndicated_copies
+    print(f"{'rows':>10} {'planted':>8} {'matched':>8} {'recall':>7} {'time':>8}")
+    for n in sizes:
+        dealers = make_dealers(max(10, n // 20), seed=n)
+        listings = make_listings(n, dealers=dealers, seed=n)
+        copies = make_syndicated_copies(listings, dealers, rate=0.02, seed=n)
+        rows = pd.concat([listings, copies], ignore_index=True)
+        start = time.perf_counter()
+        pairs = find_near_duplicates(rows)
+        elapsed = time.perf_counter() - start
+        planted = set(zip(copies.index, range(n, len(rows))))
+        recall = len(planted & set(zip(pairs['left'], pairs['right']))) / max(1, len(planted))
+        print(f"{len(rows):>10,} {len(planted):>8,} {len(pairs):>8,} {recall:7.1%} {elapsed:7.2f}s")
+
+
+def benchmark_vins(sizes):
+    """vin_decoder: vectorized check-digit validation and full decode vs is_valid_vin row by row."""
+    from vin_decoder import decode_vins, is_valid_vin, valid_vins
+    print(f"{'VINs':>10} {'validate':>10} {'decode':>10} {'row-wise':>10} {'speedup':>8}")
+    for n in sizes:
+        vins = make_listings(n, seed=n)['vin']
+        validate, decode = timed(valid_vins, vins), timed(decode_vins, vins)
+        row_wise = timed(lambda: [is_valid_vin(v) for v in vins])
+        print(f"{len(vins):>10,} {validate:9.2f}s {decode:9.2f}s {row_wise:9.2f}s {row_wise / validate:7.1f}x")
+
+
+def benchmark_sensitivity(sizes, vectors):
+    """weight_sensitivity: rank stability of the scored dealers under `vectors` random weight vectors."""
+    import contextlib, io
+    print(f"{'listings':>10} {'dealers':>8} {'vectors':>8} {'time':>8}")
+    for n in sizes:
+        raw, enrichment = make_dataset(n)
+        with contextlib.redirect_stdout(io.StringIO()):
+            ranked = run_vectorized(raw, enrichment)
+        weights = rank_dealers.sample_weight_vectors(vectors)
+        elapsed = timed(rank_dealers.weight_sensitivity, ranked, weights)
+        print(f"{n:>10,} {len(ranked):>8,} {len(weights):>8,} {elapsed:7.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        help='Listings per dataset (default 10000 100000 1000000; 2000 10000 with --sensitivity)')
+    parser.add_argument('--max-reference-rows', type=int, default=100_000,
+                        help='Skip the row-wise reference above this many listings')
+    parser.add_argument('--memory', action='store_true',
+                        help='Print the per-column memory report (untyped vs compact dtypes) for the largest size')
+    parser.add_argument('--engines', action='store_true',
+                        help='Compare the installed columnar engines (pandas/Polars/DuckDB) on Step 2 and the enrichment join')
+    parser.add_argument('--dedup', action='store_true',
+                        help='Time batch vs streaming dedup and save_results on full scraper-shaped rows')
+    parser.add_argument('--near-duplicates', action='store_true',
+                        help='Time near-duplicate detection and its recall of planted syndicated copies')
+    parser.add_argument('--vins', action='store_true',
+                        help='Time vectorized VIN validation/decoding against the per-VIN check')
+    parser.add_argument('--sensitivity', type=int, metavar='VECTORS',
+                        help='Time weight-sensitivity scoring with this many random weight vectors')
+    args = parser.parse_args()
+
+    if args.sensitivity:
+        # Its rank histogram is dealers x dealers, so the defaults stay at a few hundred dealers
+        benchmark_sensitivity(args.sizes or [2_000, 10_000], args.sensitivity)
+        return
+    args.sizes = args.sizes or [10_000, 100_000, 1_000_000]
+
+    if args.engines:
+        compare_engines(args.sizes)
+        return
+    if args.dedup:
+        benchmark_dedup(args.sizes)
+        return
+    if args.near_duplicates:
+        benchmark_near_duplicates(args.sizes)
+        return
+    if args.vins:
+        benchmark_vins(args.sizes)
+        return
+
+    # The pipeline prints progress; keep the benchmark table readable
+    import contextlib, io
+
+    print(f"{'listings':>10} {'dealers':>8} {'vectorized':>12} {'row-wise':>12} {'speedup':>8}")
+    for n in args.sizes:
+        raw, enrichment = make_dataset(n)
+        with contextlib.redirect_stdout(io.StringIO()):
+            t_vec = timed(run_vectorized, raw, enrichment)
+            t_ref = timed(run_reference, raw, enrichment) if n <= args.max_reference_rows else None
+        ref_text = f"{t_ref:11.2f}s" if t_ref is not None else f"{'skipped':>12}"
+        speedup = f"{t_ref / t_vec:7.1f}x" if t_ref is not None else f"{'-':>8}"
+        print(f"{n:>10,} {enrichment.shape[0]:>8,} {t_vec:11.2f}s {ref_text} {speedup}")
+
+    if args.memory:
+        # What the pipeline held before compact dtypes: reference normalization (object strings, float64)
+        with contextlib.redirect_stdout(io.StringIO()):
+            before = reference_normalize(raw.copy())
+            after = rank_dealers.normalize_data(raw.copy())
+        print(f"\nMemory at {len(raw):,} listings (MB):")
+        print(rank_dealers.memory_report(before, after).round(2).to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,13 @@
 #!/usr/bin/env python3
 """Check if scraper output exists."""
-from pathlib import Path
-import pandas as pd
+from results_store import load_results, resolve_results_path
 
-f = Path('scraped_car_data.xlsx')
+f = resolve_results_path()
 print('=== SCRAPER RESULTS ===')
-print(f'Output file exists: {f.exists()}')
+print(f'Output file exists: {f is not None}' + (f' ({f})' if f else ''))
 
-if f.exists():
-    df = pd.read_excel(f)
+if f:
+    df = load_results(f)
     print(f'Total records: {len(df)}')
     print(f'Columns: {len(df.columns)}')
     print(f'\nFirst 3 records:')
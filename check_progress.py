@@ -5,19 +5,20 @@ import pandas as pd
 from pathlib import Path
 from collections import Counter
 import re
+from results_store import load_results, resolve_results_path
 
 def check_progress():
     """Check scraper progress from checkpoint or output file."""
     checkpoint_file = 'scraping_checkpoint.json'
-    output_file = 'scraped_car_data.xlsx'
+    output_file = resolve_results_path()
     
     # Check if output file exists
-    if Path(output_file).exists():
+    if output_file is not None:
         print("="*80)
         print("ANALYZING COMPLETED SCRAPE - FAILURE PATTERNS")
         print("="*80)
         
-        df = pd.read_excel(output_file)
+        df = load_results(output_file)
         errors = df[df['error'].notna()].copy()
         success = df[df['error'].isna()].copy()
         
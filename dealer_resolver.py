@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Dealer entity resolution: collapse name variants ("Honda of New Rochelle",
+"New Rochelle Honda", "HONDA OF NEW ROCHELLE, INC.") to one canonical dealer
+before pricing fairness and Google enrichment.
+- Token normalization (case, punctuation, legal suffixes, word order)
+- Blocking on brand + town tokens; fuzzy similarity only within a brand
+- Persisted alias table (dealer_aliases in dealer_enrichment.db) so the
+  canonical name is stable across runs; manual aliases always win
+
+Usage: python3 dealer_resolver.py [--list] [--alias VARIANT CANONICAL]
+"""
+
+import argparse
+import re
+import sqlite3
+import pandas as pd
+from datetime import datetime
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, Optional, Tuple
+
+from enrichment_cache import ENRICHMENT_DB
+
+BRANDS = [
+    'honda', 'toyota', 'nissan', 'mazda', 'subaru', 'ford', 'chevrolet', 'hyundai', 'kia', 'bmw',
+    'mercedes', 'audi', 'lexus', 'acura', 'infiniti', 'volvo', 'jeep', 'ram', 'dodge', 'chrysler',
+    'buick', 'cadillac', 'gmc', 'lincoln', 'genesis', 'volkswagen',
+]
+# Words that never distinguish two dealerships
+STOP_WORDS = {'of', 'the', 'at', 'and', 'inc', 'llc', 'co', 'corp', 'ltd', 'dealer', 'dealership'}
+FUZZY_THRESHOLD = 0.9  # SequenceMatcher ratio on normalized names (catches typos, not different towns)
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+
+def name_tokens(name: str) -> Tuple[str, ...]:
+    """Sorted, de-duplicated tokens without stop words (word order doesn't matter)."""
+    tokens = TOKEN_PATTERN.findall(str(name).lower().replace('&', ' and '))
+    return tuple(sorted(set(t for t in tokens if t not in STOP_WORDS)))
+
+
+def blocking_key(tokens: Tuple[str, ...]) -> Tuple[str, str]:
+    """(brand, town/other tokens). Names without a known brand block on their first token."""
+    brand = next((t for t in tokens if t in BRANDS), None)
+    rest = ' '.join(t for t in tokens if t != brand)
+    return brand or (tokens[0] if tokens else ''), rest
+
+
+class DealerResolver:
+    """Maps raw dealer names to canonical dealers, persisting every decision."""
+
+    def __init__(self, path: str = ENRICHMENT_DB):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS dealer_aliases (
+                alias TEXT PRIMARY KEY,
+                canonical TEXT NOT NULL,
+                method TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    def aliases(self) -> Dict[str, Tuple[str, str]]:
+        return {alias: (canonical, method) for alias, canonical, method in
+                self.conn.execute("SELECT alias, canonical, method FROM dealer_aliases")}
+
+    def add_alias(self, alias: str, canonical: str, method: str = 'manual'):
+        self.conn.execute(
+            """
+            INSERT INTO dealer_aliases (alias, canonical, method, created_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT(alias) DO UPDATE SET
+                canonical = excluded.canonical, method = excluded.method, created_at = excluded.created_at
+            """,
+            (alias, canonical, method, datetime.now().isoformat())
+        )
+        if method == 'manual':
+            # Renaming a canonical dealer moves its automatically resolved variants along with it
+            self.conn.execute(
+                "UPDATE dealer_aliases SET canonical = ? WHERE canonical = ? AND method != 'manual'",
+                (canonical, alias)
+            )
+        self.conn.commit()
+
+    def resolve(self, names: Iterable[str], counts: Optional[Dict[str, int]] = None) -> Dict[str, str]:
+        """{raw name: canonical name}. New variants join an existing dealer when they match one.
+
+        `counts` (listings per raw name) picks the most common variant as the canonical name
+        for a brand-new dealer.
+        """
+        names = [n for n in dict.fromkeys(names) if isinstance(n, str) and n.strip()]
+        unresolvable = [n for n in names if not name_tokens(n)]
+        names = [n for n in names if n not in unresolvable]
+        counts = counts or {}
+        known = self.aliases()
+
+        # Group: every known alias and new name, keyed by blocking key
+        canonical_of = {alias: canonical for alias, (canonical, _) in known.items()}
+        pending = [n for n in names if n not in canonical_of]
+        blocks: Dict[Tuple[str, str], list] = {}
+        for name in list(canonical_of) + pending:
+            blocks.setdefault(blocking_key(name_tokens(name)), []).append(name)
+
+        by_brand: Dict[str, list] = {}
+        for key in blocks:
+            by_brand.setdefault(key[0], []).append(key)
+
+        # Union-find over blocking keys: exact key = same dealer; fuzzy match within a brand
+        parent = {key: key for key in blocks}
+
+        def find(key):
+            while parent[key] != key:
+                parent[key] = parent[parent[key]]
+                key = parent[key]
+            return key
+
+        for brand, keys in by_brand.items():
+            for i, a in enumerate(keys):
+                for b in keys[i + 1:]:
+                    if a[1] and b[1] and SequenceMatcher(None, a[1], b[1]).ratio() >= FUZZY_THRESHOLD:
+                        parent[find(b)] = find(a)
+
+        clusters: Dict[Tuple[str, str], list] = {}
+        for key, members in blocks.items():
+            clusters.setdefault(find(key), []).extend(members)
+
+        for members in clusters.values():
+            new = [m for m in members if m not in canonical_of]
+            if not new:
+                continue
+            existing = [canonical_of[m] for m in members if m in canonical_of]
+            if existing:
+                # Manual decisions first, then the most common existing canonical
+                manual = [canonical_of[m] for m in members if known.get(m, ('', ''))[1] == 'manual']
+                canonical = (manual or [max(set(existing), key=existing.count)])[0]
+            else:
+                canonical = max(new, key=lambda n: (counts.get(n, 0), -len(n), n))
+            for name in new:
+                method = 'canonical' if name == canonical else 'resolved'
+                self.add_alias(name, canonical, method)
+                canonical_of[name] = canonical
+
+        resolved = {name: canonical_of[name] for name in names}
+        resolved.update((name, name) for name in unresolvable)
+        return resolved
+
+    def apply(self, df: pd.DataFrame, column: str = 'dealer_name') -> pd.DataFrame:
+        """Replace dealer names with canonical names (only unique names are resolved)."""
+        counts = df[column].value_counts().to_dict()
+        mapping = self.resolve(counts.keys(), counts)
+        merged = {name: canonical for name, canonical in mapping.items() if name != canonical}
+        if merged:
+            print(f"Resolved {len(merged)} dealer name variants "
+                  f"({df[column].nunique()} names -> {len(set(mapping.values()))} dealers)")
+            for name, canonical in sorted(merged.items()):
+                print(f"  {name} -> {canonical}")
+        df = df.copy()
+        names = df[column]
+        df[column] = names.map(mapping).fillna(names)
+        if isinstance(names.dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype('category')  # Keep the compact dtype from load
+        return df
+
+    def close(self):
+        self.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Dealer alias table')
+    parser.add_argument('--db', default=ENRICHMENT_DB)
+    parser.add_argument('--list', action='store_true', help='Show all aliases that differ from their canonical name')
+    parser.add_argument('--alias', nargs=2, metavar=('VARIANT', 'CANONICAL'), help='Add/override an alias')
+    args = parser.parse_args()
+
+    resolver = DealerResolver(args.db)
+    if args.alias:
+        resolver.add_alias(args.alias[0], args.alias[1], 'manual')
+        print(f"✓ {args.alias[0]} -> {args.alias[1]}")
+    if args.list or not args.alias:
+        for alias, (canonical, method) in sorted(resolver.aliases().items()):
+            if alias != canonical:
+                print(f"{alias} -> {canonical} ({method})")
+    resolver.close()
+
+
+if __name__ == '__main__':
+    main()
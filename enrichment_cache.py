@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+SQLite-backed dealer enrichment cache (replaces dealer_info_cache.json).
+Each dealer field (address, rating, distance, ...) is stored as its own row
+with a fetched-at timestamp and TTL, so a run only refetches stale fields.
+Failed lookups are cached too and retried with exponential backoff.
+"""
+
+import sqlite3
+import json
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+ENRICHMENT_DB = 'dealer_enrichment.db'
+LEGACY_CACHE_FILE = 'dealer_info_cache.json'
+
+# How long a successfully fetched value stays fresh
+FIELD_TTL_DAYS = {
+    'address': 180,
+    'rating': 30,
+    'review_count': 30,
+    'distance_miles': 180,
+    'driving_time_minutes': 180,
+}
+EXCLUSION_TTL_DAYS = 180
+
+# Negative caching: retry a failed lookup after BASE * 2^(attempts-1) hours, capped
+NEGATIVE_BACKOFF_BASE_HOURS = 6
+NEGATIVE_BACKOFF_MAX_HOURS = 24 * 14
+
+ENRICHMENT_FIELDS = list(FIELD_TTL_DAYS)
+
+
+class EnrichmentCache:
+    """Per-field dealer enrichment cache with TTLs and negative caching."""
+
+    def __init__(self, path: str = ENRICHMENT_DB):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS dealer_fields (
+                dealer_name TEXT NOT NULL,
+                field TEXT NOT NULL,
+                value TEXT,
+                status TEXT NOT NULL,
+                fetched_at TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_retry_at TEXT,
+                PRIMARY KEY (dealer_name, field)
+            );
+            CREATE TABLE IF NOT EXISTS dealer_exclusions (
+                dealer_name TEXT PRIMARY KEY,
+                reason TEXT,
+                excluded_at TEXT NOT NULL
+            );
+        """)
+        self.conn.commit()
+
+    # --- Reads ---
+
+    def get(self, dealer_name: str) -> Dict:
+        """All known values for a dealer (stale values included)."""
+        rows = self.conn.execute(
+            "SELECT field, value FROM dealer_fields WHERE dealer_name = ? AND value IS NOT NULL",
+            (dealer_name,)
+        ).fetchall()
+        return {field: json.loads(value) for field, value in rows}
+
+    def stale_fields(self, dealer_name: str, fields: Iterable[str] = ENRICHMENT_FIELDS) -> Set[str]:
+        """Fields that need a lookup: never fetched, expired, or a failed lookup due for retry."""
+        now = datetime.now()
+        rows = {
+            field: (status, fetched_at, next_retry_at)
+            for field, status, fetched_at, next_retry_at in self.conn.execute(
+                "SELECT field, status, fetched_at, next_retry_at FROM dealer_fields WHERE dealer_name = ?",
+                (dealer_name,)
+            )
+        }
+        stale = set()
+        for field in fields:
+            row = rows.get(field)
+            if row is None:
+                stale.add(field)
+                continue
+            status, fetched_at, next_retry_at = row
+            if status == 'ok':
+                ttl = timedelta(days=FIELD_TTL_DAYS.get(field, 30))
+                if now - datetime.fromisoformat(fetched_at) >= ttl:
+                    stale.add(field)
+            elif next_retry_at is None or now >= datetime.fromisoformat(next_retry_at):
+                stale.add(field)
+        return stale
+
+    def dealers(self) -> list:
+        """Every dealer with at least one cached field."""
+        return [name for (name,) in self.conn.execute("SELECT DISTINCT dealer_name FROM dealer_fields")]
+
+    def is_excluded(self, dealer_name: str) -> bool:
+        row = self.conn.execute(
+            "SELECT excluded_at FROM dealer_exclusions WHERE dealer_name = ?", (dealer_name,)
+        ).fetchone()
+        if not row:
+            return False
+        return datetime.now() - datetime.fromisoformat(row[0]) < timedelta(days=EXCLUSION_TTL_DAYS)
+
+    def exclusion_reason(self, dealer_name: str) -> Optional[str]:
+        """Why the dealer is excluded (None if it isn't, or the exclusion expired)."""
+        if not self.is_excluded(dealer_name):
+            return None
+        return self.conn.execute(
+            "SELECT reason FROM dealer_exclusions WHERE dealer_name = ?", (dealer_name,)
+        ).fetchone()[0]
+
+    def snapshot(self, dealer_names: Iterable[str]) -> Dict[str, Optional[Dict]]:
+        """Old dealer_info shape: {dealer: None if excluded else {field: value}}."""
+        return {
+            name: None if self.is_excluded(name) else self.get(name)
+            for name in dealer_names
+        }
+
+    # --- Writes (single-row upserts) ---
+
+    def put(self, dealer_name: str, field: str, value):
+        """Record a lookup result. None is cached as a miss with backoff; the old value is kept."""
+        now = datetime.now()
+        if value is None:
+            row = self.conn.execute(
+                "SELECT attempts, status FROM dealer_fields WHERE dealer_name = ? AND field = ?",
+                (dealer_name, field)
+            ).fetchone()
+            attempts = (row[0] if row and row[1] == 'missing' else 0) + 1
+            backoff = min(NEGATIVE_BACKOFF_BASE_HOURS * 2 ** (attempts - 1), NEGATIVE_BACKOFF_MAX_HOURS)
+            self.conn.execute(
+                """
+                INSERT INTO dealer_fields (dealer_name, field, value, status, fetched_at, attempts, next_retry_at)
+                VALUES (?, ?, NULL, 'missing', ?, ?, ?)
+                ON CONFLICT(dealer_name, field) DO UPDATE SET
+                    status = 'missing',
+                    fetched_at = excluded.fetched_at,
+                    attempts = excluded.attempts,
+                    next_retry_at = excluded.next_retry_at
+                """,
+                (dealer_name, field, now.isoformat(), attempts, (now + timedelta(hours=backoff)).isoformat())
+            )
+        else:
+            self.conn.execute(
+                """
+                INSERT INTO dealer_fields (dealer_name, field, value, status, fetched_at, attempts, next_retry_at)
+                VALUES (?, ?, ?, 'ok', ?, 0, NULL)
+                ON CONFLICT(dealer_name, field) DO UPDATE SET
+                    value = excluded.value,
+                    status = 'ok',
+                    fetched_at = excluded.fetched_at,
+                    attempts = 0,
+                    next_retry_at = NULL
+                """,
+                (dealer_name, field, json.dumps(value), now.isoformat())
+            )
+        self.conn.commit()
+
+    def put_many(self, values: Iterable[Tuple[str, str, object]]):
+        """Record many successful lookups (dealer_name, field, value) in one transaction."""
+        now = datetime.now().isoformat()
+        self.conn.executemany(
+            """
+            INSERT INTO dealer_fields (dealer_name, field, value, status, fetched_at, attempts, next_retry_at)
+            VALUES (?, ?, ?, 'ok', ?, 0, NULL)
+            ON CONFLICT(dealer_name, field) DO UPDATE SET
+                value = excluded.value,
+                status = 'ok',
+                fetched_at = excluded.fetched_at,
+                attempts = 0,
+                next_retry_at = NULL
+            """,
+            ((dealer_name, field, json.dumps(value), now) for dealer_name, field, value in values)
+        )
+        self.conn.commit()
+
+    def invalidate(self, dealer_name: str, fields: Iterable[str]):
+        """Forget fields so the next run looks them up again (e.g. distance after an address change)."""
+        fields = list(fields)
+        self.conn.execute(
+            f"DELETE FROM dealer_fields WHERE dealer_name = ? AND field IN ({', '.join('?' * len(fields))})",
+            (dealer_name, *fields)
+        )
+        self.conn.commit()
+
+    def exclude(self, dealer_name: str, reason: str):
+        self.conn.execute(
+            """
+            INSERT INTO dealer_exclusions (dealer_name, reason, excluded_at) VALUES (?, ?, ?)
+            ON CONFLICT(dealer_name) DO UPDATE SET reason = excluded.reason, excluded_at = excluded.excluded_at
+            """,
+            (dealer_name, reason, datetime.now().isoformat())
+        )
+        self.conn.commit()
+
+    def unexclude(self, dealer_name: str):
+        self.conn.execute("DELETE FROM dealer_exclusions WHERE dealer_name = ?", (dealer_name,))
+        self.conn.commit()
+
+    def migrate_json(self, json_path: str = LEGACY_CACHE_FILE) -> int:
+        """One-time import of the old dealer_info_cache.json. Returns dealers imported."""
+        if not Path(json_path).exists():
+            return 0
+        if self.conn.execute("SELECT 1 FROM dealer_fields LIMIT 1").fetchone():
+            return 0
+        if self.conn.execute("SELECT 1 FROM dealer_exclusions LIMIT 1").fetchone():
+            return 0
+        with open(json_path, 'r') as f:
+            legacy = json.load(f)
+        for dealer_name, info in legacy.items():
+            if info is None:
+                self.exclude(dealer_name, 'migrated from dealer_info_cache.json')
+                continue
+            for field in ENRICHMENT_FIELDS:
+                value = info.get(field)
+                if value is not None:
+                    self.put(dealer_name, field, value)
+        return len(legacy)
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Cost-based planning for dealer enrichment.
+- Records each lookup's wall time and outcome per (step, variant) in dealer_enrichment.db
+- Orders query variants (e.g. Maps query phrasings vs Google Search) by expected seconds per success
+- Orders enrichment steps so exclusion-capable checks run first, cheapest first
+"""
+
+import contextlib
+import sqlite3
+import time
+from typing import List, Tuple
+
+from enrichment_cache import ENRICHMENT_DB
+
+# Expected seconds per dealer before anything has been measured
+STEP_COST_PRIORS = {
+    'exclude_address': 0.0,
+    'straight_line': 0.001,
+    'road_graph': 0.05,
+    'maps_distance': 10.0,
+    'reviews': 12.0,
+}
+DEFAULT_COST_SECONDS = 10.0
+PRIOR_ATTEMPTS = 2  # Smoothing: unmeasured variants count as 1 success in 2 tries at the prior cost
+
+
+class EnrichmentPlanner:
+    """Lookup cost/success statistics and the ordering decisions built on them."""
+
+    def __init__(self, path: str = ENRICHMENT_DB):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS lookup_stats (
+                step TEXT NOT NULL,
+                variant TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                successes INTEGER NOT NULL DEFAULT 0,
+                total_seconds REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (step, variant)
+            )
+        """)
+        self.conn.commit()
+
+    def record(self, step: str, variant: str, seconds: float, successes, attempts: int = 1):
+        """Add `attempts` lookups taking `seconds` in total, `successes` of which found what was needed."""
+        self.conn.execute(
+            """
+            INSERT INTO lookup_stats (step, variant, attempts, successes, total_seconds) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(step, variant) DO UPDATE SET
+                attempts = attempts + excluded.attempts,
+                successes = successes + excluded.successes,
+                total_seconds = total_seconds + excluded.total_seconds
+            """,
+            (step, variant, attempts, int(successes), seconds)
+        )
+        self.conn.commit()
+
+    @contextlib.contextmanager
+    def timed(self, step: str, variant: str = ''):
+        """Time one lookup; set outcome['success'] inside the block."""
+        outcome = {'success': False}
+        start = time.perf_counter()
+        try:
+            yield outcome
+        finally:
+            self.record(step, variant, time.perf_counter() - start, outcome['success'])
+
+    def expected_cost(self, step: str, variant: str = '') -> float:
+        """Smoothed mean seconds per attempt divided by smoothed success rate."""
+        row = self.conn.execute(
+            "SELECT attempts, successes, total_seconds FROM lookup_stats WHERE step = ? AND variant = ?",
+            (step, variant)
+        ).fetchone()
+        attempts, successes, total_seconds = row or (0, 0, 0.0)
+        prior_cost = STEP_COST_PRIORS.get(step, DEFAULT_COST_SECONDS)
+        mean_cost = (total_seconds + prior_cost * PRIOR_ATTEMPTS) / (attempts + PRIOR_ATTEMPTS)
+        success_rate = (successes + PRIOR_ATTEMPTS / 2) / (attempts + PRIOR_ATTEMPTS)
+        return mean_cost / success_rate
+
+    def order_variants(self, step: str, variants: List[str]) -> List[str]:
+        """Cheapest expected cost per success first (ties keep the given order)."""
+        return sorted(variants, key=lambda v: self.expected_cost(step, v))
+
+    def order_steps(self, steps: List[Tuple[str, bool]]) -> List[str]:
+        """[(step, can_exclude)] -> step names: exclusion-capable steps first, each group cheapest first."""
+        return [name for name, can_exclude in
+                sorted(steps, key=lambda s: (not s[1], self.expected_cost(s[0])))]
+
+    def report(self):
+        rows = self.conn.execute(
+            "SELECT step, variant, attempts, successes, total_seconds FROM lookup_stats ORDER BY step, variant"
+        ).fetchall()
+        if not rows:
+            return
+        print(f"\n{'step':<16} {'variant':<20} {'tries':>6} {'success':>8} {'avg s':>7}")
+        for step, variant, attempts, successes, total_seconds in rows:
+            print(f"{step:<16} {variant or '-':<20} {attempts:>6} {successes / attempts:>7.0%} "
+                  f"{total_seconds / attempts:>7.2f}")
+
+    def close(self):
+        self.conn.close()
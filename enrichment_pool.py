@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Bounded pool of Playwright pages with per-endpoint rate limits.
+Used by rank_dealers to enrich several dealers concurrently without
+hammering Google Maps / Google Search, plus request coalescing (SingleFlight)
+so dealers sharing an address or query trigger one lookup.
+"""
+
+import asyncio
+import contextlib
+from typing import Dict
+
+
+class RateLimiter:
+    """Allow at most one request per `min_interval` seconds (async, FIFO)."""
+
+    def __init__(self, min_interval: float):
+        self.min_interval = min_interval
+        self._lock = asyncio.Lock()
+        self._next_slot = 0.0
+
+    async def wait(self):
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            now = loop.time()
+            delay = self._next_slot - now
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next_slot = max(now, self._next_slot) + self.min_interval
+
+
+class PagePool:
+    """Fixed number of reusable pages; each checkout waits on the endpoint's rate limiter."""
+
+    def __init__(self, context, size: int, rate_limits: Dict[str, float]):
+        self.context = context
+        self.size = size
+        self.limiters = {name: RateLimiter(interval) for name, interval in rate_limits.items()}
+        self._pages = asyncio.Queue()
+
+    async def start(self):
+        for _ in range(self.size):
+            await self._pages.put(await self.context.new_page())
+        return self
+
+    @contextlib.asynccontextmanager
+    async def page(self, endpoint: str):
+        """Check out a page for one request to `endpoint` ('maps', 'search', ...)."""
+        page = await self._pages.get()
+        try:
+            limiter = self.limiters.get(endpoint)
+            if limiter:
+                await limiter.wait()
+            yield page
+        except Exception:
+            # A failed navigation can leave the page in a bad state - replace it
+            with contextlib.suppress(Exception):
+                await page.close()
+            page = await self.context.new_page()
+            raise
+        finally:
+            await self._pages.put(page)
+
+    async def close(self):
+        while not self._pages.empty():
+            page = self._pages.get_nowait()
+            with contextlib.suppress(Exception):
+                await page.close()
+
+
+class SingleFlight:
+    """Coalesce lookups by key: concurrent callers share one in-flight call, later ones get its result.
+
+    Failed calls aren't cached (the next caller retries). `results` can be pre-filled with
+    answers known from an earlier run.
+    """
+
+    def __init__(self, results: Dict = None):
+        self._results = dict(results or {})
+        self._inflight = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key, fn):
+        """Result of `await fn()` for `key`, running it at most once at a time."""
+        if key in self._results:
+            self.coalesced += 1
+            return self._results[key]
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return await asyncio.shield(task)
+
+        self.calls += 1
+        task = asyncio.ensure_future(fn())
+        self._inflight[key] = task
+        try:
+            result = await asyncio.shield(task)
+        finally:
+            self._inflight.pop(key, None)
+        self._results[key] = result
+        return result
@@ -12,23 +12,83 @@ from datetime import datetime
 from pathlib import Path
 import json
 import time
+from listing_cache import ListingCache, vin_from_url, compute_probe
+from price_history import record_and_diff
+from results_store import RESULTS_DB, save_results, export_excel
+from streaming_dedup import StreamingDeduplicator
+from vin_decoder import decode_vin, find_vin, is_valid_vin
 
 # Global variable for URL to source mapping (used in scrape_urls_batch)
 urls_to_source = {}
 
 # Configuration
 SESSION_FILE = 'truecar_session.json'
-OUTPUT_FILE = 'scraped_car_data.xlsx'
+OUTPUT_FILE = 'scraped_car_data.xlsx'  # Excel export only - results are read from RESULTS_DB
 CHECKPOINT_FILE = 'scraping_checkpoint.json'
 CHECKPOINT_INTERVAL = 10  # Save progress every N URLs
+LISTING_CACHE_FILE = 'listing_cache.db'  # Cross-run listing cache keyed by VIN
+LISTING_CACHE_TTL_HOURS = 24  # Reuse cached listings without loading the page for this long
 
 # Rate limiting
 DELAY_BETWEEN_REQUESTS = 2.0  # seconds (increased to reduce load)
 CONCURRENT_BROWSERS = 2  # Number of concurrent browser instances (reduced to prevent memory issues)
 
 
-async def scrape_car_page(page, url):
-    """Scrape a single TrueCar car listing page."""
+# Dealer location in the VDP's embedded JSON (same fields scraper.py reads)
+DEALER_ADDRESS1_PATTERN = re.compile(r'"address1"\s*:\s*"([^"]+)"')
+DEALER_CITY_PATTERN = re.compile(r'"city"\s*:\s*"([^"]+)"')
+DEALER_STATE_PATTERN = re.compile(r'"state"\s*:\s*"([A-Za-z]{2})"')
+DEALER_ZIP_PATTERN = re.compile(r'"(?:zip|postalCode|zipCode)"\s*:\s*"?(\d{5})')
+DEALER_ID_PATTERN = re.compile(r'"(?:dealerId|dealershipId|dealer_id)"\s*:\s*"?([A-Za-z0-9-]+)"?')
+# Fallback: street address in the page text ("123 Main St, White Plains, NY 10601")
+STREET_ADDRESS_PATTERN = re.compile(
+    r'(\d+\s+[A-Za-z0-9\s]+(?:Avenue|Ave|Street|St|Road|Rd|Boulevard|Blvd|Drive|Dr|Lane|Ln|Court|Ct|Way|Parkway|Pkwy|Turnpike|Tpke|Highway|Hwy)\.?),'
+    r'\s*([A-Za-z\s]+),\s*([A-Z]{2})(?:\s+(\d{5}))?'
+)
+
+
+def extract_dealer_location(content, page_text):
+    """Dealer address, city, state, ZIP and ID from the VDP (JSON first, then page text)."""
+    location = {'dealer_address': None, 'dealer_city': None, 'dealer_state': None,
+                'dealer_zip': None, 'dealer_id': None}
+    
+    address_match = DEALER_ADDRESS1_PATTERN.search(content or '')
+    if address_match:
+        # city/state/zip belong to the same JSON object - only look just after address1
+        window = content[address_match.end():address_match.end() + 500]
+        city = DEALER_CITY_PATTERN.search(window)
+        state = DEALER_STATE_PATTERN.search(window)
+        zip_code = DEALER_ZIP_PATTERN.search(window)
+        location['dealer_city'] = city.group(1).strip() if city else None
+        location['dealer_state'] = state.group(1).upper() if state else None
+        location['dealer_zip'] = zip_code.group(1) if zip_code else None
+        street = address_match.group(1).strip()
+    else:
+        street = None
+        text_match = STREET_ADDRESS_PATTERN.search(page_text or '')
+        if text_match:
+            street = text_match.group(1).strip()
+            location['dealer_city'] = text_match.group(2).strip()
+            location['dealer_state'] = text_match.group(3)
+            location['dealer_zip'] = text_match.group(4)
+    
+    if street:
+        # "street, City, ST 12345" - same shape as the Google Maps addresses in the enrichment cache
+        city_state = ', '.join(p for p in [location['dealer_city'], location['dealer_state']] if p)
+        tail = ' '.join(p for p in [city_state, location['dealer_zip']] if p)
+        location['dealer_address'] = ', '.join(p for p in [street, tail] if p)
+    
+    dealer_id = DEALER_ID_PATTERN.search(content or '')
+    location['dealer_id'] = dealer_id.group(1) if dealer_id else None
+    return location
+
+
+async def scrape_car_page(page, url, cached=None):
+    """Scrape a single TrueCar car listing page.
+
+    If `cached` (a listing cache entry) is given and the pricing probe matches,
+    the cached extraction is returned instead of running the full extraction.
+    """
     try:
         # Use domcontentloaded instead of networkidle (faster, less strict)
         # Increased timeout and wait time for better reliability
@@ -45,6 +105,19 @@ async def scrape_car_page(page, url):
             page_text = await page.inner_text('body')
             content = await page.content()
         
+        # Freshness probe - if pricing is unchanged since the cached scrape, reuse it
+        probe = compute_probe(page_text)
+        if cached and probe and cached.get('probe') == probe:
+            result = dict(cached['result'])
+            result.update({
+                'url': url,
+                'scrape_timestamp': datetime.now().isoformat(),
+                'error': None,
+                'page_probe': probe,
+                'cache_status': 'unchanged',
+            })
+            return result
+        
         result = {
             'url': url,
             'scrape_timestamp': datetime.now().isoformat(),
@@ -52,10 +125,9 @@ async def scrape_car_page(page, url):
         }
         
         # Extract vehicle details
-        # VIN
-        vin_pattern = r'\b([A-HJ-NPR-Z0-9]{17})\b'
-        vin_match = re.search(vin_pattern, page_text)
-        result['vin'] = vin_match.group(1) if vin_match else None
+        # VIN - the URL's if it passes the check digit, else the first valid one on the page
+        url_vin = vin_from_url(url)
+        result['vin'] = url_vin if is_valid_vin(url_vin) else find_vin(page_text)
         
         # Year, Make, Model, Trim from title
         try:
@@ -79,6 +151,12 @@ async def scrape_car_page(page, url):
             result['model'] = None
             result['trim'] = None
         
+        # Title didn't parse - the VIN still gives make and model year
+        if result['vin'] and not (result['year'] and result['make']):
+            decoded = decode_vin(result['vin'])
+            result['year'] = result['year'] or (str(decoded['model_year']) if decoded['model_year'] else None)
+            result['make'] = result['make'] or decoded['make']
+        
         # Stock Number
         stock_match = re.search(r'Stock\s+([A-Z0-9]+)(?:\s|Listed|$)', page_text, re.I)
         result['stock_number'] = stock_match.group(1) if stock_match else None
@@ -104,8 +182,6 @@ async def scrape_car_page(page, url):
         # Method 2: Extract from HTML content - look for "[Brand] of [Location]" pattern
         if not dealer_name:
             try:
-                content = await page.content()
-                
                 # Look for "dealershipName" or similar in JSON
                 json_patterns = [
                     r'"dealershipName"\s*:\s*"([^"]+)"',
@@ -170,7 +246,9 @@ async def scrape_car_page(page, url):
                 pass
         
         result['dealer_name'] = dealer_name
-        # Dealer address not needed - removed
+        
+        # Dealer address/location - lets rank_dealers skip the Google Maps address lookup
+        result.update(extract_dealer_location(content, page_text))
         
         # Extract pricing information - Lease Monthly Payment (primary requirement)
         # Method 1: DOM selector: data-test="pricingSectionRadioGroupPrice" data-test-item="lease"
@@ -338,6 +416,7 @@ async def scrape_car_page(page, url):
                 mpg = f"{mpg_match.group(1)} city / {mpg_match.group(2)} highway"
                 break
         result['mpg'] = mpg
+        result['page_probe'] = probe
         
         return result
         
@@ -350,7 +429,7 @@ async def scrape_car_page(page, url):
 
 
 def deduplicate_results(results_df):
-    """Deduplicate results based on VIN or other factors."""
+    """Deduplicate results based on VIN or other factors (batch; main() dedups as results arrive)."""
     print(f"\nDeduplicating {len(results_df)} records...")
     
     # Remove records with errors first (but keep them for reference)
@@ -395,25 +474,57 @@ def deduplicate_results(results_df):
     return final_df
 
 
-async def scrape_urls_batch(context, urls, start_idx, total, batch_id):
-    """Scrape a batch of URLs using a single context, creating new page for each URL."""
+async def scrape_urls_batch(context, urls, start_idx, total, batch_id, cache=None, dedup=None):
+    """Scrape a batch of URLs using a single context, creating new page for each URL.
+    
+    With `dedup` (a StreamingDeduplicator shared by all batches), duplicate listings are dropped
+    as they arrive, and URLs whose VIN was already kept aren't loaded at all.
+    """
     results = []
+    keep = dedup.add if dedup else (lambda result: True)
     
     for i, url in enumerate(urls):
         global_idx = start_idx + i + 1
+        
+        vin = vin_from_url(url)
+        if dedup and dedup.drop_known_vin(vin, urls_to_source.get(url, 'unknown')):
+            print(f"  [{global_idx}/{total}] Browser {batch_id+1}: Duplicate VIN {vin}, skipped", flush=True)
+            continue
+        
+        # Listing cache: skip the page load entirely if verified within the TTL
+        entry = cache.get(vin) if cache else None
+        if cache and cache.is_fresh(entry):
+            result = dict(entry['result'])
+            result['url'] = url
+            result['source_file'] = urls_to_source.get(url, 'unknown')
+            if keep(result):
+                results.append(result)
+            cache.stats['fresh'] += 1
+            print(f"  [{global_idx}/{total}] Browser {batch_id+1}: Cached (fresh) {url[:70]}", flush=True)
+            continue
+        
         print(f"  [{global_idx}/{total}] Browser {batch_id+1}: Scraping {url[:70]}...", flush=True)
         
         page = None
         try:
             # Create a new page for each URL to prevent memory accumulation
             page = await context.new_page()
-            result = await scrape_car_page(page, url)
+            result = await scrape_car_page(page, url, cached=entry)
+            probe = result.pop('page_probe', None)
+            unchanged = result.pop('cache_status', None) == 'unchanged'
             result['source_file'] = urls_to_source.get(url, 'unknown')
-            results.append(result)
+            if keep(result):
+                results.append(result)
+            
+            if cache and not result.get('error'):
+                cache.put(vin, result, probe, unchanged=unchanged)
+                cache.stats['unchanged' if unchanged else 'scraped'] += 1
             
             # Log success/error
             if result.get('error'):
                 print(f"    ✗ Error: {result['error'][:60]}", flush=True)
+            elif unchanged:
+                print(f"    ✓ Unchanged since last scrape - reused cached extraction", flush=True)
             else:
                 dealer = result.get('dealer_name', 'N/A')[:30]
                 print(f"    ✓ Success - Dealer: {dealer}", flush=True)
@@ -421,12 +532,14 @@ async def scrape_urls_batch(context, urls, start_idx, total, batch_id):
         except Exception as e:
             error_msg = str(e)[:60]
             print(f"    ✗ Exception: {error_msg}", flush=True)
-            results.append({
+            result = {
                 'url': url,
                 'scrape_timestamp': datetime.now().isoformat(),
                 'error': str(e),
                 'source_file': urls_to_source.get(url, 'unknown')
-            })
+            }
+            keep(result)  # Counted; errors are always kept
+            results.append(result)
         finally:
             # Always close the page to free memory
             if page:
@@ -447,7 +560,7 @@ async def scrape_urls_batch(context, urls, start_idx, total, batch_id):
     return results
 
 
-async def scrape_all_urls(urls, url_to_source_map):
+async def scrape_all_urls(urls, url_to_source_map, cache=None, dedup=None):
     """Scrape all URLs with concurrent browsers."""
     if not Path(SESSION_FILE).exists():
         print(f"ERROR: Session file {SESSION_FILE} not found!")
@@ -503,7 +616,7 @@ async def scrape_all_urls(urls, url_to_source_map):
             browser_urls = urls[start_idx:start_idx + count]
             
             if browser_urls:
-                task = scrape_urls_batch(contexts[i], browser_urls, start_idx, len(urls), i)
+                task = scrape_urls_batch(contexts[i], browser_urls, start_idx, len(urls), i, cache, dedup)
                 tasks.append(task)
                 start_idx += count
         
@@ -595,6 +708,7 @@ async def main():
     print(f"Concurrent browsers: {CONCURRENT_BROWSERS}")
     print(f"Rate limiting: {DELAY_BETWEEN_REQUESTS}s between requests")
     print(f"Checkpoint interval: Every {CHECKPOINT_INTERVAL} URLs")
+    print(f"Listing cache: {LISTING_CACHE_FILE} (TTL {LISTING_CACHE_TTL_HOURS}h)")
     print("="*80 + "\n")
     
     # Check for session file
@@ -615,6 +729,10 @@ async def main():
     checkpoint = load_checkpoint()
     processed_urls = set(checkpoint.get('processed_urls', []))
     
+    # Duplicates are dropped as results arrive (checkpointed results first, so new ones dedup against them)
+    dedup = StreamingDeduplicator()
+    checkpoint_results = [result for result in checkpoint.get('results', []) if dedup.add(result)]
+    
     # Filter out already processed URLs
     urls_to_scrape = [url for url in all_urls if url not in processed_urls]
     
@@ -624,18 +742,24 @@ async def main():
     
     if not urls_to_scrape:
         print("All URLs already processed!")
-        all_results = checkpoint.get('results', [])
+        all_results = checkpoint_results
     else:
         # Scrape URLs
         start_time = datetime.now()
-        results = await scrape_all_urls(urls_to_scrape, url_to_source)
+        cache = ListingCache(LISTING_CACHE_FILE, ttl_hours=LISTING_CACHE_TTL_HOURS)
+        try:
+            results = await scrape_all_urls(urls_to_scrape, url_to_source, cache=cache, dedup=dedup)
+        finally:
+            cache.close()
+        print(f"Listing cache: {cache.stats['fresh']} fresh, {cache.stats['unchanged']} unchanged, "
+              f"{cache.stats['scraped']} fully scraped", flush=True)
         
         if not results:
             print("ERROR: No results returned from scraping!")
             return
         
         # Combine with checkpoint results
-        all_results = checkpoint.get('results', []) + results
+        all_results = checkpoint_results + results
         
         # Add source file to all results (if not already set)
         for result in all_results:
@@ -654,13 +778,15 @@ async def main():
     # Convert to DataFrame
     df_results = pd.DataFrame(all_results)
     
-    # Deduplicate
-    df_results = deduplicate_results(df_results)
+    # Already deduplicated while scraping
+    dedup.print_report()
+    dedup.close()
     
     # Reorder columns (important fields first)
     column_order = [
         'make', 'model', 'trim', 'year',
-        'dealer_name', 'lease_monthly', 'full_price',
+        'dealer_name', 'dealer_address', 'dealer_city', 'dealer_state', 'dealer_zip', 'dealer_id',
+        'lease_monthly', 'full_price',
         'vin', 'stock_number',
         'msrp', 'list_price', 'cash_price', 'your_price', 'dealer_discount', 'finance_monthly',
         'exterior_color', 'interior_color', 'mpg',
@@ -672,26 +798,32 @@ async def main():
     other_cols = [col for col in df_results.columns if col not in column_order]
     df_results = df_results[column_order + other_cols]
     
-    # Save to Excel (with proper encoding and formatting)
-    print(f"\nSaving results to {OUTPUT_FILE}...", flush=True)
+    # Clean data to prevent formatting issues
+    # Replace any problematic characters that might cause Excel issues
+    for col in df_results.columns:
+        if df_results[col].dtype == 'object':
+            # Convert to string, handling NaN values
+            df_results[col] = df_results[col].fillna('').astype(str)
+            # Remove newlines, tabs, and excessive whitespace
+            df_results[col] = df_results[col].str.replace(r'[\n\r\t]+', ' ', regex=True)
+            df_results[col] = df_results[col].str.replace(r'\s+', ' ', regex=True)
+            df_results[col] = df_results[col].str.strip()
+            # Replace empty strings with None for cleaner Excel output
+            df_results[col] = df_results[col].replace('', None)
+    
+    # Save to the results store (typed + indexed - this is what rank_dealers and the analysis scripts read)
+    print(f"\nSaving results to {RESULTS_DB}...", flush=True)
     try:
-        # Clean data to prevent formatting issues
-        # Replace any problematic characters that might cause Excel issues
-        for col in df_results.columns:
-            if df_results[col].dtype == 'object':
-                # Convert to string, handling NaN values
-                df_results[col] = df_results[col].fillna('').astype(str)
-                # Remove newlines, tabs, and excessive whitespace
-                df_results[col] = df_results[col].str.replace(r'[\n\r\t]+', ' ', regex=True)
-                df_results[col] = df_results[col].str.replace(r'\s+', ' ', regex=True)
-                df_results[col] = df_results[col].str.strip()
-                # Replace empty strings with None for cleaner Excel output
-                df_results[col] = df_results[col].replace('', None)
-        
-        # Use openpyxl engine with explicit formatting
-        from openpyxl import Workbook
-        df_results.to_excel(OUTPUT_FILE, index=False, engine='openpyxl')
-        print(f"✓ Results saved to {OUTPUT_FILE}", flush=True)
+        saved = save_results(df_results, RESULTS_DB)
+        print(f"✓ {saved} results saved to {RESULTS_DB}", flush=True)
+    except Exception as e:
+        print(f"✗ Error saving results store: {e}", flush=True)
+    
+    # Export to Excel (with proper encoding and formatting)
+    print(f"\nExporting results to {OUTPUT_FILE}...", flush=True)
+    try:
+        export_excel(df_results, OUTPUT_FILE)
+        print(f"✓ Results exported to {OUTPUT_FILE}", flush=True)
     except Exception as e:
         print(f"✗ Error saving Excel file: {e}", flush=True)
         # Fallback to CSV if Excel fails
@@ -699,6 +831,13 @@ async def main():
         df_results.to_csv(csv_file, index=False)
         print(f"✓ Saved to CSV instead: {csv_file}", flush=True)
     
+    # Append this run to the price history and report what changed since the last one
+    print(f"\nUpdating price history...", flush=True)
+    try:
+        record_and_diff(df_results)
+    except Exception as e:
+        print(f"✗ Error updating price history: {e}", flush=True)
+    
     # Print summary
     print("\n" + "="*80)
     print("SUMMARY")
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Geocoding helpers for the dealer ranking.
+- Geocode cache (address -> lat/lon) stored alongside the enrichment cache
+- Offline ZIP-centroid fallback (built-in seed for our area, or a full table from file)
+- Vectorized great-circle distance and a grid spatial index for radius queries
+"""
+
+import re
+import sqlite3
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Tuple
+
+from enrichment_cache import ENRICHMENT_DB
+
+# Optional full ZIP centroid table (zip,lat,lon), e.g. from the Census ZCTA gazetteer
+ZIP_CENTROIDS_FILE = 'zip_centroids.csv'
+
+# Approximate centroids for ZIPs around the search area (used when no table is available)
+SEED_ZIP_CENTROIDS = {
+    '10601': (41.033, -73.765),  # White Plains
+    '10801': (40.917, -73.785),  # New Rochelle
+    '10550': (40.906, -73.838),  # Mount Vernon
+    '10701': (40.946, -73.868),  # Yonkers
+    '10710': (40.967, -73.843),  # Yonkers (north-east)
+    '10543': (40.950, -73.735),  # Mamaroneck
+    '10573': (41.016, -73.670),  # Port Chester
+    '10591': (41.076, -73.858),  # Tarrytown
+    '10566': (41.290, -73.920),  # Peekskill
+    '10977': (41.116, -74.044),  # Spring Valley
+    '10468': (40.868, -73.900),  # Bronx (Fordham)
+    '06830': (41.030, -73.627),  # Greenwich
+    '06902': (41.053, -73.540),  # Stamford
+    '11501': (40.747, -73.640),  # Mineola
+    '11550': (40.703, -73.617),  # Hempstead
+}
+
+EARTH_RADIUS_MILES = 3958.8
+ZIP_PATTERN = re.compile(r'\b(\d{5})(?:-\d{4})?\s*$')
+MAPS_COORDS_PATTERN = re.compile(r'@(-?\d+\.\d+),(-?\d+\.\d+)')
+
+
+def normalize_address(address: str) -> str:
+    """Canonical form used as the cache key (case, punctuation and spacing insensitive)."""
+    text = str(address).lower()
+    text = re.sub(r'[.,#]', ' ', text)
+    text = re.sub(r'\bunited states\b|\busa\b', ' ', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def extract_zip(address: str) -> Optional[str]:
+    match = ZIP_PATTERN.search(str(address).strip())
+    return match.group(1) if match else None
+
+
+def coords_from_maps_url(url: str) -> Optional[Tuple[float, float]]:
+    """Lat/lon from a Google Maps place URL (.../place/.../@41.03,-73.76,15z/...)."""
+    if not url or '/place/' not in url:
+        return None
+    match = MAPS_COORDS_PATTERN.search(url)
+    if not match:
+        return None
+    return float(match.group(1)), float(match.group(2))
+
+
+def load_zip_centroids(path: str = ZIP_CENTROIDS_FILE) -> dict:
+    """Seed centroids, extended/overridden by the full table if present."""
+    centroids = dict(SEED_ZIP_CENTROIDS)
+    if Path(path).exists():
+        table = pd.read_csv(path, dtype={'zip': str})
+        table['zip'] = table['zip'].str.zfill(5)
+        centroids.update(zip(table['zip'], zip(table['lat'].astype(float), table['lon'].astype(float))))
+    return centroids
+
+
+def haversine_miles(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Great-circle distance in miles (broadcasts over NumPy arrays)."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(x, dtype='float64')) for x in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(a))
+
+
+class Geocoder:
+    """Address -> (lat, lon, source) with a persistent cache and ZIP-centroid fallback."""
+
+    def __init__(self, path: str = ENRICHMENT_DB, zip_centroids: Optional[dict] = None):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS geocodes (
+                address_key TEXT PRIMARY KEY,
+                address TEXT,
+                lat REAL NOT NULL,
+                lon REAL NOT NULL,
+                source TEXT NOT NULL,
+                fetched_at TEXT NOT NULL
+            )
+        """)
+        self.conn.commit()
+        self.zip_centroids = zip_centroids if zip_centroids is not None else load_zip_centroids()
+
+    def put(self, address: str, lat: float, lon: float, source: str):
+        self.conn.execute(
+            """
+            INSERT INTO geocodes (address_key, address, lat, lon, source, fetched_at) VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(address_key) DO UPDATE SET
+                lat = excluded.lat, lon = excluded.lon, source = excluded.source, fetched_at = excluded.fetched_at
+            """,
+            (normalize_address(address), address, lat, lon, source, datetime.now().isoformat())
+        )
+        self.conn.commit()
+
+    def geocode(self, address: str) -> Optional[Tuple[float, float, str]]:
+        """Cached coordinates if known, else the ZIP centroid, else None."""
+        if not address:
+            return None
+        row = self.conn.execute(
+            "SELECT lat, lon, source FROM geocodes WHERE address_key = ?", (normalize_address(address),)
+        ).fetchone()
+        if row:
+            return row[0], row[1], row[2]
+        zip_code = extract_zip(address)
+        if zip_code and zip_code in self.zip_centroids:
+            lat, lon = self.zip_centroids[zip_code]
+            return lat, lon, 'zip'
+        return None
+
+    def close(self):
+        self.conn.close()
+
+
+class GridIndex:
+    """Spatial index over points: lat/lon grid buckets for radius queries (NaN points are skipped)."""
+
+    def __init__(self, lat, lon, cell_degrees: float = 0.1):
+        self.lat = np.asarray(lat, dtype='float64')
+        self.lon = np.asarray(lon, dtype='float64')
+        self.cell = cell_degrees
+        self.cells = {}
+        located = np.flatnonzero(~(np.isnan(self.lat) | np.isnan(self.lon)))
+        rows = np.floor(self.lat[located] / cell_degrees).astype(int)
+        cols = np.floor(self.lon[located] / cell_degrees).astype(int)
+        for i, row, col in zip(located, rows, cols):
+            self.cells.setdefault((row, col), []).append(i)
+
+    def within(self, lat: float, lon: float, miles: float) -> np.ndarray:
+        """Indices of points within `miles` (great-circle) of (lat, lon), ascending."""
+        miles_per_degree = EARTH_RADIUS_MILES * np.pi / 180
+        dlat = miles / miles_per_degree
+        dlon = miles / (miles_per_degree * max(np.cos(np.radians(lat)), 1e-6))
+        candidates = [
+            i
+            for row in range(int(np.floor((lat - dlat) / self.cell)), int(np.floor((lat + dlat) / self.cell)) + 1)
+            for col in range(int(np.floor((lon - dlon) / self.cell)), int(np.floor((lon + dlon) / self.cell)) + 1)
+            for i in self.cells.get((row, col), ())
+        ]
+        candidates = np.array(sorted(candidates), dtype='int64')
+        if len(candidates) == 0:
+            return candidates
+        return candidates[haversine_miles(lat, lon, self.lat[candidates], self.lon[candidates]) <= miles]
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Persistent listing cache keyed by VIN.
+Lets full_scraper skip listings it scraped recently, and reuse the previous
+extraction when a cheap probe of the pricing block shows nothing changed.
+"""
+
+import sqlite3
+import hashlib
+import json
+import re
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+# VIN embedded in TrueCar listing URLs: /listing/<VIN>/
+URL_VIN_PATTERN = re.compile(r'/listing/([A-HJ-NPR-Z0-9]{17})/', re.I)
+
+# Fields that change when a listing is repriced - the freshness probe only looks at these
+PROBE_PATTERNS = [
+    re.compile(r'MSRP[:\s]+\$([0-9,]+)', re.I),
+    re.compile(r'List\s+price[:\s]+\$([0-9,]+)', re.I),
+    re.compile(r'Cash\s+price[:\s]+\$([0-9,]+)', re.I),
+    re.compile(r'Your\s+price[:\s]+\$([0-9,]+)', re.I),
+    re.compile(r'Dealer\s+discount[:\s]+[-\$]?([0-9,]+)', re.I),
+    re.compile(r'\$([0-9,]+)/mo', re.I),
+]
+
+
+def vin_from_url(url: str) -> Optional[str]:
+    """Extract the VIN from a TrueCar listing URL (no page load needed)."""
+    match = URL_VIN_PATTERN.search(str(url))
+    return match.group(1).upper() if match else None
+
+
+def compute_probe(page_text: str) -> Optional[str]:
+    """Hash the pricing fields of a listing page. Returns None if no prices were found."""
+    parts = []
+    for pattern in PROBE_PATTERNS:
+        match = pattern.search(page_text)
+        parts.append(match.group(1).replace(',', '') if match else '')
+    if not any(parts):
+        return None
+    return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+class ListingCache:
+    """SQLite-backed cache of scraped listings with a configurable TTL."""
+
+    def __init__(self, path: str, ttl_hours: float = 24):
+        self.path = path
+        self.ttl = timedelta(hours=ttl_hours)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS listings (
+                vin TEXT PRIMARY KEY,
+                url TEXT,
+                probe TEXT,
+                result_json TEXT NOT NULL,
+                scraped_at TEXT NOT NULL,
+                checked_at TEXT NOT NULL
+            )
+        """)
+        self.conn.commit()
+        self.stats = {'fresh': 0, 'unchanged': 0, 'scraped': 0}
+
+    def get(self, vin: Optional[str]) -> Optional[Dict]:
+        """Return the cache entry for a VIN, or None."""
+        if not vin:
+            return None
+        row = self.conn.execute(
+            "SELECT url, probe, result_json, scraped_at, checked_at FROM listings WHERE vin = ?",
+            (vin,)
+        ).fetchone()
+        if not row:
+            return None
+        return {
+            'url': row[0],
+            'probe': row[1],
+            'result': json.loads(row[2]),
+            'scraped_at': row[3],
+            'checked_at': row[4],
+        }
+
+    def is_fresh(self, entry: Optional[Dict]) -> bool:
+        """True if the entry was verified within the TTL (no page load needed)."""
+        if not entry:
+            return False
+        try:
+            checked_at = datetime.fromisoformat(entry['checked_at'])
+        except (TypeError, ValueError):
+            return False
+        return datetime.now() - checked_at < self.ttl
+
+    def put(self, vin: Optional[str], result: Dict, probe: Optional[str], unchanged: bool = False):
+        """Store a successful extraction. `unchanged` keeps the original scraped_at."""
+        if not vin or result.get('error'):
+            return
+        now = datetime.now().isoformat()
+        if unchanged:
+            self.conn.execute(
+                "UPDATE listings SET checked_at = ?, url = ? WHERE vin = ?",
+                (now, result.get('url'), vin)
+            )
+        else:
+            self.conn.execute(
+                """
+                INSERT INTO listings (vin, url, probe, result_json, scraped_at, checked_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(vin) DO UPDATE SET
+                    url = excluded.url,
+                    probe = excluded.probe,
+                    result_json = excluded.result_json,
+                    scraped_at = excluded.scraped_at,
+                    checked_at = excluded.checked_at
+                """,
+                (vin, result.get('url'), probe, json.dumps(result, default=str), now, now)
+            )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate listing detection: the same car syndicated through sister dealers, or listed
+again with a slightly different trim or price, where exact VIN / stock+dealer dedup misses it.
+- Each listing becomes a set of normalized attribute tokens (year, make, model, trim words,
+  colors, MPG, price and MSRP buckets, stock number) - dealer name is deliberately left out
+- MinHash signatures + LSH banding propose candidate pairs without comparing every pair;
+  candidates are then checked with the exact Jaccard similarity of their token sets
+- A pair must also share year/make/model, be within MAX_PRICE_GAP on price, and not carry
+  two different VINs (a check-digit-valid VIN on both sides settles it)
+- Listings with neither a stock number nor a VIN are skipped: identical-spec cars can't be
+  told apart without one
+
+Matched pairs are grouped into clusters; collapse_near_duplicates keeps the first listing of
+each cluster (rank_dealers --collapse-near-duplicates applies it before Step 2).
+
+Usage: python3 near_duplicates.py [--db scraped_car_data.db] [--threshold 0.75] [--output near_duplicates.xlsx]
+"""
+
+import argparse
+import numpy as np
+import pandas as pd
+from typing import Optional, Tuple
+
+from results_store import RESULTS_DB, load_results
+from vin_decoder import decode_vins
+
+SIMILARITY_THRESHOLD = 0.75  # Exact Jaccard of the token sets
+MAX_PRICE_GAP = 0.03  # Relative price difference allowed within a pair
+PRICE_BUCKET = 0.02  # Width of the log-price buckets (two offset buckets, so prices ~1% apart share one)
+STOCK_WEIGHT = 4  # Stock number counts as this many tokens (it's the best identifier after the VIN)
+COLOR_WEIGHT = 2  # Same for exterior color (a different color is strong evidence of a different car)
+NUM_PERM = 128  # MinHash permutations
+LSH_BANDS = 16  # 16 bands x 8 rows: pairs at 0.85 similarity are candidates 99%+ of the time, 0.5 only ~6%
+MAX_BUCKET_SIZE = 1000  # LSH buckets with more VIN-less listings than this are skipped (uninformative, quadratic)
+SIGNATURE_CHUNK = 10_000  # Listings hashed per block (bounds memory)
+PAIR_CHUNK = 200_000  # Candidate pairs verified per block
+OUTPUT_FILE = 'near_duplicates.xlsx'
+
+_PRICE_COLUMNS = ['price', 'full_price', 'cash_price', 'list_price']
+
+
+def _per_value(clean):
+    """Apply a string cleaner once per distinct value and broadcast it back (columns repeat heavily)."""
+    def apply(values: pd.Series) -> pd.Series:
+        codes, uniques = pd.factorize(values)
+        cleaned = clean(pd.Series(uniques, dtype=object).astype('string')).to_numpy(dtype=object, na_value=None)
+        out = np.append(cleaned, None)[codes]  # Code -1 (missing) picks the trailing None
+        return pd.Series(out, index=values.index, dtype='string')
+    return apply
+
+
+@_per_value
+def _normalize(values: pd.Series) -> pd.Series:
+    """Lower-case words separated by single spaces; missing/blank -> NA."""
+    text = values.str.lower().str.replace(r'[^a-z0-9]+', ' ', regex=True).str.strip()
+    return text.where(text != '')
+
+
+@_per_value
+def _stock(values: pd.Series) -> pd.Series:
+    """Stock number without punctuation, letter prefix or leading zeros ('S-018667' -> '18667')."""
+    text = values.str.upper().str.replace(r'[^A-Z0-9]', '', regex=True)
+    core = text.str.replace(r'^[A-Z]*0*', '', regex=True)
+    text = core.where(core != '', text)
+    return text.where(text != '')
+
+
+@_per_value
+def _vin(values: pd.Series) -> pd.Series:
+    """VINs that pass the check digit, upper-cased; anything else -> NA (a typo'd VIN proves nothing)."""
+    return decode_vins(values.str.strip())['vin']
+
+
+def _price(df: pd.DataFrame) -> pd.Series:
+    column = next((c for c in _PRICE_COLUMNS if c in df.columns), None)
+    if column is None:
+        return pd.Series(np.nan, index=df.index)
+    return pd.to_numeric(df[column], errors='coerce').astype('float64')
+
+
+def _column(df: pd.DataFrame, name: str) -> pd.Series:
+    return df[name] if name in df.columns else pd.Series(pd.NA, index=df.index, dtype='string')
+
+
+def listing_tokens(df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(eligible, rows, ids): which rows take part, and their (row position, token id) pairs.
+
+    Token ids are per feature (the same value under two features is two tokens)."""
+    df = df.reset_index(drop=True)  # Token rows are positions
+    year = pd.to_numeric(_column(df, 'year'), errors='coerce').astype('Int64').astype('string')
+    make, model = _normalize(_column(df, 'make')), _normalize(_column(df, 'model'))
+    stock, vin = _stock(_column(df, 'stock_number')), _vin(_column(df, 'vin'))
+    eligible = year.notna() & make.notna() & model.notna() & (stock.notna() | vin.notna())
+    if 'error' in df.columns:
+        eligible &= df['error'].isna()
+    eligible = eligible.to_numpy(dtype=bool)
+
+    parts = []
+    vocabulary = 0
+
+    def add(values: pd.Series):
+        nonlocal vocabulary
+        values = values[values.notna()]
+        codes, uniques = pd.factorize(values)
+        parts.append((values.index.to_numpy(), vocabulary + codes))
+        vocabulary += len(uniques)
+
+    for values in (year, make, model, _normalize(_column(df, 'trim')).str.split().explode(),
+                   _normalize(_column(df, 'interior_color')),
+                   _column(df, 'mpg').astype('string').str.findall(r'\d+').str.join('/').replace('', pd.NA)):
+        add(values)
+    exterior = _normalize(_column(df, 'exterior_color'))
+    for _ in range(COLOR_WEIGHT):
+        add(exterior)
+    for _ in range(STOCK_WEIGHT):
+        add(stock)
+    msrp = pd.to_numeric(_column(df, 'msrp'), errors='coerce').astype('float64')
+    for values in (_price(df), msrp):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            bucket = pd.Series(np.log(values.to_numpy()) / np.log1p(PRICE_BUCKET))
+        bucket = bucket.where(np.isfinite(bucket))
+        add(np.floor(bucket).astype('Int64'))
+        add(np.floor(bucket + 0.5).astype('Int64'))
+
+    rows = np.concatenate([r for r, _ in parts])
+    ids = np.concatenate([t for _, t in parts])
+    keep = eligible[rows]
+    return eligible, rows[keep], ids[keep]
+
+
+def minhash_signatures(rows: np.ndarray, token_ids: np.ndarray, n_rows: int,
+                       num_perm: int = NUM_PERM, seed: int = 0) -> np.ndarray:
+    """(n_rows, num_perm) uint32 MinHash signatures; rows without tokens are all 0xFFFFFFFF.
+
+    Each permutation is a multiply-shift hash (high 32 bits of a*x + b mod 2^64, a odd),
+    evaluated permutation-major so the per-row minimum runs over contiguous memory.
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    b = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64)
+    order = np.argsort(rows, kind='stable')
+    rows, ids = rows[order], token_ids[order].astype(np.uint64)
+    signatures = np.full((n_rows, num_perm), 0xFFFFFFFF, dtype=np.uint32)
+    bounds = np.searchsorted(rows, np.r_[np.arange(0, n_rows, SIGNATURE_CHUNK), n_rows])
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        if lo == hi:
+            continue
+        hashed = ((a[:, None] * ids[None, lo:hi] + b[:, None]) >> np.uint64(32)).astype(np.uint32)
+        block = rows[lo:hi]
+        starts = np.flatnonzero(np.r_[True, block[1:] != block[:-1]])
+        signatures[block[starts]] = np.minimum.reduceat(hashed, starts, axis=1).T
+    return signatures
+
+
+def _bucket_pairs(keys: np.ndarray, open_rows: np.ndarray, max_bucket: int) -> Tuple[np.ndarray, np.ndarray, int]:
+    """Every (i, j), i < j, of rows sharing a key where at least one side is open; plus the
+    number of buckets skipped for holding more than max_bucket open rows."""
+    order = np.lexsort((~open_rows, keys))  # Open rows first within each bucket
+    sorted_keys, sorted_open = keys[order], open_rows[order]
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    sizes = np.diff(np.r_[starts, len(keys)])
+    n_open = np.add.reduceat(sorted_open, starts) if len(keys) else np.zeros(0, dtype=int)
+    usable = (sizes >= 2) & (n_open <= max_bucket)
+    group = np.repeat(np.arange(len(starts)), sizes)
+    # An open row pairs with every row after it in its bucket; closed rows were paired by the open ones
+    after = np.where(usable[group] & sorted_open, (starts + sizes)[group] - np.arange(len(keys)) - 1, 0)
+    left = np.repeat(np.arange(len(keys)), after)
+    right = left + 1 + np.arange(len(left)) - np.repeat(np.cumsum(after) - after, after)
+    i, j = order[left], order[right]
+    return np.minimum(i, j), np.maximum(i, j), int((n_open > max_bucket).sum())
+
+
+def candidate_pairs(signatures: np.ndarray, rows: Optional[np.ndarray] = None, open_rows: Optional[np.ndarray] = None,
+                    bands: int = LSH_BANDS, max_bucket: int = MAX_BUCKET_SIZE) -> Tuple[np.ndarray, np.ndarray]:
+    """LSH banding: pairs (among `rows`, default all) whose signatures agree on a whole band.
+
+    `open_rows` (mask over signature rows, default all) limits pairs to those with at least one
+    open side - listings with a VIN only need comparing against listings without one.
+    """
+    rows = np.arange(len(signatures)) if rows is None else rows
+    open_rows = np.ones(len(rows), dtype=bool) if open_rows is None else open_rows[rows]
+    width = signatures.shape[1] // bands
+    pairs, skipped = [], 0
+    for band in range(bands):
+        keys = np.full(len(rows), band, dtype=np.uint64)
+        for column in signatures[rows, band * width:(band + 1) * width].T:
+            keys = keys * np.uint64(0x100000001B3) + column  # Wraps mod 2^64; collisions only add candidates
+        i, j, oversized = _bucket_pairs(keys, open_rows, max_bucket)
+        pairs.append(rows[i].astype(np.int64) * len(signatures) + rows[j])
+        skipped += oversized
+    if skipped:
+        print(f"  ⚠ Skipped {skipped} LSH buckets with over {max_bucket} listings without a VIN")
+    unique = np.unique(np.concatenate(pairs)) if pairs else np.empty(0, dtype=np.int64)
+    return unique // len(signatures), unique % len(signatures)
+
+
+def _jaccard(indptr: np.ndarray, ids: np.ndarray, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+    """Exact Jaccard of each pair's token-id sets (CSR rows of unique ids)."""
+    sizes = np.diff(indptr)
+    width = int(ids.max(initial=0)) + 1
+    similarity = np.empty(len(i))
+    for lo in range(0, len(i), PAIR_CHUNK):
+        ci, cj = i[lo:lo + PAIR_CHUNK], j[lo:lo + PAIR_CHUNK]
+        rows = np.r_[ci, cj]
+        lengths = sizes[rows]
+        offsets = np.repeat(indptr[rows] - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        pair = np.repeat(np.r_[np.arange(len(ci)), np.arange(len(ci))], lengths)
+        keys = np.sort(pair.astype(np.int64) * width + ids[offsets])
+        shared = np.bincount(keys[1:][keys[1:] == keys[:-1]] // width, minlength=len(ci))  # Ids in both sets
+        union = sizes[ci] + sizes[cj] - shared
+        similarity[lo:lo + PAIR_CHUNK] = np.where(union > 0, shared / np.maximum(union, 1), 0.0)
+    return similarity
+
+
+def find_near_duplicates(df: pd.DataFrame, threshold: float = SIMILARITY_THRESHOLD,
+                         exhaustive: bool = False) -> pd.DataFrame:
+    """Matched pairs: left/right (index labels of df, left first in row order) and their similarity.
+
+    `exhaustive` checks every pair of eligible listings instead of the LSH candidates
+    (quadratic - a reference for small inputs).
+    """
+    eligible, rows, ids = listing_tokens(df)
+    # Unique ids per row, sorted by row (CSR) - duplicate tokens within a row count once
+    width = int(ids.max(initial=0)) + 1
+    unique = np.unique(rows.astype(np.int64) * width + ids)
+    rows, ids = unique // width, unique % width
+    indptr = np.r_[0, np.cumsum(np.bincount(rows, minlength=len(df)))]
+
+    vin = pd.factorize(_vin(_column(df, 'vin')))[0]  # -1 = no VIN
+    if exhaustive:
+        i, j = (np.flatnonzero(eligible)[side] for side in np.triu_indices(eligible.sum(), 1))
+    else:
+        # Two listings with different VINs are different cars, so only VIN-less listings open pairs
+        i, j = candidate_pairs(minhash_signatures(rows, ids, len(df)), np.flatnonzero(eligible), open_rows=vin < 0)
+    similarity = _jaccard(indptr, ids, i, j)
+
+    year = pd.to_numeric(_column(df, 'year'), errors='coerce').astype('Int64').astype('string')
+    spec = pd.factorize(year + '|' + _normalize(_column(df, 'make')) + '|' + _normalize(_column(df, 'model')))[0]
+    price = _price(df).to_numpy()
+    with np.errstate(invalid='ignore'):
+        gap = np.abs(price[i] - price[j]) / np.minimum(price[i], price[j])
+    other_vin = (vin[i] >= 0) & (vin[j] >= 0) & (vin[i] != vin[j])
+    match = (similarity >= threshold) & (spec[i] == spec[j]) & ~(gap > MAX_PRICE_GAP) & ~other_vin
+    return pd.DataFrame({
+        'left': df.index[i[match]],
+        'right': df.index[j[match]],
+        'similarity': similarity[match],
+    })
+
+
+def _components(n: int, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+    """Connected-component label per node (its smallest member) via min-label propagation."""
+    labels = np.arange(n)
+    while True:
+        smallest = np.minimum(labels[i], labels[j])
+        updated = labels.copy()
+        np.minimum.at(updated, i, smallest)
+        np.minimum.at(updated, j, smallest)
+        updated = updated[updated]  # Pointer jumping
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+
+def near_duplicate_clusters(df: pd.DataFrame, threshold: float = SIMILARITY_THRESHOLD,
+                            pairs: Optional[pd.DataFrame] = None) -> pd.Series:
+    """Cluster id per listing (0, 1, ... in row order of each cluster's first listing; -1 = no near duplicate)."""
+    pairs = find_near_duplicates(df, threshold) if pairs is None else pairs
+    i, j = df.index.get_indexer(pairs['left']), df.index.get_indexer(pairs['right'])
+    labels = _components(len(df), i, j)
+    in_cluster = np.zeros(len(df), dtype=bool)
+    in_cluster[i], in_cluster[j] = True, True
+    codes = np.full(len(df), -1)
+    codes[in_cluster] = pd.factorize(labels[in_cluster])[0]
+    return pd.Series(codes, index=df.index, name='cluster')
+
+
+def cluster_report(df: pd.DataFrame, clusters: pd.Series) -> pd.DataFrame:
+    """One row per cluster: size, spec, the dealers/trims/stock numbers/VINs involved and the price range."""
+    members = df[clusters >= 0].assign(cluster=clusters[clusters >= 0], _price=_price(df))
+    joined = lambda values: ' | '.join(dict.fromkeys(str(v) for v in values if pd.notna(v) and str(v) != ''))
+    text = {c: (c, joined) for c in ['dealer_name', 'trim', 'stock_number', 'vin'] if c in members.columns}
+    report = members.groupby('cluster').agg(
+        size=('_price', 'size'),
+        year=('year', 'first'), make=('make', 'first'), model=('model', 'first'),
+        price_min=('_price', 'min'), price_max=('_price', 'max'),
+        **{f'{c}s': spec for c, spec in text.items()},
+    )
+    return report.sort_values('size', ascending=False, kind='stable').reset_index()
+
+
+def collapse_near_duplicates(df: pd.DataFrame, threshold: float = SIMILARITY_THRESHOLD) -> pd.DataFrame:
+    """Keep only the first listing (row order) of each near-duplicate cluster."""
+    clusters = near_duplicate_clusters(df, threshold)
+    drop = (clusters >= 0) & clusters.duplicated()
+    print(f"Collapsed {drop.sum()} near-duplicate listings into {clusters.max() + 1} clusters")
+    return df[~drop.to_numpy()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Find near-duplicate listings (same car, different dealer/trim/price)')
+    parser.add_argument('--db', default=RESULTS_DB)
+    parser.add_argument('--threshold', type=float, default=SIMILARITY_THRESHOLD)
+    parser.add_argument('--output', default=OUTPUT_FILE)
+    args = parser.parse_args()
+
+    df = load_results(args.db)
+    clusters = near_duplicate_clusters(df, args.threshold)
+    report = cluster_report(df, clusters)
+    print(f"{len(report)} near-duplicate clusters covering {(clusters >= 0).sum()} of {len(df)} listings")
+    if len(report):
+        print(report.head(20).to_string(index=False))
+        report.to_excel(args.output, index=False)
+        print(f"✓ Saved cluster report to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
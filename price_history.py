@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Append-only price history store with per-VIN change detection.
+Every full_scraper run is recorded as a snapshot; the diff against the
+previous snapshot (new listings, price changes, delistings) is computed
+with indexed SQL joins so it stays fast as history grows.
+"""
+
+import sqlite3
+import pandas as pd
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+from listing_cache import vin_from_url
+
+HISTORY_DB = 'price_history.db'
+CHANGES_FILE = 'listing_changes.xlsx'
+
+HISTORY_COLUMNS = [
+    'run_id', 'vin', 'status', 'scrape_timestamp',
+    'make', 'model', 'trim', 'year', 'dealer_name',
+    'full_price', 'lease_monthly', 'url', 'source_file',
+]
+
+
+def connect(path: str = HISTORY_DB) -> sqlite3.Connection:
+    """Open the history database and make sure the schema exists."""
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS runs (
+            run_id TEXT PRIMARY KEY,
+            recorded_at TEXT NOT NULL,
+            listings INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS listing_history (
+            run_id TEXT NOT NULL,
+            vin TEXT NOT NULL,
+            status TEXT NOT NULL,
+            scrape_timestamp TEXT,
+            make TEXT,
+            model TEXT,
+            trim TEXT,
+            year INTEGER,
+            dealer_name TEXT,
+            full_price REAL,
+            lease_monthly REAL,
+            url TEXT,
+            source_file TEXT
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_history_run_vin ON listing_history(run_id, vin);
+        CREATE INDEX IF NOT EXISTS idx_history_vin ON listing_history(vin, scrape_timestamp);
+        CREATE TABLE IF NOT EXISTS listing_changes (
+            run_id TEXT NOT NULL,
+            vin TEXT NOT NULL,
+            change_type TEXT NOT NULL,
+            dealer_name TEXT,
+            make TEXT,
+            model TEXT,
+            trim TEXT,
+            year INTEGER,
+            old_price REAL,
+            new_price REAL,
+            price_delta REAL,
+            url TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_changes_run ON listing_changes(run_id, change_type);
+    """)
+    return conn
+
+
+def _snapshot_frame(results_df: pd.DataFrame, run_id: str) -> pd.DataFrame:
+    """Shape scraper results into history rows (one per VIN)."""
+    df = results_df.copy()
+    for col in HISTORY_COLUMNS:
+        if col not in df.columns:
+            df[col] = None
+
+    # Prefer the VIN from the listing URL - the page-text regex can grab the wrong token
+    url_vins = df['url'].map(vin_from_url)
+    df['vin'] = url_vins.fillna(df['vin'])
+    df = df[df['vin'].notna() & (df['vin'].astype(str) != '')]
+
+    df['run_id'] = run_id
+    df['status'] = df['error'].isna().map({True: 'ok', False: 'error'}) if 'error' in df.columns else 'ok'
+    df['full_price'] = pd.to_numeric(df['full_price'], errors='coerce')
+    df['lease_monthly'] = pd.to_numeric(df['lease_monthly'], errors='coerce')
+    df['year'] = pd.to_numeric(df['year'], errors='coerce').astype('Int64')
+
+    # One row per VIN per run; successful scrapes win over errors
+    df = df.sort_values('status', ascending=False).drop_duplicates(subset=['vin'], keep='first')
+    return df[HISTORY_COLUMNS]
+
+
+def previous_run_id(conn: sqlite3.Connection, run_id: str) -> Optional[str]:
+    """The most recent run recorded before `run_id`."""
+    row = conn.execute(
+        "SELECT run_id FROM runs WHERE run_id < ? ORDER BY run_id DESC LIMIT 1",
+        (run_id,)
+    ).fetchone()
+    return row[0] if row else None
+
+
+def record_snapshot(results_df: pd.DataFrame, run_id: Optional[str] = None,
+                    conn: Optional[sqlite3.Connection] = None) -> str:
+    """Append one scrape run to the history table. Returns the run_id."""
+    run_id = run_id or datetime.now().isoformat(timespec='seconds')
+    own_conn = conn is None
+    conn = conn or connect()
+    try:
+        snapshot = _snapshot_frame(results_df, run_id)
+        conn.execute("DELETE FROM listing_history WHERE run_id = ?", (run_id,))
+        snapshot.to_sql('listing_history', conn, if_exists='append', index=False)
+        conn.execute(
+            "INSERT OR REPLACE INTO runs (run_id, recorded_at, listings) VALUES (?, ?, ?)",
+            (run_id, datetime.now().isoformat(), len(snapshot))
+        )
+        conn.commit()
+    finally:
+        if own_conn:
+            conn.close()
+    return run_id
+
+
+DIFF_SQL = """
+    -- New listings: in this run, not in the previous one
+    SELECT cur.vin, 'new' AS change_type, cur.dealer_name, cur.make, cur.model, cur.trim, cur.year,
+           NULL AS old_price, cur.full_price AS new_price, NULL AS price_delta, cur.url
+    FROM listing_history cur
+    LEFT JOIN listing_history prev ON prev.run_id = :prev AND prev.vin = cur.vin
+    WHERE cur.run_id = :cur AND cur.status = 'ok' AND prev.vin IS NULL
+
+    UNION ALL
+
+    -- Price changes between successful scrapes
+    SELECT cur.vin,
+           CASE WHEN cur.full_price < prev.full_price THEN 'price_drop' ELSE 'price_increase' END,
+           cur.dealer_name, cur.make, cur.model, cur.trim, cur.year,
+           prev.full_price, cur.full_price, cur.full_price - prev.full_price, cur.url
+    FROM listing_history cur
+    JOIN listing_history prev ON prev.run_id = :prev AND prev.vin = cur.vin
+    WHERE cur.run_id = :cur AND cur.status = 'ok' AND prev.status = 'ok'
+      AND cur.full_price IS NOT NULL AND prev.full_price IS NOT NULL
+      AND cur.full_price != prev.full_price
+
+    UNION ALL
+
+    -- Delistings: previously listed, not even attempted in this run
+    SELECT prev.vin, 'delisted', prev.dealer_name, prev.make, prev.model, prev.trim, prev.year,
+           prev.full_price, NULL, NULL, prev.url
+    FROM listing_history prev
+    LEFT JOIN listing_history cur ON cur.run_id = :cur AND cur.vin = prev.vin
+    WHERE prev.run_id = :prev AND prev.status = 'ok' AND cur.vin IS NULL
+"""
+
+
+def diff_runs(run_id: str, conn: Optional[sqlite3.Connection] = None) -> pd.DataFrame:
+    """Compute and store the changes between `run_id` and the run before it."""
+    own_conn = conn is None
+    conn = conn or connect()
+    try:
+        prev = previous_run_id(conn, run_id)
+        if prev is None:
+            # First run - everything is new, but that is not a useful change feed
+            return pd.DataFrame(columns=['run_id', 'vin', 'change_type'])
+
+        changes = pd.read_sql_query(DIFF_SQL, conn, params={'cur': run_id, 'prev': prev})
+        changes.insert(0, 'run_id', run_id)
+        conn.execute("DELETE FROM listing_changes WHERE run_id = ?", (run_id,))
+        changes.to_sql('listing_changes', conn, if_exists='append', index=False)
+        conn.commit()
+        return changes
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def price_history(vin: str, conn: Optional[sqlite3.Connection] = None) -> pd.DataFrame:
+    """Full price history for one VIN, oldest first."""
+    own_conn = conn is None
+    conn = conn or connect()
+    try:
+        return pd.read_sql_query(
+            "SELECT run_id, scrape_timestamp, dealer_name, full_price, lease_monthly, status "
+            "FROM listing_history WHERE vin = ? ORDER BY run_id",
+            conn, params=(vin,)
+        )
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def record_and_diff(results_df: pd.DataFrame, run_id: Optional[str] = None,
+                    db_path: str = HISTORY_DB, changes_file: Optional[str] = CHANGES_FILE) -> pd.DataFrame:
+    """Record a run, diff it against the previous one and export the changed rows."""
+    conn = connect(db_path)
+    try:
+        run_id = record_snapshot(results_df, run_id, conn=conn)
+        is_first_run = previous_run_id(conn, run_id) is None
+        changes = diff_runs(run_id, conn=conn)
+    finally:
+        conn.close()
+
+    if is_first_run:
+        print(f"  Recorded first snapshot (run {run_id}) - changes are reported from the next run")
+        return changes
+    if len(changes) == 0:
+        print(f"  No listing changes since previous run (run {run_id})")
+        return changes
+
+    counts = changes['change_type'].value_counts()
+    print(f"  Changes since previous run: " + ', '.join(f"{k}={v}" for k, v in counts.items()))
+    if changes_file:
+        changes.to_excel(changes_file, index=False, engine='openpyxl')
+        print(f"  ✓ Changed rows saved to {changes_file}")
+    return changes
+
+
+if __name__ == '__main__':
+    import sys
+    if len(sys.argv) > 1:
+        print(price_history(sys.argv[1]).to_string(index=False))
+    elif Path(HISTORY_DB).exists():
+        conn = connect()
+        runs = pd.read_sql_query("SELECT * FROM runs ORDER BY run_id DESC LIMIT 10", conn)
+        print(runs.to_string(index=False))
+        conn.close()
+    else:
+        print(f"No history yet - {HISTORY_DB} is created by full_scraper.py")
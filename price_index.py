@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Per-spec price distribution index: "is this a good deal?" in one binary search.
+- build: sorted prices per spec_key (year|make|model|trim) from the results store,
+  persisted in scraped_car_data.db (price_index table)
+- lookup: one listing (spec fields + price, or a VIN in the results store) ->
+  percentile within its spec and rel_pct vs the spec median
+- annotate: every scraped row gets price_percentile / spec_median_price / rel_pct
+  in one vectorized searchsorted pass
+
+Usage:
+  python3 price_index.py build
+  python3 price_index.py lookup --vin 1HGCY1F30RA000000
+  python3 price_index.py lookup --year 2025 --make Honda --model Accord --trim EX-L --price 31500
+  python3 price_index.py annotate [--output priced_listings.xlsx]
+"""
+
+import argparse
+import contextlib
+import io
+import sqlite3
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional
+
+import rank_dealers
+from results_store import RESULTS_DB, RESULTS_TABLE, build_spec_key, load_results
+
+PRICE_INDEX_TABLE = 'price_index'
+ANNOTATED_FILE = 'priced_listings.xlsx'
+SPEC_STRIDE = 10 ** 11  # Composite search key: spec index * stride + price in cents (prices < $1B)
+
+
+def _cents(prices) -> np.ndarray:
+    return np.round(np.asarray(prices, dtype='float64') * 100).astype('int64')
+
+
+class PriceIndex:
+    """Sorted prices for every spec, flattened into one array with per-spec offsets."""
+
+    def __init__(self, spec_keys, offsets: np.ndarray, prices: np.ndarray, medians: np.ndarray):
+        self.spec_keys = list(spec_keys)
+        self.spec_index = {key: i for i, key in enumerate(self.spec_keys)}
+        self.offsets = offsets
+        self.prices = prices
+        self.medians = medians
+        counts = np.diff(offsets)
+        self._keys = np.repeat(np.arange(len(self.spec_keys), dtype='int64'), counts) * SPEC_STRIDE + _cents(prices)
+
+    @classmethod
+    def from_listings(cls, df: pd.DataFrame) -> 'PriceIndex':
+        """Build from normalized listings (spec_key, price)."""
+        df = df.dropna(subset=['spec_key', 'price'])
+        codes, spec_keys = pd.factorize(df['spec_key'].astype(str), sort=True)
+        prices = df['price'].to_numpy(dtype='float64')
+        order = np.lexsort((prices, codes))
+        counts = np.bincount(codes, minlength=len(spec_keys))
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        medians = pd.Series(prices).groupby(codes).median().to_numpy(dtype='float64')
+        return cls(spec_keys, offsets, prices[order], medians)
+
+    @classmethod
+    def load(cls, path: str = RESULTS_DB) -> 'PriceIndex':
+        conn = sqlite3.connect(path)
+        try:
+            rows = conn.execute(f"SELECT spec_key, median_price, prices FROM {PRICE_INDEX_TABLE} ORDER BY spec_key").fetchall()
+        finally:
+            conn.close()
+        arrays = [np.frombuffer(blob, dtype='float64') for _, _, blob in rows]
+        offsets = np.concatenate([[0], np.cumsum([len(a) for a in arrays])]).astype('int64')
+        prices = np.concatenate(arrays) if arrays else np.empty(0)
+        return cls([r[0] for r in rows], offsets, prices, np.array([r[1] for r in rows], dtype='float64'))
+
+    def save(self, path: str = RESULTS_DB):
+        conn = sqlite3.connect(path)
+        try:
+            conn.execute(f"DROP TABLE IF EXISTS {PRICE_INDEX_TABLE}")
+            conn.execute(f"""
+                CREATE TABLE {PRICE_INDEX_TABLE} (
+                    spec_key TEXT PRIMARY KEY,
+                    listings INTEGER NOT NULL,
+                    median_price REAL NOT NULL,
+                    prices BLOB NOT NULL
+                )
+            """)
+            conn.executemany(
+                f"INSERT INTO {PRICE_INDEX_TABLE} (spec_key, listings, median_price, prices) VALUES (?, ?, ?, ?)",
+                ((key, int(self.offsets[i + 1] - self.offsets[i]), float(self.medians[i]),
+                  self.prices[self.offsets[i]:self.offsets[i + 1]].tobytes())
+                 for i, key in enumerate(self.spec_keys))
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def annotate(self, spec_keys: pd.Series, prices: pd.Series) -> pd.DataFrame:
+        """price_percentile (mid-rank, 0-100), spec_median_price, rel_pct and spec_listings per row.
+
+        Rows whose spec isn't indexed (or without a price) get NaN.
+        """
+        spec_idx = spec_keys.map(self.spec_index).to_numpy(dtype='float64')
+        price = pd.to_numeric(prices, errors='coerce').to_numpy(dtype='float64')
+        known = ~np.isnan(spec_idx) & ~np.isnan(price)
+        idx = spec_idx[known].astype('int64')
+        keys = idx * SPEC_STRIDE + _cents(price[known])
+        below = np.searchsorted(self._keys, keys, side='left') - self.offsets[idx]
+        at_or_below = np.searchsorted(self._keys, keys, side='right') - self.offsets[idx]
+        n = self.offsets[idx + 1] - self.offsets[idx]
+
+        out = pd.DataFrame(np.nan, index=spec_keys.index,
+                           columns=['price_percentile', 'spec_median_price', 'rel_pct', 'spec_listings'])
+        median = self.medians[idx]
+        out.loc[known, 'price_percentile'] = (below + at_or_below) / 2 / n * 100
+        out.loc[known, 'spec_median_price'] = median
+        out.loc[known, 'rel_pct'] = (price[known] - median) / median
+        out.loc[known, 'spec_listings'] = n
+        return out
+
+    def lookup(self, spec_key: str, price: float) -> Optional[Dict]:
+        """Percentile and rel_pct of one price within its spec (None if the spec isn't indexed)."""
+        if spec_key not in self.spec_index:
+            return None
+        row = self.annotate(pd.Series([spec_key]), pd.Series([price])).iloc[0]
+        return {'spec_key': spec_key, 'price': price, **row.to_dict()}
+
+
+def spec_key_for(year, make: str, model: str, trim: Optional[str] = None) -> str:
+    """Same key the results store and rank_dealers build."""
+    return build_spec_key(pd.DataFrame({'year': [year], 'make': [make], 'model': [model], 'trim': [trim or '']})).iat[0]
+
+
+def listing_by_vin(vin: str, path: str = RESULTS_DB) -> Optional[Dict]:
+    """spec_key and price of a VIN in the results store (indexed lookup)."""
+    conn = sqlite3.connect(path)
+    try:
+        row = conn.execute(
+            f"SELECT year, make, model, trim, full_price FROM {RESULTS_TABLE} WHERE vin = ? LIMIT 1", (vin,)
+        ).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        return None
+    year, make, model, trim, price = row
+    return {'spec_key': spec_key_for(year, make, model, trim), 'price': price}
+
+
+def build(path: str = RESULTS_DB) -> PriceIndex:
+    """Index the current results store."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        df = rank_dealers.normalize_data(load_results(path))
+    index = PriceIndex.from_listings(df)
+    index.save(path)
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-spec price distribution index')
+    parser.add_argument('--db', default=RESULTS_DB)
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('build', help='(Re)build the index from the results store')
+    lookup = sub.add_parser('lookup', help='Percentile of one listing')
+    lookup.add_argument('--vin')
+    lookup.add_argument('--year', type=int)
+    lookup.add_argument('--make')
+    lookup.add_argument('--model')
+    lookup.add_argument('--trim', default='')
+    lookup.add_argument('--price', type=float)
+    annotate = sub.add_parser('annotate', help='Add percentile columns to every scraped row')
+    annotate.add_argument('--output', default=ANNOTATED_FILE)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        index = build(args.db)
+        print(f"✓ Indexed {len(index.prices)} prices across {len(index.spec_keys)} specs in {args.db}")
+        return
+
+    index = PriceIndex.load(args.db)
+    if args.command == 'lookup':
+        if args.vin:
+            listing = listing_by_vin(args.vin, args.db)
+            if listing is None:
+                print(f"VIN {args.vin} not in {args.db}")
+                return
+            spec_key, price = listing['spec_key'], args.price or listing['price']
+            if price is None:
+                print(f"No price stored for VIN {args.vin} (pass --price)")
+                return
+        else:
+            if not (args.year and args.make and args.model and args.price):
+                parser.error('lookup needs --vin, or --year/--make/--model/--price')
+            spec_key, price = spec_key_for(args.year, args.make, args.model, args.trim), args.price
+        result = index.lookup(spec_key, price)
+        if result is None:
+            print(f"No listings indexed for {spec_key}")
+            return
+        print(f"{spec_key} at ${price:,.0f}: percentile {result['price_percentile']:.0f} of "
+              f"{result['spec_listings']:.0f} listings, {result['rel_pct']:+.1%} vs median ${result['spec_median_price']:,.0f}")
+    else:
+        df = load_results(args.db)
+        spec_keys = build_spec_key(df) if 'spec_key' not in df.columns else df['spec_key']
+        df = pd.concat([df, index.annotate(spec_keys, df['full_price'])], axis=1)
+        df.to_excel(args.output, index=False, engine='openpyxl')
+        print(f"✓ Annotated {df['price_percentile'].notna().sum()} of {len(df)} rows -> {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Sketch-backed pricing fairness for price history larger than memory.
+- KLLSketch: mergeable quantile sketch (exact until it first compacts, then
+  bounded rank error), serializable to bytes
+- GroupedSketches: one sketch per key (spec_key, dealer), updated chunk by chunk
+- Per-run spec price sketches are persisted in price_history.db and merged at
+  query time, so each run is only sketched once
+- sketch_pricing_fairness streams price_history.db run by run in two passes
+  (spec medians, then dealer rel_pct) and returns the same frame as
+  compute_pricing_fairness, plus an error report
+
+Usage: python3 quantile_sketch.py [--since RUN_ID] [--k 200] [--verify]
+"""
+
+import argparse
+import contextlib
+import functools
+import io
+import sqlite3
+import numpy as np
+import pandas as pd
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+import price_history
+import rank_dealers
+from dealer_resolver import DealerResolver
+
+DEFAULT_K = 200  # Level-0 capacity; rank error ~1.7% at k=200, ~0.4% at k=1000
+KLL_DECAY = 2 / 3  # Capacity ratio between adjacent levels
+# DataSketches' empirical 99%-confidence normalized rank error: coef / k ** exp
+KLL_RANK_ERROR_COEF = 1.668
+KLL_RANK_ERROR_EXP = 0.9723
+DEALER_STATS_COLUMNS = ['dealer_name', 'listings', 'unique_specs', 'median_rel_pct',
+                        'pct_below_median', 'pct_within_1pct', 'fairness_score']
+
+
+class KLLSketch:
+    """KLL quantile sketch over floats (Karnin, Lang & Liberty)."""
+
+    def __init__(self, k: int = DEFAULT_K, seed: Optional[int] = None):
+        self.k = k
+        self.n = 0
+        self.levels = [np.empty(0)]
+        self.rng = np.random.default_rng(seed)
+
+    def _capacity(self, h: int) -> int:
+        depth = len(self.levels) - h - 1
+        return max(2, int(np.ceil(self.k * KLL_DECAY ** depth)))
+
+    def _compress(self):
+        while sum(len(level) for level in self.levels) >= sum(self._capacity(h) for h in range(len(self.levels))):
+            for h, level in enumerate(self.levels):
+                if len(level) < self._capacity(h):
+                    continue
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                # Sort, keep every other item (random offset) at twice the weight; an odd one out stays
+                level = np.sort(level)
+                odd = len(level) % 2
+                promoted = level[:len(level) - odd][self.rng.integers(2)::2]
+                self.levels[h] = level[len(level) - odd:]
+                self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+                break
+
+    def update(self, values):
+        values = np.asarray(values, dtype='float64').ravel()
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self.n += len(values)
+        self._compress()
+
+    def merge(self, other: 'KLLSketch'):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, level in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], level])
+        self.n += other.n
+        self._compress()
+
+    @property
+    def is_exact(self) -> bool:
+        return len(self.levels) == 1
+
+    def rank_error(self) -> float:
+        """Normalized rank error bound (0 while every value is still held)."""
+        return 0.0 if self.is_exact else KLL_RANK_ERROR_COEF / self.k ** KLL_RANK_ERROR_EXP
+
+    def quantile(self, q: float) -> float:
+        if self.n == 0:
+            return np.nan
+        if self.is_exact:
+            return float(np.quantile(self.levels[0], q))
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2 ** h) for h, level in enumerate(self.levels)])
+        order = np.argsort(values, kind='stable')
+        cumulative = np.cumsum(weights[order])
+        idx = min(np.searchsorted(cumulative, q * self.n, side='left'), len(values) - 1)
+        return float(values[order][idx])
+
+    def median(self) -> float:
+        return float(np.median(self.levels[0])) if self.is_exact and self.n else self.quantile(0.5)
+
+    def median_bounds(self) -> Tuple[float, float]:
+        """Values at rank 0.5 -/+ the rank error: the true median lies between them."""
+        eps = self.rank_error()
+        if eps == 0:
+            median = self.median()
+            return median, median
+        return self.quantile(max(0.0, 0.5 - eps)), self.quantile(min(1.0, 0.5 + eps))
+
+    def to_bytes(self) -> bytes:
+        header = np.array([self.k, self.n, len(self.levels)] + [len(level) for level in self.levels], dtype='int64')
+        return header.tobytes() + np.concatenate(self.levels).astype('float64').tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'KLLSketch':
+        k, n, n_levels = np.frombuffer(data, dtype='int64', count=3)
+        sizes = np.frombuffer(data, dtype='int64', count=n_levels, offset=24)
+        values = np.frombuffer(data, dtype='float64', offset=24 + 8 * int(n_levels))
+        sketch = cls(int(k))
+        sketch.n = int(n)
+        sketch.levels = [arr.copy() for arr in np.split(values, np.cumsum(sizes)[:-1])]
+        return sketch
+
+
+class GroupedSketches:
+    """One KLLSketch per key, fed from (keys, values) column chunks."""
+
+    def __init__(self, k: int = DEFAULT_K):
+        self.k = k
+        self.sketches: Dict[str, KLLSketch] = {}
+
+    def update(self, keys: pd.Series, values: pd.Series):
+        codes, uniques = pd.factorize(keys)
+        order = np.argsort(codes, kind='stable')
+        bounds = np.flatnonzero(np.diff(codes[order])) + 1
+        for key, chunk in zip(uniques, np.split(values.to_numpy(dtype='float64')[order], bounds)):
+            if key not in self.sketches:
+                self.sketches[key] = KLLSketch(self.k)
+            self.sketches[key].update(chunk)
+
+    def merge(self, other: 'GroupedSketches'):
+        for key, sketch in other.sketches.items():
+            if key in self.sketches:
+                self.sketches[key].merge(sketch)
+            else:
+                self.sketches[key] = sketch
+
+    def medians(self) -> pd.Series:
+        return pd.Series({key: sketch.median() for key, sketch in self.sketches.items()}, dtype='float64')
+
+    def error_report(self) -> pd.DataFrame:
+        """Per key: count, whether exact, median and the bounds the true median lies in."""
+        rows = []
+        for key, sketch in self.sketches.items():
+            low, high = sketch.median_bounds()
+            rows.append({'key': key, 'n': sketch.n, 'exact': sketch.is_exact,
+                         'median': sketch.median(), 'median_low': low, 'median_high': high})
+        return pd.DataFrame(rows, columns=['key', 'n', 'exact', 'median', 'median_low', 'median_high'])
+
+
+# --- Streaming over price history ---
+
+def iter_history_runs(path: str = price_history.HISTORY_DB,
+                      since: Optional[str] = None) -> Iterator[Tuple[str, Callable[[], pd.DataFrame]]]:
+    """(run_id, load) for each run snapshot; load() reads the run's successful listings, normalized.
+
+    Nothing is read until load() is called (callers skip runs they already have sketches for),
+    and a loader is only valid until the iteration moves on. Dealer names are mapped through
+    the known aliases (no new resolution happens here).
+    """
+    resolver = DealerResolver()
+    aliases = {alias: canonical for alias, (canonical, _) in resolver.aliases().items()}
+    resolver.close()
+    conn = price_history.connect(path)
+
+    def load(run_id: str) -> pd.DataFrame:
+        run = pd.read_sql_query(
+            "SELECT vin, make, model, trim, year, dealer_name, full_price FROM listing_history "
+            "WHERE run_id = ? AND status = 'ok'", conn, params=(run_id,)
+        )
+        with contextlib.redirect_stdout(io.StringIO()):
+            listings = rank_dealers.normalize_data(run)
+        listings['dealer_name'] = listings['dealer_name'].map(aliases).fillna(listings['dealer_name'])
+        return listings
+
+    try:
+        run_ids = [r[0] for r in conn.execute(
+            "SELECT run_id FROM runs WHERE run_id >= ? ORDER BY run_id", (since or '',)
+        )]
+        for run_id in run_ids:
+            yield run_id, functools.partial(load, run_id)
+    finally:
+        conn.close()
+
+
+class SpecSketchStore:
+    """Per-run spec price sketches persisted next to the history they summarize."""
+
+    def __init__(self, path: str = price_history.HISTORY_DB):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS spec_price_sketches (
+                run_id TEXT NOT NULL,
+                spec_key TEXT NOT NULL,
+                k INTEGER NOT NULL,
+                sketch BLOB NOT NULL,
+                PRIMARY KEY (run_id, spec_key)
+            )
+        """)
+        self.conn.commit()
+
+    def load(self, run_id: str, k: int) -> Optional[GroupedSketches]:
+        rows = self.conn.execute(
+            "SELECT spec_key, sketch FROM spec_price_sketches WHERE run_id = ? AND k = ?", (run_id, k)
+        ).fetchall()
+        if not rows:
+            return None
+        grouped = GroupedSketches(k)
+        grouped.sketches = {spec: KLLSketch.from_bytes(blob) for spec, blob in rows}
+        return grouped
+
+    def save(self, run_id: str, grouped: GroupedSketches):
+        self.conn.execute("DELETE FROM spec_price_sketches WHERE run_id = ?", (run_id,))
+        self.conn.executemany(
+            "INSERT INTO spec_price_sketches (run_id, spec_key, k, sketch) VALUES (?, ?, ?, ?)",
+            ((run_id, spec, grouped.k, sketch.to_bytes()) for spec, sketch in grouped.sketches.items())
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+def sketch_pricing_fairness(partitions: Callable[[], Iterable[Tuple[str, Callable[[], pd.DataFrame]]]],
+                            k: int = DEFAULT_K, store: Optional[SpecSketchStore] = None
+                            ) -> Tuple[pd.DataFrame, Dict[str, pd.DataFrame]]:
+    """compute_pricing_fairness over partitions that never have to fit in memory together.
+
+    `partitions()` yields (partition_id, load) - load() returns the partition's normalized listings -
+    and is called twice: pass 1 builds merged spec price sketches, loading only partitions with no
+    sketch in `store` yet (so only new runs cost anything there), pass 2 feeds each
+    listing's rel_pct against the sketched spec median into per-dealer sketches. Counts, unique
+    specs and below/within-1% shares are exact given those medians.
+    Returns (dealer_stats, {'specs': ..., 'dealers': ...} error reports).
+    """
+    specs = GroupedSketches(k)
+    for partition_id, load in partitions():
+        partial = store.load(partition_id, k) if store else None
+        if partial is None:
+            listings = load()
+            partial = GroupedSketches(k)
+            partial.update(listings['spec_key'], listings['price'])
+            if store:
+                store.save(partition_id, partial)
+        specs.merge(partial)
+    spec_medians = specs.medians()
+
+    dealers = GroupedSketches(k)
+    counts = None
+    dealer_specs = pd.DataFrame(columns=['dealer_name', 'spec_key'])
+    for _, load in partitions():
+        listings = load()
+        median = listings['spec_key'].map(spec_medians).astype('float64')
+        rel_pct = (listings['price'].astype('float64') - median) / median
+        dealers.update(listings['dealer_name'], rel_pct)
+        chunk_counts = pd.DataFrame({
+            'listings': 1,
+            'below': (rel_pct < 0).astype('int64'),
+            'within': (rel_pct.abs() <= 0.01).astype('int64'),
+        }).groupby(listings['dealer_name'].to_numpy()).sum()
+        counts = chunk_counts if counts is None else counts.add(chunk_counts, fill_value=0)
+        dealer_specs = pd.concat([dealer_specs, listings[['dealer_name', 'spec_key']]]).drop_duplicates()
+
+    if counts is None:
+        return pd.DataFrame(columns=DEALER_STATS_COLUMNS), {}
+
+    counts = counts.sort_index()
+    dealer_stats = pd.DataFrame({
+        'dealer_name': counts.index,
+        'listings': counts['listings'].astype('int64').to_numpy(),
+        'unique_specs': dealer_specs.groupby('dealer_name').size().reindex(counts.index).to_numpy(),
+        'median_rel_pct': dealers.medians().reindex(counts.index).to_numpy(),
+        'pct_below_median': (counts['below'] / counts['listings']).to_numpy(),
+        'pct_within_1pct': (counts['within'] / counts['listings']).to_numpy(),
+    })
+    dealer_stats['fairness_score'] = rank_dealers.compute_fairness_score(
+        dealer_stats['median_rel_pct'], dealer_stats['listings']
+    )
+    return dealer_stats, {'specs': specs.error_report(), 'dealers': dealers.error_report()}
+
+
+def print_error_report(report: Dict[str, pd.DataFrame]):
+    specs, dealers = report['specs'], report['dealers']
+    price_error = ((specs['median_high'] - specs['median_low']) / 2 / specs['median']).abs()
+    rel_error = (dealers['median_high'] - dealers['median_low']) / 2
+    print(f"Spec medians:   {len(specs)} specs, {specs['exact'].sum()} exact; "
+          f"worst bound ±{price_error.max():.2%} of price (median spec ±{price_error.median():.2%})")
+    print(f"Dealer medians: {len(dealers)} dealers, {dealers['exact'].sum()} exact; "
+          f"worst bound ±{rel_error.max() * 100:.2f} pts of rel_pct")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sketch-backed pricing fairness over price history')
+    parser.add_argument('--db', default=price_history.HISTORY_DB)
+    parser.add_argument('--since', help='First run_id to include')
+    parser.add_argument('--k', type=int, default=DEFAULT_K, help='Sketch size (accuracy vs memory)')
+    parser.add_argument('--verify', action='store_true', help='Also compute exactly in memory and report the actual error')
+    args = parser.parse_args()
+
+    store = SpecSketchStore(args.db)
+    partitions = functools.partial(iter_history_runs, args.db, args.since)
+    dealer_stats, report = sketch_pricing_fairness(partitions, args.k, store)
+    store.close()
+    if dealer_stats.empty:
+        print(f"No runs in {args.db}")
+        return
+
+    print_error_report(report)
+    print("\n" + dealer_stats.sort_values('fairness_score', ascending=False).head(15).round(4).to_string(index=False))
+
+    if args.verify:
+        everything = pd.concat([load() for _, load in partitions()], ignore_index=True)
+        with contextlib.redirect_stdout(io.StringIO()):
+            exact = rank_dealers.compute_pricing_fairness(everything)
+        diff = (dealer_stats.set_index('dealer_name')['median_rel_pct']
+                - exact.set_index('dealer_name')['median_rel_pct']).abs()
+        print(f"\nActual error vs exact: max {diff.max() * 100:.3f} pts, mean {diff.mean() * 100:.3f} pts of median_rel_pct")
+
+
+if __name__ == '__main__':
+    main()
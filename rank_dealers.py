@@ -7,19 +7,28 @@ Outputs ranked table and top 5 dealers to visit.
 
 import pandas as pd
 import numpy as np
-from pathlib import Path
 import re
-import math
 from typing import Dict, Tuple, Optional
-from playwright.sync_api import sync_playwright
+from playwright.async_api import async_playwright
+import asyncio
+import sqlite3
 import time
 from urllib.parse import quote_plus
-import json
+from enrichment_pool import PagePool, SingleFlight
+from enrichment_cache import EnrichmentCache, ENRICHMENT_DB, LEGACY_CACHE_FILE
+from geo import Geocoder, GridIndex, coords_from_maps_url, extract_zip, haversine_miles, normalize_address
+from road_router import RoadRouter, load_router
+from dealer_resolver import DealerResolver, name_tokens
+from enrichment_planner import EnrichmentPlanner
+from near_duplicates import collapse_near_duplicates
+from results_store import RESULTS_DB, LEGACY_EXCEL_FILE, is_results_store, load_results, resolve_results_path
 
 # Configuration
-INPUT_FILE = 'scraped_car_data.xlsx'
-CACHE_FILE = 'dealer_info_cache.json'  # Cache for dealer info to avoid re-fetching
+INPUT_FILE = RESULTS_DB  # Falls back to the scraped_car_data.xlsx export if the store is missing
+CACHE_FILE = ENRICHMENT_DB  # Per-field dealer info cache (TTLs + negative caching) to avoid re-fetching
+RANKING_STATE_DB = 'ranking_state.db'  # Incremental pricing state when the input isn't the results store
 ORIGIN = "White Plains, NY 10601"
+ORIGINS = [ORIGIN]  # More than one -> per-origin rankings (override with --origins)
 EXCLUDE_ADDRESS = "229 N Franklin St, Hempstead, NY 11550"
 MAYBE_FAR_ADDRESS = "236 W Fordham Rd, Bronx, NY 10468"
 DRIVING_TIME_CUTOFF = 30  # minutes
@@ -30,9 +39,43 @@ WEIGHT_FAIRNESS = 0.35
 WEIGHT_PROXIMITY = 0.25
 WEIGHT_INVENTORY = 0.05
 
+# Enrichment concurrency
+ENRICHMENT_CONCURRENCY = 4  # Pages open at once (dealers enriched in parallel)
+ENDPOINT_MIN_INTERVAL = {  # Seconds between requests to each Google endpoint
+    'maps': 1.5,
+    'search': 3.0,
+}
+
+# Straight-line pre-filter (skips Maps directions for dealers that can't be within the cutoff)
+PREFILTER_MAX_SPEED_MPH = 65  # No drive averages faster than this along the straight line
+ZIP_CENTROID_MARGIN_MILES = 3  # Slack for coordinates that are only a ZIP centroid
+
+# Multi-origin mode: drive-time estimate when there's no road graph or Maps time for an origin
+ESTIMATE_DETOUR_FACTOR = 1.3  # Road miles per straight-line mile
+ESTIMATE_SPEED_MPH = 30
+
+# Weight-sensitivity mode (--sensitivity N / --sensitivity-step STEP)
+SENSITIVITY_CONCENTRATION = 50  # Dirichlet concentration around the current weights (higher = closer)
+SENSITIVITY_TOP_N = 5
+SENSITIVITY_CHUNK = 4096  # Weight vectors scored per matrix product (bounds memory)
+
+# Compact dtypes applied at load (repeating strings -> categoricals, numbers -> 32-bit)
+CATEGORICAL_COLUMNS = ['dealer_name', 'make', 'model', 'trim', 'spec_key',
+                       'dealer_address', 'dealer_city', 'dealer_state', 'dealer_zip']
+
+# Exclusion reasons that depend on the dealer's address (lifted when the scraped address changes)
+ADDRESS_EXCLUSION_REASONS = ('over ', 'straight-line', 'exclude address')
+
+# Precomputed features for ranking_service.py (stored alongside the listings)
+FEATURE_LISTINGS_TABLE = 'feature_listings'
+FEATURE_DEALERS_TABLE = 'feature_dealers'
+
 
 def normalize_column_name(df: pd.DataFrame, possible_names: list) -> Optional[str]:
-    """Fuzzy match column names."""
+    """Fuzzy match column names (exact matches first, so dealer_name beats dealer_address/dealer_id)."""
+    for name in possible_names:
+        if name in df.columns:
+            return name
     for col in df.columns:
         col_lower = col.lower().replace('_', '').replace(' ', '')
         for name in possible_names:
@@ -48,9 +91,17 @@ def load_and_normalize_data(filepath: str) -> pd.DataFrame:
     print("STEP 1: Loading and Normalizing Data")
     print("="*80)
     
-    df = pd.read_excel(filepath)
-    print(f"Loaded {len(df)} rows, {len(df.columns)} columns")
+    df = load_results(filepath)
+    print(f"Loaded {len(df)} rows, {len(df.columns)} columns from {filepath}")
+    loaded_bytes = df.memory_usage(deep=True).sum()
     
+    df = normalize_data(df)
+    print(f"Memory: {loaded_bytes / 1e6:.1f} MB as loaded -> {df.memory_usage(deep=True).sum() / 1e6:.1f} MB typed")
+    return df
+
+
+def normalize_data(df: pd.DataFrame) -> pd.DataFrame:
+    """Normalize column names, drop incomplete rows, and build spec_key."""
     # Normalize column names
     dealer_col = normalize_column_name(df, ['dealer_name', 'dealer', 'dealership'])
     year_col = normalize_column_name(df, ['year'])
@@ -85,18 +136,23 @@ def load_and_normalize_data(filepath: str) -> pd.DataFrame:
     df = df.dropna(subset=['dealer_name', 'price', 'year', 'make', 'model'])
     print(f"Filtered to {len(df)} rows with complete data (removed {initial_count - len(df)} rows)")
     
-    # Create spec_key
+    # Create spec_key: year|make|model|trim (trim omitted when empty)
+    # Built once per distinct combination, then broadcast back with the group codes
     df['trim'] = df.get('trim', '').fillna('')
-    df['spec_key'] = df.apply(
-        lambda row: f"{row['year']}|{row['make']}|{row['model']}|{row['trim']}" if row['trim'] 
-        else f"{row['year']}|{row['make']}|{row['model']}", 
-        axis=1
-    )
+    spec_cols = ['year', 'make', 'model', 'trim']
+    codes = df.groupby(spec_cols, sort=False).ngroup().to_numpy()
+    combos = df.loc[~pd.Series(codes).duplicated().to_numpy(), spec_cols]
+    base_key = combos['year'].astype(str) + '|' + combos['make'].astype(str) + '|' + combos['model'].astype(str)
+    trim = combos['trim'].astype(str)
+    spec_keys = base_key.where(trim == '', base_key + '|' + trim).to_numpy(dtype=object)
+    df['spec_key'] = spec_keys[codes]
     
     # Convert price to numeric
     df['price'] = pd.to_numeric(df['price'], errors='coerce')
     df = df.dropna(subset=['price'])
     
+    df = compact_dtypes(df)
+    
     print(f"Final dataset: {len(df)} rows")
     print(f"Unique dealers: {df['dealer_name'].nunique()}")
     print(f"Unique specs: {df['spec_key'].nunique()}")
@@ -104,46 +160,55 @@ def load_and_normalize_data(filepath: str) -> pd.DataFrame:
     return df
 
 
-def compute_pricing_fairness(df: pd.DataFrame) -> pd.DataFrame:
-    """Step 2: Compute pricing fairness scores per dealer."""
+def compact_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Typed schema for normalized listings: categoricals for repeating strings, int32 spec_code,
+    float32 price and int32 year (price is upcast to float64 wherever it's aggregated)."""
+    df = df.copy()
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    df['spec_code'] = df['spec_key'].cat.codes.astype('int32')
+    df['price'] = df['price'].astype('float32')
+    year = pd.to_numeric(df['year'], errors='coerce')
+    df['year'] = year.astype('int32') if year.notna().all() else year.astype('float32')
+    return df
+
+
+def memory_report(before: pd.DataFrame, after: pd.DataFrame) -> pd.DataFrame:
+    """Per-column memory (MB, deep) and dtype before/after compact_dtypes."""
+    columns = [c for c in after.columns if c in before.columns] + [c for c in after.columns if c not in before.columns]
+    report = pd.DataFrame({
+        'dtype_before': before.dtypes.reindex(columns).astype(str),
+        'mb_before': before.memory_usage(deep=True, index=False).reindex(columns) / 1e6,
+        'dtype_after': after.dtypes.reindex(columns).astype(str),
+        'mb_after': after.memory_usage(deep=True, index=False).reindex(columns) / 1e6,
+    })
+    report.loc['total'] = ['', report['mb_before'].sum(), '', report['mb_after'].sum()]
+    return report
+
+
+def compute_pricing_fairness(df: pd.DataFrame, engine: Optional[str] = None) -> pd.DataFrame:
+    """Step 2: Compute pricing fairness scores per dealer (on a columnar engine if one is named)."""
     print("\n" + "="*80)
-    print("STEP 2: Computing Pricing Fairness")
+    print("STEP 2: Computing Pricing Fairness" + (f" ({engine})" if engine else ""))
     print("="*80)
     
-    # Compute median price per spec
-    spec_medians = df.groupby('spec_key')['price'].median().to_dict()
-    df['spec_median_price'] = df['spec_key'].map(spec_medians)
+    if engine:
+        from ranking_engines import get_engine, pricing_fairness  # ranking_engines builds on this module
+        dealer_stats = pricing_fairness(df, get_engine(engine))
+        print(f"Computed fairness for {len(dealer_stats)} dealers")
+        print(f"Median fairness score: {dealer_stats['fairness_score'].median():.1f}")
+        return dealer_stats
+    
+    # Compute median price per spec (grouped on the integer spec codes)
+    price = df['price'].astype('float64')
+    spec = df['spec_code'] if 'spec_code' in df.columns else df['spec_key']
+    df['spec_median_price'] = price.groupby(spec, observed=True).transform('median')
     
     # Compute relative percentage
-    df['rel_pct'] = (df['price'] - df['spec_median_price']) / df['spec_median_price']
-    
-    # Aggregate per dealer
-    dealer_stats = df.groupby('dealer_name').agg({
-        'price': 'count',  # listings
-        'spec_key': 'nunique',  # unique_specs
-        'rel_pct': ['median', lambda x: (x < 0).sum() / len(x), lambda x: (x.abs() <= 0.01).sum() / len(x)]
-    }).reset_index()
-    
-    dealer_stats.columns = ['dealer_name', 'listings', 'unique_specs', 'median_rel_pct', 
-                           'pct_below_median', 'pct_within_1pct']
-    
-    # Compute fairness score
-    def calc_fairness_score(row):
-        # Clamp median_rel_pct to [-0.10, +0.10]
-        clamped = max(-0.10, min(0.10, row['median_rel_pct']))
-        
-        # Map to 0-100: -10% => 100, 0% => 50, +10% => 0
-        score = 50 - (clamped / 0.10) * 50
-        
-        # Apply small-sample penalty
-        if row['listings'] < 3:
-            score *= 0.8
-        elif row['listings'] < 5:
-            score *= 0.9
-        
-        return max(0, min(100, score))
+    df['rel_pct'] = (price - df['spec_median_price']) / df['spec_median_price']
     
-    dealer_stats['fairness_score'] = dealer_stats.apply(calc_fairness_score, axis=1)
+    dealer_stats = aggregate_dealer_pricing(df)
     
     print(f"Computed fairness for {len(dealer_stats)} dealers")
     print(f"Median fairness score: {dealer_stats['fairness_score'].median():.1f}")
@@ -151,449 +216,945 @@ def compute_pricing_fairness(df: pd.DataFrame) -> pd.DataFrame:
     return dealer_stats
 
 
-def get_google_reviews_and_address(dealer_name: str, browser_context) -> Dict:
-    """Step 3: Get Google reviews and address for a dealer."""
+def aggregate_dealer_pricing(listings: pd.DataFrame) -> pd.DataFrame:
+    """Per-dealer pricing aggregates and fairness score from listings with rel_pct."""
+    below_median = (listings['rel_pct'] < 0).astype('float64')
+    within_1pct = (listings['rel_pct'].abs() <= 0.01).astype('float64')
+    dealer_stats = listings.assign(_below_median=below_median, _within_1pct=within_1pct).groupby('dealer_name', observed=True).agg(
+        listings=('price', 'count'),
+        unique_specs=('spec_key', 'nunique'),
+        median_rel_pct=('rel_pct', 'median'),
+        pct_below_median=('_below_median', 'mean'),
+        pct_within_1pct=('_within_1pct', 'mean'),
+    ).reset_index()
+    
+    # Back to plain names in name order (categorical dealer names group in category order)
+    dealer_stats['dealer_name'] = dealer_stats['dealer_name'].astype(str)
+    dealer_stats = dealer_stats.sort_values('dealer_name', kind='stable').reset_index(drop=True)
+    
+    dealer_stats['fairness_score'] = compute_fairness_score(
+        dealer_stats['median_rel_pct'], dealer_stats['listings']
+    )
+    return dealer_stats
+
+
+def ranking_state_path(input_path: str) -> str:
+    """Keep the state in the results store it is diffed from; an Excel/CSV input gets its own file."""
+    return input_path if is_results_store(input_path) else RANKING_STATE_DB
+
+
+def incremental_pricing_fairness(df: pd.DataFrame, path: str = RESULTS_DB, rebuild: bool = False) -> pd.DataFrame:
+    """Step 2, incrementally: update the persisted ranking state with this run's listings.
+    
+    Only spec_keys with new/changed/removed listings get new medians, and only dealers with
+    listings in those specs are re-aggregated. Adds spec_median_price and rel_pct to `df` like
+    compute_pricing_fairness.
+    """
+    from ranking_state import RankingState  # ranking_state builds on this module's aggregation
+    
+    print("\n" + "="*80)
+    print("STEP 2: Computing Pricing Fairness (incremental)")
+    print("="*80)
+    
+    state = RankingState(path)
+    if rebuild:
+        state.clear()
+    start = time.perf_counter()
+    changed, specs, dealers = state.update(df)
+    print(f"{changed} new/changed/removed listings -> recomputed {len(specs)} specs and {len(dealers)} dealers "
+          f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+    dealer_stats = state.dealer_stats()
+    df['spec_median_price'] = df['spec_key'].map(state.spec_medians()).astype('float64')
+    df['rel_pct'] = (df['price'].astype('float64') - df['spec_median_price']) / df['spec_median_price']
+    state.close()
+    
+    print(f"Computed fairness for {len(dealer_stats)} dealers")
+    print(f"Median fairness score: {dealer_stats['fairness_score'].median():.1f}")
+    
+    return dealer_stats
+
+
+def compute_fairness_score(median_rel_pct: pd.Series, listings: pd.Series) -> pd.Series:
+    """Convert median relative price to a 0-100 fairness score (vectorized)."""
+    # Clamp median_rel_pct to [-0.10, +0.10] (a missing median clamps to +10%, i.e. score 0)
+    clamped = median_rel_pct.fillna(0.10).clip(-0.10, 0.10)
+    
+    # Map to 0-100: -10% => 100, 0% => 50, +10% => 0
+    score = 50 - (clamped / 0.10) * 50
+    
+    # Apply small-sample penalty
+    penalty = np.select([listings < 3, listings < 5], [0.8, 0.9], default=1.0)
+    score = score * penalty
+    
+    return score.clip(0, 100)
+
+
+# Google lookups tried per dealer, in preference order until the planner has measurements
+REVIEW_QUERY_VARIANTS = {
+    'maps:dealership': ('maps', '{name} dealership'),
+    'maps:auto dealer': ('maps', '{name} auto dealer'),
+    'maps:car dealer': ('maps', '{name} car dealer'),
+    'search:reviews': ('search', '{name} dealership reviews'),
+}
+LOOKUP_URLS = {
+    'maps': "https://www.google.com/maps/search/{query}",
+    'search': "https://www.google.com/search?q={query}",
+}
+# Elements worth waiting for (page is read as soon as one appears, instead of a fixed sleep)
+PLACE_READY_SELECTOR = 'div.F7nice, button[data-item-id="address"], span.Aq14fc, span.LrzXr, div[role="feed"]'
+ROUTE_READY_SELECTOR = '[id^="section-directions-trip"], div[data-attrid*="distance"], [aria-label*="mile"]'
+
+# One in-page pass: the place panel / route elements, matching aria-labels and JSON-LD.
+# The full body text is only sent back when none of the structured elements exist.
+EXTRACT_PAGE_JS = """
+() => {
+    const read = (selector) => {
+        const el = document.querySelector(selector);
+        return el ? (el.getAttribute('aria-label') || el.innerText || '').trim() : null;
+    };
+    const payload = {
+        url: location.href,
+        rating: read('div.F7nice span[aria-hidden="true"]') || read('span.Aq14fc'),
+        reviews: read('div.F7nice span[aria-label*="review"]') || read('div.F7nice span[aria-label]')
+            || read('a[data-async-trigger="reviewDialog"]'),
+        address: read('button[data-item-id="address"]') || read('span.LrzXr'),
+        route: Array.from(document.querySelectorAll('[id^="section-directions-trip"], div[data-attrid*="distance"]'))
+            .slice(0, 3).map((el) => el.innerText),
+        labels: Array.from(document.querySelectorAll('[aria-label]'))
+            .map((el) => el.getAttribute('aria-label'))
+            .filter((label) => /star|review|mile|\\bmin|address/i.test(label))
+            .slice(0, 40),
+        jsonld: Array.from(document.querySelectorAll('script[type="application/ld+json"]'))
+            .map((el) => el.textContent).join(' ').slice(0, 20000),
+        text: null,
+    };
+    if (!payload.rating && !payload.address && payload.route.length === 0) {
+        payload.text = (document.body.innerText || '').slice(0, 50000);
+    }
+    return payload;
+}
+"""
+
+# Python-side parsing of the payload (precompiled, run over a few short strings)
+RATING_VALUE_PATTERN = re.compile(r'\b([1-5]\.\d)\b')
+RATING_TEXT_PATTERNS = [
+    re.compile(r'(\d+\.\d+)\s*(?:stars?|★|⭐|out of 5|\/\s*5)', re.I),
+    re.compile(r'Rating[:\s]*(\d+\.\d+)', re.I),
+    re.compile(r'"ratingValue"\s*:\s*"?(\d+\.?\d*)'),
+]
+REVIEW_COUNT_PATTERNS = [
+    re.compile(r'([\d,]+)\s+(?:Google\s+)?(?:reviews?|ratings?)', re.I),
+    re.compile(r'\(([\d,]+)\)'),
+    re.compile(r'"reviewCount"\s*:\s*"?(\d+)'),
+]
+ADDRESS_PATTERNS = [
+    re.compile(r'(\d+\s+[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*\s+(?:St|Ave|Rd|Blvd|Dr|Ln|Way|Pkwy|Hwy|Street|Avenue|Road|Boulevard|Drive|Lane)[^,\n]*,\s*[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*,\s*[A-Z]{2}\s+\d{5})'),
+    re.compile(r'(\d+[^,\n]{10,50},\s*[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*,\s*[A-Z]{2}\s+\d{5})'),
+    re.compile(r'([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*,\s*[A-Z]{2}\s+\d{5})'),
+]
+ADDRESS_LABEL_PREFIX = re.compile(r'^Address:\s*', re.I)
+ADDRESS_REGIONS = ('NY', 'NJ', 'CT')
+DISTANCE_PATTERN = re.compile(r'(\d+(?:\.\d+)?)\s*(?:miles?|mi)\b', re.I)
+DURATION_PATTERN = re.compile(r'(?:(\d+)\s*(?:hours?|hrs?|h)\s*)?(\d+)\s*(?:minutes?|mins?|min)\b', re.I)
+
+
+def _first_number(patterns, texts, cast, valid) -> Optional[float]:
+    for pattern in patterns:
+        for text in texts:
+            if not text:
+                continue
+            match = pattern.search(text)
+            if match:
+                try:
+                    value = cast(match.group(1).replace(',', ''))
+                except ValueError:
+                    continue
+                if valid(value):
+                    return value
+    return None
+
+
+def parse_place_payload(payload: Dict, result: Dict):
+    """Fill missing address/rating/review_count/coordinates from an EXTRACT_PAGE_JS payload."""
+    # A single place result puts its coordinates in the URL (free geocode)
+    coords = coords_from_maps_url(payload.get('url'))
+    if coords and result['lat'] is None:
+        result['lat'], result['lon'] = coords
+    
+    labels = ' | '.join(payload.get('labels') or [])
+    fallback = [labels, payload.get('jsonld'), payload.get('text')]
+    
+    if not result['rating']:
+        result['rating'] = (
+            _first_number([RATING_VALUE_PATTERN], [payload.get('rating')], float, lambda r: 1.0 <= r <= 5.0)
+            or _first_number(RATING_TEXT_PATTERNS, fallback, float, lambda r: 1.0 <= r <= 5.0)
+        )
+    
+    if not result['review_count']:
+        result['review_count'] = _first_number(
+            REVIEW_COUNT_PATTERNS, [payload.get('reviews')] + fallback, int, lambda c: c > 0
+        )
+    
+    if not result['address']:
+        panel_address = ADDRESS_LABEL_PREFIX.sub('', payload.get('address') or '').strip()
+        candidates = [panel_address] if ADDRESS_PATTERNS[-1].search(panel_address) else []
+        for text in [labels, payload.get('text')]:
+            for pattern in ADDRESS_PATTERNS:
+                candidates.extend(m.strip() for m in pattern.findall(text or ''))
+        for addr in candidates:
+            if len(addr) > 10 and any(region in addr for region in ADDRESS_REGIONS):
+                result['address'] = addr
+                break
+
+
+async def _place_lookup(endpoint: str, query: str, pool: PagePool, result: Dict):
+    """Maps place search or Search knowledge panel for one query, read in a single evaluate()."""
+    url = LOOKUP_URLS[endpoint].format(query=quote_plus(query))
+    async with pool.page(endpoint) as page:
+        await page.goto(url, wait_until="domcontentloaded", timeout=30000)
+        try:
+            await page.wait_for_selector(PLACE_READY_SELECTOR, timeout=4000)
+        except Exception:
+            pass  # Read whatever rendered
+        payload = await page.evaluate(EXTRACT_PAGE_JS)
+    parse_place_payload(payload, result)
+
+
+async def get_google_reviews_and_address(dealer_name: str, pool: PagePool, planner: EnrichmentPlanner,
+                                         need_address: bool = True) -> Dict:
+    """Step 3: Get Google reviews (and address, unless already known) for a dealer.
+    
+    Query variants are tried cheapest-expected-cost first and stop once everything needed is found.
+    """
     result = {
         'address': None,
         'rating': None,
-        'review_count': None
+        'review_count': None,
+        'lat': None,
+        'lon': None,
     }
-    
-    try:
-        # Try Google Maps search first (more reliable for addresses)
-        queries = [
-            f"{dealer_name} dealership",
-            f"{dealer_name} auto dealer",
-            f"{dealer_name} car dealer"
-        ]
-        
-        for query in queries:
+    for variant in planner.order_variants('reviews', list(REVIEW_QUERY_VARIANTS)):
+        if result['rating'] and (result['address'] or not need_address):
+            break
+        endpoint, template = REVIEW_QUERY_VARIANTS[variant]
+        before = (result['address'], result['rating'])
+        with planner.timed('reviews', variant) as outcome:
             try:
-                # Try Google Maps directly
-                maps_url = f"https://www.google.com/maps/search/{quote_plus(query)}"
-                
-                page = browser_context.new_page()
-                page.goto(maps_url, wait_until="domcontentloaded", timeout=30000)
-                time.sleep(4)  # Wait for maps to load
-                
-                # Try to get address from URL or page content
-                current_url = page.url
-                content = page.content()
-                page_text = page.inner_text('body')
-                
-                # Extract from URL if it contains coordinates/place
-                if '/place/' in current_url or '/@' in current_url:
-                    # URL might have address info
-                    pass
-                
-                # Look for address in page text - Maps shows it prominently
-                # Try to find address patterns in visible text
-                address_patterns = [
-                    r'(\d+\s+[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*\s+(?:St|Ave|Rd|Blvd|Dr|Ln|Way|Pkwy|Hwy|Street|Avenue|Road|Boulevard|Drive|Lane)[^,\n]*,\s*[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*,\s*[A-Z]{2}\s+\d{5})',
-                    r'(\d+\s+[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*\s+(?:St|Ave|Rd|Blvd|Dr|Ln|Way|Pkwy|Hwy)[^,\n]*,\s*[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*,\s*[A-Z]{2}\s+\d{5})',
-                    r'([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*,\s*[A-Z]{2}\s+\d{5})',
-                ]
-                
-                # Search in page text (more reliable than HTML)
-                for pattern in address_patterns:
-                    matches = re.findall(pattern, page_text)
-                    for match in matches:
-                        addr = match.strip() if isinstance(match, str) else match[0].strip() if match else None
-                        if addr and len(addr) > 10 and ('NY' in addr or 'NJ' in addr or 'CT' in addr):
-                            result['address'] = addr
-                            break
-                    if result['address']:
-                        break
-                
-                # Extract rating from Maps page - try multiple approaches
-                # Google Maps shows rating in various formats
-                rating_patterns = [
-                    r'(\d+\.\d+)\s*(?:stars?|★|⭐|out of 5|\/5)',
-                    r'Rating[:\s]*(\d+\.\d+)',
-                    r'(\d+\.\d+)\s*\/\s*5',
-                    r'(\d+\.\d+)\s*out of 5',
-                    r'aria-label="[^"]*(\d+\.\d+)[^"]*stars?',
-                    r'data-value="(\d+\.\d+)"',  # Sometimes in data attributes
-                ]
-                
-                # Also check HTML content for structured data
-                for pattern in rating_patterns:
-                    # Try in page text
-                    match = re.search(pattern, page_text, re.I)
-                    if match:
-                        try:
-                            rating = float(match.group(1))
-                            if 1.0 <= rating <= 5.0:
-                                result['rating'] = rating
-                                break
-                        except:
-                            continue
-                    
-                    # Try in HTML content
-                    match = re.search(pattern, content, re.I)
-                    if match:
-                        try:
-                            rating = float(match.group(1))
-                            if 1.0 <= rating <= 5.0:
-                                result['rating'] = rating
-                                break
-                        except:
-                            continue
-                
-                # Extract review count - Google Maps shows it near the rating
-                review_patterns = [
-                    r'([\d,]+)\s+reviews?',
-                    r'\(([\d,]+)\s*reviews?\)',
-                    r'([\d,]+)\s+Google reviews?',
-                    r'([\d,]+)\s+ratings?',
-                    r'reviewCount["\']?\s*:\s*["\']?(\d+)',  # JSON-LD format
-                    r'"reviewCount"\s*:\s*(\d+)',
-                ]
-                
-                for pattern in review_patterns:
-                    # Try in page text first
-                    match = re.search(pattern, page_text, re.I)
-                    if match:
-                        try:
-                            count_str = match.group(1).replace(',', '')
-                            count = int(count_str)
-                            if count > 0:  # Valid review count
-                                result['review_count'] = count
-                                break
-                        except:
-                            continue
-                    
-                    # Try in HTML content
-                    match = re.search(pattern, content, re.I)
-                    if match:
-                        try:
-                            count_str = match.group(1).replace(',', '')
-                            count = int(count_str)
-                            if count > 0:
-                                result['review_count'] = count
-                                break
-                        except:
-                            continue
-                
-                page.close()
-                
-                # If we got address, we're good (rating/reviews are bonus)
-                if result['address']:
-                    break
-                    
-            except Exception as e:
-                try:
-                    page.close()
-                except:
-                    pass
-                continue
-        
-        # If still no address or reviews, try regular Google search as fallback
-        if not result['address'] or not result['rating']:
-            try:
-                search_url = f"https://www.google.com/search?q={quote_plus(dealer_name + ' dealership reviews')}"
-                page = browser_context.new_page()
-                page.goto(search_url, wait_until="domcontentloaded", timeout=30000)
-                time.sleep(4)  # Wait for knowledge panel to load
-                
-                page_text = page.inner_text('body')
-                content = page.content()
-                
-                # Try to extract from knowledge panel (right sidebar)
-                # Google shows rating and reviews prominently in knowledge panel
-                
-                # Extract rating if not already found
-                if not result['rating']:
-                    rating_patterns = [
-                        r'(\d+\.\d+)\s*(?:stars?|★|⭐)',
-                        r'(\d+\.\d+)\s*out of 5',
-                        r'Rating[:\s]*(\d+\.\d+)',
-                        r'aria-label="[^"]*(\d+\.\d+)[^"]*stars?',
-                    ]
-                    for pattern in rating_patterns:
-                        match = re.search(pattern, page_text, re.I)
-                        if match:
-                            try:
-                                rating = float(match.group(1))
-                                if 1.0 <= rating <= 5.0:
-                                    result['rating'] = rating
-                                    break
-                            except:
-                                continue
-                
-                # Extract review count if not already found
-                if not result['review_count']:
-                    review_patterns = [
-                        r'([\d,]+)\s+reviews?',
-                        r'\(([\d,]+)\s*reviews?\)',
-                        r'([\d,]+)\s+Google reviews?',
-                    ]
-                    for pattern in review_patterns:
-                        match = re.search(pattern, page_text, re.I)
-                        if match:
-                            try:
-                                count_str = match.group(1).replace(',', '')
-                                count = int(count_str)
-                                if count > 0:
-                                    result['review_count'] = count
-                                    break
-                            except:
-                                continue
-                
-                # Try simpler address patterns if still missing
-                if not result['address']:
-                    simple_patterns = [
-                        r'(\d+[^,\n]{10,50},\s*[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*,\s*[A-Z]{2}\s+\d{5})',
-                        r'([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*,\s*[A-Z]{2}\s+\d{5})',
-                    ]
-                    for pattern in simple_patterns:
-                        matches = re.findall(pattern, page_text)
-                        for match in matches:
-                            addr = match.strip()
-                            if addr and len(addr) > 10 and ('NY' in addr or 'NJ' in addr or 'CT' in addr):
-                                result['address'] = addr
-                                break
-                        if result['address']:
-                            break
-                
-                page.close()
-            except Exception as e:
-                try:
-                    page.close()
-                except:
-                    pass
-        
-        return result
-        
-    except Exception as e:
-        print(f"  Error getting reviews for {dealer_name}: {e}")
-        return result
+                await _place_lookup(endpoint, template.format(name=dealer_name), pool, result)
+            except Exception:
+                pass  # Try next variant
+            outcome['success'] = bool(
+                (result['rating'] and not before[1]) or (need_address and result['address'] and not before[0])
+            )
+    
+    return result
 
 
-def compute_reviews_score(rating: Optional[float], review_count: Optional[int]) -> float:
+def compute_reviews_score(rating: pd.Series) -> pd.Series:
     """Convert Google reviews to 0-100 score (rating only - review count removed due to insufficient data)."""
-    if rating is None:
-        return 0.0
+    rating = pd.to_numeric(rating, errors='coerce')
     
     # Rating score: 3.0 stars -> 0, 5.0 -> 100
     # Only use rating since review count data is insufficient (only 38.5% coverage)
     rating_score = ((rating - 3.0) / (5.0 - 3.0)) * 100
-    rating_score = max(0, min(100, rating_score))
     
-    return rating_score
+    # Missing rating -> 0
+    return rating_score.clip(0, 100).fillna(0.0)
 
 
-def get_distance_and_time(origin: str, destination: str, browser_context) -> Tuple[Optional[float], Optional[float]]:
-    """Step 4: Get driving distance (miles) and time (minutes) from origin to destination."""
-    distance_miles = None
-    time_minutes = None
+def _duration_minutes(match) -> int:
+    hours, minutes = match.group(1), match.group(2)
+    return int(hours or 0) * 60 + int(minutes)
+
+
+def parse_route_payload(payload: Dict) -> Tuple[Optional[float], Optional[int]]:
+    """Distance (miles) and time (minutes) from an EXTRACT_PAGE_JS payload.
     
-    # Try multiple methods
-    methods = [
-        ("Google Maps Directions", f"https://www.google.com/maps/dir/{quote_plus(origin)}/{quote_plus(destination)}"),
-        ("Google Search Distance", f"https://www.google.com/search?q={quote_plus(f'driving distance from {origin} to {destination}')}"),
-    ]
+    Distance and time must come from the same route element/label/line, so we don't pair a
+    route's distance with some other number on the page. Times like "1 hr 5 min" count the hours.
+    """
+    chunks = list(payload.get('route') or []) + list(payload.get('labels') or [])
+    text = payload.get('text')
+    if text:
+        lines = text.split('\n')
+        chunks += lines + [a + ' ' + b for a, b in zip(lines, lines[1:])]
     
-    for method_name, url in methods:
-        try:
-            page = browser_context.new_page()
-            page.goto(url, wait_until="domcontentloaded", timeout=30000)
-            time.sleep(6)  # Wait longer for content to load
-            
-            # Get page content
-            page_text = page.inner_text('body')
-            content = page.content()
-            
-            # Method 1: Look for structured data in HTML
-            # Google Maps often has data attributes or structured content
-            try:
-                # Try to find distance/time in data attributes
-                distance_elem = page.query_selector('[data-value*="mi"], [aria-label*="mile"], [aria-label*="minute"]')
-                if distance_elem:
-                    aria_label = distance_elem.get_attribute('aria-label')
-                    if aria_label:
-                        # Extract from aria-label
-                        dist_match = re.search(r'(\d+\.?\d*)\s*(?:miles?|mi\.?)', aria_label, re.I)
-                        time_match = re.search(r'(\d+)\s*(?:min(?:utes?)?|mins?)', aria_label, re.I)
-                        if dist_match:
-                            distance_miles = float(dist_match.group(1))
-                        if time_match:
-                            time_minutes = int(time_match.group(1))
-            except:
-                pass
-            
-            # Method 2: Extract from visible text with better patterns - check line by line
-            if not distance_miles or not time_minutes:
-                # Split text into lines and look for lines containing both distance and time
-                lines = page_text.split('\n')
-                for i, line in enumerate(lines):
-                    # Check if line contains both distance and time indicators
-                    if ('mi' in line.lower() or 'mile' in line.lower()) and ('min' in line.lower()):
-                        dist_match = re.search(r'(\d+\.?\d*)\s*(?:miles?|mi\.?)', line, re.I)
-                        time_match = re.search(r'(\d+)\s*(?:min(?:utes?)?|mins?)', line, re.I)
-                        if dist_match and time_match:
-                            try:
-                                dist = float(dist_match.group(1))
-                                t = int(time_match.group(1))
-                                if 0.1 <= dist <= 200 and 1 <= t <= 300:
-                                    distance_miles = dist
-                                    time_minutes = t
-                                    break
-                            except:
-                                continue
-                    # Also check current line + next line (they might be on separate lines)
-                    if i < len(lines) - 1:
-                        combined = line + ' ' + lines[i+1]
-                        dist_match = re.search(r'(\d+\.?\d*)\s*(?:miles?|mi\.?)', combined, re.I)
-                        time_match = re.search(r'(\d+)\s*(?:min(?:utes?)?|mins?)', combined, re.I)
-                        if dist_match and time_match:
-                            try:
-                                dist = float(dist_match.group(1))
-                                t = int(time_match.group(1))
-                                if 0.1 <= dist <= 200 and 1 <= t <= 300:
-                                    distance_miles = dist
-                                    time_minutes = t
-                                    break
-                            except:
-                                continue
-                
-                # If still not found, try combined patterns on full text
-                if not distance_miles or not time_minutes:
-                    combined_patterns = [
-                        r'(\d+\.?\d*)\s*(?:miles?|mi\.?)[,\s]+(\d+)\s*(?:min(?:utes?)?|mins?)',
-                        r'(\d+)\s*(?:min(?:utes?)?|mins?)[,\s]+(\d+\.?\d*)\s*(?:miles?|mi\.?)',
-                        r'(\d+\.?\d*)\s*mi[^\d]*(\d+)\s*min',
-                        r'(\d+)\s*min[^\d]*(\d+\.?\d*)\s*mi',
-                    ]
-                    
-                    for pattern in combined_patterns:
-                        matches = re.findall(pattern, page_text, re.I)
-                        for match in matches:
-                            try:
-                                val1, val2 = match
-                                # Determine which is distance and which is time
-                                if 'mi' in pattern or 'mile' in pattern:
-                                    dist = float(val1)
-                                    t = int(val2)
-                                else:
-                                    t = int(val1)
-                                    dist = float(val2)
-                                
-                                # Validate ranges
-                                if 0.1 <= dist <= 200 and 1 <= t <= 300:
-                                    distance_miles = dist
-                                    time_minutes = t
-                                    break
-                            except:
-                                continue
-                        if distance_miles and time_minutes:
-                            break
-            
-            # Method 3: Search separately if not found together
-            if not distance_miles:
-                # Look for distance patterns - be more specific
-                distance_patterns = [
-                    r'(\d+\.?\d*)\s*(?:miles?|mi\.?)\b',
-                    r'(\d+\.?\d*)\s*mi\b',
-                    r'Distance[:\s]+(\d+\.?\d*)\s*(?:miles?|mi\.?)',
-                ]
-                for pattern in distance_patterns:
-                    matches = re.findall(pattern, page_text, re.I)
-                    for match in matches:
-                        try:
-                            dist = float(match)
-                            if 0.1 <= dist <= 200:
-                                distance_miles = dist
-                                break
-                        except:
-                            continue
-                    if distance_miles:
-                        break
-            
-            if not time_minutes:
-                time_patterns = [
-                    r'(\d+)\s*(?:min(?:utes?)?|mins?)\b',
-                    r'(\d+)\s*min\b',
-                    r'Time[:\s]+(\d+)\s*(?:min(?:utes?)?|mins?)',
-                ]
-                for pattern in time_patterns:
-                    matches = re.findall(pattern, page_text, re.I)
-                    for match in matches:
-                        try:
-                            t = int(match)
-                            if 1 <= t <= 300:
-                                time_minutes = t
-                                break
-                        except:
-                            continue
-                    if time_minutes:
-                        break
-            
-            page.close()
-            
-            # If we got both, we're done
-            if distance_miles and time_minutes:
-                return distance_miles, time_minutes
-                
-        except Exception as e:
+    for chunk in chunks:
+        dist_match = DISTANCE_PATTERN.search(chunk)
+        time_match = DURATION_PATTERN.search(chunk) if dist_match else None
+        if dist_match and time_match:
+            dist = float(dist_match.group(1))
+            minutes = _duration_minutes(time_match)
+            if 0.1 <= dist <= 200 and 1 <= minutes <= 300:
+                return dist, minutes
+    return None, None
+
+
+# Route lookups, in preference order until the planner has measurements
+DISTANCE_METHODS = {
+    'maps:directions': ('maps', "https://www.google.com/maps/dir/{origin}/{destination}"),
+    'search:distance': ('search', "https://www.google.com/search?q=driving+distance+from+{origin}+to+{destination}"),
+}
+
+
+async def get_distance_and_time(origin: str, destination: str, pool: PagePool,
+                                planner: EnrichmentPlanner) -> Tuple[Optional[float], Optional[float]]:
+    """Step 4: Get driving distance (miles) and time (minutes) from origin to destination."""
+    # Try methods in order of expected cost per success
+    for variant in planner.order_variants('maps_distance', list(DISTANCE_METHODS)):
+        endpoint, url_template = DISTANCE_METHODS[variant]
+        url = url_template.format(origin=quote_plus(origin), destination=quote_plus(destination))
+        with planner.timed('maps_distance', variant) as outcome:
             try:
-                page.close()
-            except:
-                pass
-            continue  # Try next method
+                async with pool.page(endpoint) as page:
+                    await page.goto(url, wait_until="domcontentloaded", timeout=30000)
+                    try:
+                        await page.wait_for_selector(ROUTE_READY_SELECTOR, timeout=6000)
+                    except Exception:
+                        pass  # Read whatever rendered
+                    payload = await page.evaluate(EXTRACT_PAGE_JS)
+                distance_miles, time_minutes = parse_route_payload(payload)
+            except Exception:
+                distance_miles, time_minutes = None, None  # Try next method
+            outcome['success'] = bool(distance_miles and time_minutes)
+        
+        if distance_miles and time_minutes:
+            return distance_miles, time_minutes
     
-    # If all methods failed, return None
-    return distance_miles, time_minutes
+    return None, None
 
 
-def compute_proximity_score(driving_time_minutes: Optional[float]) -> float:
-    """Convert driving time to 0-100 proximity score."""
-    import pandas as pd
-    import numpy as np
-    
-    # Handle both None and NaN (pandas uses NaN for missing values)
-    if driving_time_minutes is None or pd.isna(driving_time_minutes):
-        # If no distance data, give a neutral score (50) instead of 0
-        # This allows ranking to proceed based on other factors
-        return 50.0
+def compute_proximity_score(driving_time_minutes: pd.Series, cutoff: Optional[float] = None) -> pd.Series:
+    """Convert driving time to 0-100 proximity score (cutoff defaults to DRIVING_TIME_CUTOFF)."""
+    cutoff = DRIVING_TIME_CUTOFF if cutoff is None else cutoff
+    driving_time_minutes = pd.to_numeric(driving_time_minutes, errors='coerce')
     
-    if driving_time_minutes > DRIVING_TIME_CUTOFF:
-        return 0.0
+    score = (100 - (driving_time_minutes / cutoff) * 100).clip(0, 100)
+    score = score.where(~(driving_time_minutes > cutoff), 0.0)
     
-    score = 100 - (driving_time_minutes / DRIVING_TIME_CUTOFF) * 100
-    return max(0, min(100, score))
+    # If no distance data, give a neutral score (50) instead of 0
+    # This allows ranking to proceed based on other factors
+    return score.fillna(50.0)
 
 
-def compute_inventory_score(listings: int, all_listings: pd.Series) -> float:
-    """Step 5: Compute inventory score (0-100)."""
-    if len(all_listings) == 0:
-        return 50.0
+def compute_inventory_score(listings: pd.Series) -> pd.Series:
+    """Step 5: Compute inventory score (0-100), min-max scaled over all dealers."""
+    if len(listings) == 0:
+        return pd.Series(dtype='float64', index=listings.index)
     
-    min_listings = all_listings.min()
-    max_listings = all_listings.max()
+    min_listings = listings.min()
+    max_listings = listings.max()
     
     if min_listings == max_listings:
-        return 50.0
+        return pd.Series(50.0, index=listings.index)
     
     score = ((listings - min_listings) / (max_listings - min_listings)) * 100
-    return max(0, min(100, score))
+    return score.clip(0, 100).astype('float64')
+
+
+def score_and_rank(dealer_stats: pd.DataFrame) -> pd.DataFrame:
+    """Steps 5 & 6: Compute component scores, apply the cutoff, and rank by composite score."""
+    dealer_stats = dealer_stats.copy()
+    dealer_stats['reviews_score'] = compute_reviews_score(dealer_stats['google_rating'])  # review_count removed - insufficient data
+    dealer_stats['proximity_score'] = compute_proximity_score(dealer_stats['driving_time_minutes'])
+    dealer_stats['inventory_score'] = compute_inventory_score(dealer_stats['listings'])
+    
+    # Apply STRICT 30-minute cutoff: filter out dealers with known distance > 30 min
+    # Also filter out dealers without distance data (can't verify they're within 30 min)
+    before_cutoff = len(dealer_stats)
+    dealer_stats = dealer_stats[
+        (dealer_stats['driving_time_minutes'].notna()) & 
+        (dealer_stats['driving_time_minutes'] <= DRIVING_TIME_CUTOFF)
+    ].copy()
+    after_cutoff = len(dealer_stats)
+    if before_cutoff > after_cutoff:
+        print(f"Filtered out {before_cutoff - after_cutoff} dealers (over 30-minute cutoff or missing distance data)")
+    
+    # Composite score
+    dealer_stats['composite_score'] = (
+        WEIGHT_REVIEWS * dealer_stats['reviews_score'] +
+        WEIGHT_FAIRNESS * dealer_stats['fairness_score'] +
+        WEIGHT_PROXIMITY * dealer_stats['proximity_score'] +
+        WEIGHT_INVENTORY * dealer_stats['inventory_score']
+    )
+    
+    # Sort by composite score (with tie-breakers)
+    dealer_stats = dealer_stats.sort_values(
+        by=['composite_score', 'reviews_score', 'median_rel_pct', 'listings'],
+        ascending=[False, False, True, False]
+    ).reset_index(drop=True)
+    
+    dealer_stats['rank'] = range(1, len(dealer_stats) + 1)
+    return dealer_stats
 
 
-def main():
-    """Main ranking workflow."""
+def drive_time_matrix(dealer_info: Dict[str, Dict], origins: list, geocoder: Geocoder,
+                      router: Optional[RoadRouter] = None) -> pd.DataFrame:
+    """Dealer x origin driving minutes (NaN = unknown or out of reach).
+    
+    Dealer coordinates come from the geocode cache; a grid index limits each origin to
+    dealers within straight-line reach of the cutoff. Times come from the cached Maps
+    lookup (ORIGIN only), then the road graph, then a straight-line estimate.
+    """
+    names = list(dealer_info)
+    coords = [geocoder.geocode(info.get('address')) for info in dealer_info.values()]
+    lat = np.array([c[0] if c else np.nan for c in coords])
+    lon = np.array([c[1] if c else np.nan for c in coords])
+    exact = np.array([bool(c) and c[2] != 'zip' for c in coords], dtype=bool)
+    maps_minutes = pd.to_numeric(
+        pd.Series([info.get('driving_time_minutes') for info in dealer_info.values()], dtype='object'),
+        errors='coerce'
+    ).to_numpy(dtype='float64')
+    
+    index = GridIndex(lat, lon)
+    reach_miles = DRIVING_TIME_CUTOFF / 60 * PREFILTER_MAX_SPEED_MPH + 2 * ZIP_CENTROID_MARGIN_MILES
+    matrix = np.full((len(names), len(origins)), np.nan)
+    
+    for j, origin in enumerate(origins):
+        if origin == ORIGIN:
+            matrix[:, j] = maps_minutes
+        origin_coords = geocoder.geocode(origin)
+        if origin_coords is None:
+            print(f"  ⚠ Can't locate origin '{origin}' (needs a ZIP code or cached geocode)")
+            continue
+        
+        nearby = index.within(origin_coords[0], origin_coords[1], reach_miles)
+        todo = nearby[np.isnan(matrix[nearby, j])]
+        if router is not None:
+            routable = todo[exact[todo]]
+            routes = router.drive_times(origin_coords[:2], {i: (lat[i], lon[i]) for i in routable})
+            for i, (_, minutes) in routes.items():
+                if minutes is not None:
+                    matrix[i, j] = minutes
+            todo = todo[np.isnan(matrix[todo, j])]
+        
+        miles = haversine_miles(origin_coords[0], origin_coords[1], lat[todo], lon[todo])
+        matrix[todo, j] = np.round(miles * ESTIMATE_DETOUR_FACTOR / ESTIMATE_SPEED_MPH * 60)
+    
+    return pd.DataFrame(matrix, index=names, columns=origins)
+
+
+def rank_for_origins(dealer_stats: pd.DataFrame, drive_times: pd.DataFrame) -> pd.DataFrame:
+    """Per-origin rankings in one vectorized pass (long format: one row per origin x ranked dealer).
+    
+    Reviews, fairness and inventory scores don't depend on the origin, so they're computed
+    once; only proximity and the cutoff vary across the dealer x origin matrix.
+    Tie-breakers match score_and_rank.
+    """
+    stats = dealer_stats.reset_index(drop=True)
+    minutes = drive_times.reindex(stats['dealer_name']).to_numpy(dtype='float64')
+    shape = minutes.shape
+    
+    reviews = compute_reviews_score(stats['google_rating']).to_numpy()
+    inventory = compute_inventory_score(stats['listings']).to_numpy(dtype='float64')
+    fairness = stats['fairness_score'].to_numpy(dtype='float64')
+    proximity = np.clip(100 - (minutes / DRIVING_TIME_CUTOFF) * 100, 0, 100)
+    valid = minutes <= DRIVING_TIME_CUTOFF
+    composite = (
+        (WEIGHT_REVIEWS * reviews + WEIGHT_FAIRNESS * fairness)[:, None] +
+        WEIGHT_PROXIMITY * proximity +
+        (WEIGHT_INVENTORY * inventory)[:, None]
+    )
+    
+    # Rank every origin column at once; dealers over the cutoff sort last and are dropped
+    order = np.lexsort((
+        np.broadcast_to(-stats['listings'].to_numpy(dtype='float64')[:, None], shape),
+        np.broadcast_to(stats['median_rel_pct'].to_numpy(dtype='float64')[:, None], shape),
+        np.broadcast_to(-reviews[:, None], shape),
+        np.where(valid, -composite, np.inf),
+    ), axis=0)
+    rank = np.empty(shape, dtype='int64')
+    np.put_along_axis(rank, order, np.broadcast_to(np.arange(1, shape[0] + 1)[:, None], shape), axis=0)
+    
+    d_idx, o_idx = np.nonzero(valid)
+    out_order = np.lexsort((rank[d_idx, o_idx], o_idx))
+    d_idx, o_idx = d_idx[out_order], o_idx[out_order]
+    
+    ranked = stats.iloc[d_idx].reset_index(drop=True)
+    ranked.insert(0, 'origin', drive_times.columns.to_numpy()[o_idx])
+    ranked['driving_time_minutes'] = minutes[d_idx, o_idx]
+    ranked['reviews_score'] = reviews[d_idx]
+    ranked['proximity_score'] = proximity[d_idx, o_idx]
+    ranked['inventory_score'] = inventory[d_idx]
+    ranked['composite_score'] = composite[d_idx, o_idx]
+    ranked['rank'] = rank[d_idx, o_idx]
+    return ranked
+
+
+def output_multi_origin(dealer_stats: pd.DataFrame, dealer_info: Dict[str, Dict], drive_times: pd.DataFrame):
+    """Rank for every origin, save one long table and print each origin's top 5."""
+    print("\n" + "="*80)
+    print(f"MULTI-ORIGIN RANKING ({len(drive_times.columns)} origins)")
+    print("="*80)
+    
+    info_df = pd.DataFrame.from_dict(
+        dealer_info, orient='index', columns=['address', 'rating', 'review_count']
+    ).rename(columns={'rating': 'google_rating', 'review_count': 'google_review_count'})
+    dealer_stats = dealer_stats.join(info_df, on='dealer_name')
+    
+    # Origin-independent exclusion (distance exclusions in the cache are relative to ORIGIN only)
+    excluded = dealer_stats['address'].fillna('').str.lower().str.contains(EXCLUDE_ADDRESS.lower(), regex=False)
+    dealer_stats = dealer_stats[~excluded]
+    
+    ranked = rank_for_origins(dealer_stats, drive_times)
+    
+    output_cols = [
+        'origin', 'rank', 'dealer_name', 'address', 'driving_time_minutes',
+        'google_rating', 'listings', 'unique_specs',
+        'median_rel_pct', 'pct_below_median', 'fairness_score',
+        'reviews_score', 'proximity_score', 'inventory_score', 'composite_score'
+    ]
+    output_df = ranked[output_cols].copy()
+    output_df['median_rel_pct'] = (output_df['median_rel_pct'] * 100).round(2)
+    output_df['pct_below_median'] = (output_df['pct_below_median'] * 100).round(1)
+    for col in ['fairness_score', 'reviews_score', 'proximity_score', 'inventory_score', 'composite_score']:
+        output_df[col] = output_df[col].round(1)
+    
+    output_file = 'ranked_dealers_by_origin.xlsx'
+    output_df.to_excel(output_file, index=False, engine='openpyxl')
+    print(f"✓ Saved per-origin rankings to: {output_file}")
+    
+    for origin in drive_times.columns:
+        top5 = output_df[output_df['origin'] == origin].head(5)
+        print(f"\nTop 5 from {origin} ({(output_df['origin'] == origin).sum()} dealers within {DRIVING_TIME_CUTOFF} min):")
+        for _, row in top5.iterrows():
+            print(f"  {row['rank']}. {row['dealer_name']} - {row['driving_time_minutes']:.0f} min, "
+                  f"score {row['composite_score']:.1f}")
+
+
+def sample_weight_vectors(n: int, concentration: float = SENSITIVITY_CONCENTRATION, seed: int = 0) -> np.ndarray:
+    """n random (reviews, fairness, proximity, inventory) weight vectors around the current weights."""
+    base = np.array([WEIGHT_REVIEWS, WEIGHT_FAIRNESS, WEIGHT_PROXIMITY, WEIGHT_INVENTORY])
+    return np.random.default_rng(seed).dirichlet(base * concentration, size=n)
+
+
+def weight_grid(step: float = 0.05) -> np.ndarray:
+    """Every weight vector on a `step` grid whose weights sum to 1."""
+    units = int(round(1 / step))
+    grid = np.array([
+        (a, b, c, units - a - b - c)
+        for a in range(units + 1) for b in range(units + 1 - a) for c in range(units + 1 - a - b)
+    ])
+    return grid / units
+
+
+def weight_sensitivity(ranked: pd.DataFrame, weights: np.ndarray, top_n: int = SENSITIVITY_TOP_N) -> Tuple[pd.DataFrame, float]:
+    """Rank stability of score_and_rank's output under many weight vectors.
+    
+    Composite scores for all weight vectors are one (weights x 4) @ (4 x dealers) product per chunk.
+    Ties break as in score_and_rank (dealers are pre-sorted by the tie-breakers, then a stable sort).
+    Returns per-dealer stats and the share of weight vectors that keep the same top-N set.
+    """
+    weights = np.atleast_2d(np.asarray(weights, dtype='float64'))
+    tiebreak = np.lexsort((
+        -ranked['listings'].to_numpy(dtype='float64'),
+        ranked['median_rel_pct'].to_numpy(dtype='float64'),
+        -ranked['reviews_score'].to_numpy(dtype='float64'),
+    ))
+    stats = ranked.iloc[tiebreak].reset_index(drop=True)
+    components = stats[['reviews_score', 'fairness_score', 'proximity_score', 'inventory_score']].to_numpy(dtype='float64')
+    base_top = stats['rank'].to_numpy() <= top_n
+    n = len(stats)
+    
+    # Histogram of ranks per dealer, accumulated chunk by chunk (the full ranks matrix is never held)
+    rank_counts = np.zeros(n * n, dtype='int64')
+    same_top = 0
+    offsets = np.arange(n) * n
+    for start in range(0, len(weights), SENSITIVITY_CHUNK):
+        scores = weights[start:start + SENSITIVITY_CHUNK] @ components.T
+        order = np.argsort(-scores, axis=1, kind='stable')
+        ranks = np.empty(order.shape, dtype='int64')
+        np.put_along_axis(ranks, order, np.arange(n)[None, :], axis=1)
+        rank_counts += np.bincount((offsets + ranks).ravel(), minlength=n * n)
+        same_top += ((ranks < top_n) == base_top).all(axis=1).sum()
+    rank_counts = rank_counts.reshape(n, n)
+    
+    positions = np.arange(1, n + 1)
+    cdf = rank_counts.cumsum(axis=1) / len(weights)
+    mean = rank_counts @ positions / len(weights)
+    result = pd.DataFrame({
+        'dealer_name': stats['dealer_name'],
+        'base_rank': stats['rank'],
+        f'top{top_n}_pct': cdf[:, min(top_n, n) - 1] * 100,
+        'best_rank': (rank_counts > 0).argmax(axis=1) + 1,
+        'worst_rank': n - (rank_counts[:, ::-1] > 0).argmax(axis=1),
+        'rank_p5': (cdf >= 0.05).argmax(axis=1) + 1,
+        'rank_p95': (cdf >= 0.95).argmax(axis=1) + 1,
+        'rank_std': np.sqrt(np.maximum(rank_counts @ positions ** 2 / len(weights) - mean ** 2, 0)),
+    }).sort_values([f'top{top_n}_pct', 'base_rank'], ascending=[False, True]).reset_index(drop=True)
+    same_top /= len(weights)
+    return result, same_top
+
+
+def output_sensitivity(ranked: pd.DataFrame, weights: np.ndarray):
+    """Print and save rank stability for the dealers most often in the top N."""
+    print("\n" + "="*80)
+    print(f"WEIGHT SENSITIVITY ({len(weights)} weight vectors)")
+    print("="*80)
+    
+    start = time.perf_counter()
+    stability, same_top = weight_sensitivity(ranked, weights)
+    elapsed = time.perf_counter() - start
+    print(f"Scored {len(weights)} x {len(ranked)} in {elapsed * 1000:.0f} ms")
+    print(f"Top {SENSITIVITY_TOP_N} unchanged for {same_top:.1%} of weight vectors")
+    
+    shown = stability[stability[f'top{SENSITIVITY_TOP_N}_pct'] > 0].round(1)
+    print("\n" + shown.head(15).to_string(index=False))
+    
+    output_file = 'ranked_dealers_sensitivity.xlsx'
+    stability.round(2).to_excel(output_file, index=False, engine='openpyxl')
+    print(f"\n✓ Saved rank stability to: {output_file}")
+
+
+def seed_scraped_addresses(df: pd.DataFrame, cache: EnrichmentCache) -> int:
+    """Store dealer addresses harvested by the scraper so Google is only asked when there's none.
+    
+    Uses each dealer's most common scraped address. Returns the number of dealers whose address changed.
+    A changed address also lifts exclusions that were decided from the old one (distance, exclude address).
+    """
+    if 'dealer_address' not in df.columns:
+        return 0
+    scraped = df.dropna(subset=['dealer_address'])
+    scraped = scraped[scraped['dealer_address'].astype(str).str.strip() != '']
+    addresses = scraped.groupby('dealer_name', observed=True)['dealer_address'].agg(lambda s: s.mode().iat[0])
+    
+    changed = 0
+    for dealer_name, address in addresses.items():
+        if cache.get(dealer_name).get('address') != address:
+            # Distance (and any exclusion decided from it) was for the old address
+            cache.invalidate(dealer_name, ['distance_miles', 'driving_time_minutes'])
+            reason = cache.exclusion_reason(dealer_name)
+            if reason and reason.startswith(ADDRESS_EXCLUSION_REASONS):
+                print(f"  {dealer_name}: address changed, re-checking exclusion ({reason})")
+                cache.unexclude(dealer_name)
+            changed += 1
+        cache.put(dealer_name, 'address', address)
+    return changed
+
+
+def needs_enrichment(dealer_name: str, cache: EnrichmentCache) -> bool:
+    """True if any field this run uses is stale (or a failed lookup is due for retry)."""
+    if cache.is_excluded(dealer_name):
+        return False
+    stale = cache.stale_fields(dealer_name)
+    if stale & {'address', 'rating'}:
+        return True
+    has_address = bool(cache.get(dealer_name).get('address'))
+    return has_address and bool(stale & {'distance_miles', 'driving_time_minutes'})
+
+
+def straight_line_prefilter(dealers: list, cache: EnrichmentCache, geocoder: Geocoder) -> Tuple[list, Dict[str, float]]:
+    """Split dealers into (still need precise routing, {excluded dealer: straight-line miles}).
+    
+    A dealer is excluded when covering even the straight-line distance at
+    PREFILTER_MAX_SPEED_MPH would take longer than DRIVING_TIME_CUTOFF.
+    Dealers without coordinates always go on to precise routing.
+    """
+    origin = geocoder.geocode(ORIGIN)
+    if origin is None or not dealers:
+        return list(dealers), {}
+    
+    coords = [geocoder.geocode(cache.get(d).get('address')) for d in dealers]
+    located = [i for i, c in enumerate(coords) if c is not None]
+    if not located:
+        return list(dealers), {}
+    
+    lat = np.array([coords[i][0] for i in located])
+    lon = np.array([coords[i][1] for i in located])
+    margin = np.array([ZIP_CENTROID_MARGIN_MILES if coords[i][2] == 'zip' else 0.0 for i in located])
+    if origin[2] == 'zip':
+        margin = margin + ZIP_CENTROID_MARGIN_MILES
+    
+    miles = haversine_miles(origin[0], origin[1], lat, lon)
+    min_minutes = np.maximum(miles - margin, 0) / PREFILTER_MAX_SPEED_MPH * 60
+    too_far_mask = min_minutes > DRIVING_TIME_CUTOFF
+    
+    too_far = {dealers[located[j]]: float(miles[j]) for j in np.flatnonzero(too_far_mask)}
+    return [d for d in dealers if d not in too_far], too_far
+
+
+def distance_needed(dealer_name: str, cache: EnrichmentCache, old_address: Optional[str]) -> bool:
+    """Driving time is needed if we have an address and the cached time is stale or for another address."""
+    address = cache.get(dealer_name).get('address')
+    if not address:
+        return False
+    return bool(cache.stale_fields(dealer_name) & {'distance_miles', 'driving_time_minutes'}) or address != old_address
+
+
+def route_offline(dealers: list, cache: EnrichmentCache, geocoder: Geocoder, router: RoadRouter) -> list:
+    """Driving times from the local road graph. Returns the dealers it couldn't route.
+    
+    Only exact (Maps) coordinates are routed; ZIP-centroid positions are too coarse
+    near the cutoff, so those dealers still go to Maps.
+    """
+    origin = geocoder.geocode(ORIGIN)
+    if origin is None:
+        return list(dealers)
+    
+    destinations = {}
+    for dealer_name in dealers:
+        coords = geocoder.geocode(cache.get(dealer_name).get('address'))
+        if coords and coords[2] != 'zip':
+            destinations[dealer_name] = coords[:2]
+    
+    routes = router.drive_times(origin[:2], destinations)
+    for dealer_name, (distance_miles, driving_time_minutes) in routes.items():
+        if driving_time_minutes is None:
+            continue  # Not a miss: caching one would keep the dealer from the Maps step below
+        cache.put(dealer_name, 'distance_miles', distance_miles)
+        cache.put(dealer_name, 'driving_time_minutes', driving_time_minutes)
+        if driving_time_minutes and driving_time_minutes > DRIVING_TIME_CUTOFF:
+            print(f"  ⚠ EXCLUDED {dealer_name}: Over 30 min cutoff ({driving_time_minutes} min, road graph)")
+            cache.exclude(dealer_name, f'over {DRIVING_TIME_CUTOFF} min cutoff ({driving_time_minutes} min)')
+    
+    # Unreachable in the extract, or more than MAX_SNAP_MILES from it (outside its bounds) -> let Maps try
+    unrouted = [d for d in dealers if routes.get(d, (None, None))[1] is None]
+    print(f"Road graph: routed {len(dealers) - len(unrouted)} dealers offline, {len(unrouted)} left for Maps")
+    return unrouted
+
+
+def known_routes(cache: EnrichmentCache) -> Dict[str, Tuple[float, float]]:
+    """{normalized address: (miles, minutes)} from every dealer's fresh cached driving time."""
+    routes = {}
+    for dealer_name in cache.dealers():
+        info = cache.get(dealer_name)
+        if not info.get('address') or info.get('driving_time_minutes') is None:
+            continue
+        if cache.stale_fields(dealer_name, ['distance_miles', 'driving_time_minutes']):
+            continue
+        routes[normalize_address(info['address'])] = (info.get('distance_miles'), info['driving_time_minutes'])
+    return routes
+
+
+async def fetch_reviews(dealer_name: str, cache: EnrichmentCache, geocoder: Geocoder, pool: PagePool,
+                        planner: EnrichmentPlanner, flight: SingleFlight) -> Optional[float]:
+    """Reviews (+ address if unknown or stale) lookup for one dealer. Returns the rating found."""
+    stale = cache.stale_fields(dealer_name)
+    if not stale & {'address', 'rating'}:
+        print(f"  {dealer_name}: Using cached address and reviews")
+        return None
+    
+    known_address = cache.get(dealer_name).get('address')
+    need_address = 'address' in stale or not known_address
+    # Name variants that normalize to the same query share one lookup
+    query_key = (' '.join(name_tokens(dealer_name)) or dealer_name, need_address)
+    reviews_data = dict(await flight.do(
+        query_key, lambda: get_google_reviews_and_address(dealer_name, pool, planner, need_address)
+    ))
+    for field in ('address', 'rating', 'review_count'):
+        if field == 'address' and not need_address:
+            continue  # Keep the scraped (or still fresh) address
+        # A miss only counts against fields we actually needed
+        if reviews_data[field] is not None or field in stale:
+            cache.put(dealer_name, field, reviews_data[field])
+    if reviews_data['address'] and reviews_data['lat'] is not None:
+        geocoder.put(reviews_data['address'], reviews_data['lat'], reviews_data['lon'], 'maps')
+        # Same place as the scraped address -> its coordinates are exact too
+        if known_address and extract_zip(known_address) and extract_zip(known_address) == extract_zip(reviews_data['address']):
+            geocoder.put(known_address, reviews_data['lat'], reviews_data['lon'], 'maps')
+    return reviews_data['rating']
+
+
+async def fetch_distance(dealer_name: str, cache: EnrichmentCache, pool: PagePool,
+                         planner: EnrichmentPlanner, flight: SingleFlight) -> Optional[float]:
+    """Precise driving distance/time for one dealer; applies the cutoff. Returns the minutes found."""
+    address = cache.get(dealer_name).get('address')
+    # Co-located dealers (same normalized address) share one directions lookup
+    distance_miles, driving_time_minutes = await flight.do(
+        normalize_address(address), lambda: get_distance_and_time(ORIGIN, address, pool, planner)
+    )
+    cache.put(dealer_name, 'distance_miles', distance_miles)
+    cache.put(dealer_name, 'driving_time_minutes', driving_time_minutes)
+    
+    # Apply 30-minute cutoff
+    if driving_time_minutes and driving_time_minutes > DRIVING_TIME_CUTOFF:
+        print(f"  ⚠ EXCLUDED {dealer_name}: Over 30 min cutoff ({driving_time_minutes} min)")
+        cache.exclude(dealer_name, f'over {DRIVING_TIME_CUTOFF} min cutoff ({driving_time_minutes} min)')
+    return driving_time_minutes
+
+
+async def enrich_dealers(dealers_to_fetch: list, cache: EnrichmentCache, geocoder: Geocoder,
+                         planner: EnrichmentPlanner, router: Optional[RoadRouter] = None):
+    """Enrich dealers concurrently through a bounded, rate-limited page pool.
+    
+    Dealers without an address get the Google lookup first (the only way to find one).
+    The planner then orders the remaining steps - exclusion-capable checks (address rule,
+    straight-line, road graph, Maps directions) before reviews, cheapest first - and each
+    step only sees dealers that haven't been disqualified yet.
+    """
+    old_addresses = {d: cache.get(d).get('address') for d in dealers_to_fetch}
+    has_distance = set()  # Driving time found this run (road graph or Maps)
+    distance_flight = SingleFlight(known_routes(cache))  # Keyed by normalized address
+    reviews_flight = SingleFlight()  # Keyed by normalized dealer-name query
+    semaphore = asyncio.Semaphore(ENRICHMENT_CONCURRENCY)
+    
+    def still_in(dealers):
+        return [d for d in dealers if not cache.is_excluded(d)]
+    
+    def need_distance(dealers):
+        return [d for d in dealers if d not in has_distance and distance_needed(d, cache, old_addresses.get(d))]
+    
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True, channel='chrome')
+        context = await browser.new_context()
+        pool = await PagePool(context, ENRICHMENT_CONCURRENCY, ENDPOINT_MIN_INTERVAL).start()
+        print(f"Enriching with {ENRICHMENT_CONCURRENCY} concurrent pages "
+              f"(rate limits: {', '.join(f'{k} {v}s' for k, v in ENDPOINT_MIN_INTERVAL.items())})")
+        
+        async def run_all(step, dealers, *args) -> list:
+            completed = 0
+            
+            async def run(dealer_name):
+                nonlocal completed
+                async with semaphore:
+                    try:
+                        found = await step(dealer_name, *args)
+                    except Exception as e:
+                        print(f"  ✗ {dealer_name}: {e}")
+                        return None
+                    completed += 1
+                    print(f"[{completed}/{len(dealers)}] Done: {dealer_name}")
+                    return found
+            
+            return await asyncio.gather(*(run(d) for d in dealers))
+        
+        # Each step returns (dealers it worked on, dealers it found an answer for)
+        async def exclude_address_step(dealers):
+            located = [d for d in dealers if cache.get(d).get('address')]
+            for dealer_name in located:
+                if EXCLUDE_ADDRESS.lower() in cache.get(dealer_name)['address'].lower():
+                    print(f"  ⚠ EXCLUDED {dealer_name}: Matches exclude address")
+                    cache.exclude(dealer_name, 'exclude address')
+            return len(located), len(located)
+        
+        async def straight_line_step(dealers):
+            # No browser lookup for dealers that are obviously too far
+            need = need_distance(dealers)
+            to_route, too_far = straight_line_prefilter(need, cache, geocoder)
+            for dealer_name, miles in too_far.items():
+                print(f"  ⚠ EXCLUDED {dealer_name}: {miles:.1f} mi straight-line (can't be within {DRIVING_TIME_CUTOFF} min)")
+                cache.exclude(dealer_name, f'straight-line {miles:.1f} mi')
+            print(f"Straight-line pre-filter: {len(too_far)} excluded, {len(to_route)} need driving time")
+            located = sum(geocoder.geocode(cache.get(d).get('address')) is not None for d in need)
+            return len(need), located
+        
+        async def road_graph_step(dealers):
+            need = need_distance(dealers)
+            unrouted = set(route_offline(need, cache, geocoder, router))
+            has_distance.update(d for d in need if d not in unrouted)
+            return len(need), len(need) - len(unrouted)
+        
+        async def maps_distance_step(dealers):
+            need = need_distance(dealers)
+            found = await run_all(fetch_distance, need, cache, pool, planner, distance_flight)
+            has_distance.update(d for d, minutes in zip(need, found) if minutes is not None)
+            return len(need), sum(minutes is not None for minutes in found)
+        
+        async def reviews_step(dealers):
+            need = [d for d in dealers if cache.stale_fields(d) & {'address', 'rating'}]
+            found = await run_all(fetch_reviews, need, cache, geocoder, pool, planner, reviews_flight)
+            return len(need), sum(rating is not None for rating in found)
+        
+        # Address discovery first: nothing can be excluded for a dealer we can't locate
+        no_address = [d for d in dealers_to_fetch if not cache.get(d).get('address')]
+        if no_address:
+            print(f"Looking up addresses for {len(no_address)} dealers (not in the scraped data)")
+            await run_all(fetch_reviews, no_address, cache, geocoder, pool, planner, reviews_flight)
+        
+        steps = {
+            'exclude_address': (True, exclude_address_step),
+            'straight_line': (True, straight_line_step),
+            'maps_distance': (True, maps_distance_step),
+            'reviews': (False, reviews_step),
+        }
+        if router is not None:
+            steps['road_graph'] = (True, road_graph_step)
+        plan = planner.order_steps([(name, can_exclude) for name, (can_exclude, _) in steps.items()])
+        print(f"Enrichment plan: {' -> '.join(plan)}")
+        
+        remaining = still_in(dealers_to_fetch)
+        for name in plan:
+            if not remaining:
+                break
+            start = time.perf_counter()
+            attempts, answered = await steps[name][1](remaining)
+            if attempts:
+                planner.record(name, '', time.perf_counter() - start, answered, attempts)
+            remaining = still_in(remaining)
+        
+        await pool.close()
+        await browser.close()
+    
+    coalesced = distance_flight.coalesced + reviews_flight.coalesced
+    if coalesced:
+        print(f"Coalesced {coalesced} lookups sharing an address or query "
+              f"({distance_flight.calls} directions, {reviews_flight.calls} review lookups made)")
+
+
+def save_features(df: pd.DataFrame, cache: EnrichmentCache, geocoder: Geocoder, path: str = RESULTS_DB):
+    """Persist per-listing relative prices and per-dealer enrichment for ranking_service.py."""
+    listings = df[['dealer_name', 'make', 'model', 'spec_key', 'price', 'rel_pct']]
+    
+    rows = []
+    for dealer_name in listings['dealer_name'].unique():
+        info = cache.get(dealer_name)
+        address = info.get('address')
+        coords = geocoder.geocode(address)
+        rows.append({
+            'dealer_name': dealer_name,
+            'address': address,
+            'lat': coords[0] if coords else None,
+            'lon': coords[1] if coords else None,
+            'google_rating': info.get('rating'),
+            'google_review_count': info.get('review_count'),
+            'distance_miles': info.get('distance_miles'),
+            'driving_time_minutes': info.get('driving_time_minutes'),
+            'address_excluded': int(bool(address) and EXCLUDE_ADDRESS.lower() in address.lower()),
+            'excluded': int(cache.is_excluded(dealer_name)),  # Cached exclusion at DRIVING_TIME_CUTOFF
+        })
+    
+    conn = sqlite3.connect(path)
+    listings.to_sql(FEATURE_LISTINGS_TABLE, conn, if_exists='replace', index=False)
+    pd.DataFrame(rows).to_sql(FEATURE_DEALERS_TABLE, conn, if_exists='replace', index=False)
+    conn.close()
+    print(f"✓ Saved ranking features for {len(rows)} dealers to {path} (query with ranking_service.py)")
+
+
+def main(origins: Optional[list] = None, sensitivity_weights: Optional[np.ndarray] = None, full: bool = False,
+         engine: Optional[str] = None, collapse_duplicates: bool = False):
+    """Main ranking workflow (optionally followed by a weight-sensitivity report).
+    
+    With `engine`, Step 2 is a full recompute on that engine instead of the incremental state update.
+    With `collapse_duplicates`, near-duplicate listings (the same car at sister dealers) count once.
+    """
+    origins = list(origins or ORIGINS)
+    multi_origin = origins != [ORIGIN]
     print("\n" + "="*80)
     print("DEALER RANKING SYSTEM")
     print("="*80)
     
     # Step 1: Load and normalize
-    if not Path(INPUT_FILE).exists():
-        print(f"ERROR: Input file '{INPUT_FILE}' not found!")
+    input_path = resolve_results_path(INPUT_FILE) or resolve_results_path()
+    if input_path is None:
+        print(f"ERROR: Input file '{INPUT_FILE}' (or '{LEGACY_EXCEL_FILE}') not found!")
         return
     
-    df = load_and_normalize_data(INPUT_FILE)
+    df = load_and_normalize_data(input_path)
+    
+    # Collapse dealer name variants so each dealership is scored on all its listings and enriched once
+    resolver = DealerResolver(CACHE_FILE)
+    df = resolver.apply(df)
+    resolver.close()
+    
+    # Keep one listing per near-duplicate cluster so a syndicated car isn't priced (and counted) twice
+    if collapse_duplicates:
+        df = collapse_near_duplicates(df)
     
-    # Step 2: Pricing fairness
-    dealer_stats = compute_pricing_fairness(df)
+    # Step 2: Pricing fairness (only specs/dealers touched since the last run are recomputed)
+    if engine:
+        dealer_stats = compute_pricing_fairness(df, engine)
+    else:
+        dealer_stats = incremental_pricing_fairness(df, path=ranking_state_path(input_path), rebuild=full)
     
     # Step 3 & 4: Get Google reviews, addresses, and distances
     print("\n" + "="*80)
@@ -603,119 +1164,58 @@ def main():
     unique_dealers = dealer_stats['dealer_name'].unique()
     print(f"Fetching data for {len(unique_dealers)} dealers...")
     
-    # Load cache if exists
-    dealer_info = {}
-    if Path(CACHE_FILE).exists():
-        try:
-            with open(CACHE_FILE, 'r') as f:
-                dealer_info = json.load(f)
-            print(f"Loaded {len(dealer_info)} dealers from cache")
-        except:
-            pass
-    
-    # Find dealers that need fetching (not in cache, excluded, or missing address/distance)
-    dealers_to_fetch = []
-    for d in unique_dealers:
-        if d not in dealer_info:
-            dealers_to_fetch.append(d)
-        elif dealer_info.get(d) is None:
-            # Excluded - skip
-            continue
-        elif isinstance(dealer_info.get(d), dict):
-            info = dealer_info[d]
-            # Need to fetch if missing address, or has address but missing distance
-            if not info.get('address') or (info.get('address') and not info.get('distance_miles')):
-                dealers_to_fetch.append(d)
+    # Open the enrichment cache (imports the old JSON cache on first run)
+    cache = EnrichmentCache(CACHE_FILE)
+    migrated = cache.migrate_json(LEGACY_CACHE_FILE)
+    if migrated:
+        print(f"Imported {migrated} dealers from {LEGACY_CACHE_FILE}")
+    
+    # Addresses from the listing scrape (Google is only needed for ratings and missing addresses)
+    changed = seed_scraped_addresses(df, cache)
+    if changed:
+        print(f"Using scraped addresses for {changed} dealers (new or changed)")
+    
+    geocoder = Geocoder(CACHE_FILE)
+    router = load_router(cache_path=CACHE_FILE)
+    
+    # Find dealers that need fetching (only stale fields are refetched)
+    dealers_to_fetch = [d for d in unique_dealers if needs_enrichment(d, cache)]
     
     print(f"Need to fetch {len(dealers_to_fetch)} dealers ({len(unique_dealers) - len(dealers_to_fetch)} fully cached)")
     
     if dealers_to_fetch:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True, channel='chrome')
-            context = browser.new_context()
-            
-            for i, dealer_name in enumerate(dealers_to_fetch, 1):
-                print(f"[{i}/{len(dealers_to_fetch)}] Processing: {dealer_name}")
-                
-                # Check if we already have some data for this dealer
-                existing_info = dealer_info.get(dealer_name, {}) if isinstance(dealer_info.get(dealer_name), dict) else {}
-                existing_address = existing_info.get('address')
-                existing_rating = existing_info.get('rating')
-                existing_review_count = existing_info.get('review_count')
-                
-                # Get reviews and address (skip if we already have them)
-                if existing_address and existing_rating is not None:
-                    # Use existing data
-                    address = existing_address
-                    rating = existing_rating
-                    review_count = existing_review_count
-                    print(f"  Using cached address and reviews")
-                else:
-                    # Fetch new data
-                    reviews_data = get_google_reviews_and_address(dealer_name, context)
-                    address = reviews_data['address'] or existing_address
-                    rating = reviews_data['rating'] if reviews_data['rating'] is not None else existing_rating
-                    review_count = reviews_data['review_count'] if reviews_data['review_count'] is not None else existing_review_count
-                
-                # Apply exclusion rules
-                if address and EXCLUDE_ADDRESS.lower() in address.lower():
-                    print(f"  ⚠ EXCLUDED: Matches exclude address")
-                    dealer_info[dealer_name] = None  # Mark for exclusion
-                    # Save cache
-                    with open(CACHE_FILE, 'w') as f:
-                        json.dump(dealer_info, f, indent=2)
-                    continue
-                
-                # Get distance if we have an address
-                distance_miles = None
-                driving_time_minutes = None
-                
-                if address:
-                    distance_miles, driving_time_minutes = get_distance_and_time(ORIGIN, address, context)
-                    
-                    # Apply 30-minute cutoff
-                    if driving_time_minutes and driving_time_minutes > DRIVING_TIME_CUTOFF:
-                        # Special case for "maybe far" address
-                        if MAYBE_FAR_ADDRESS.lower() in address.lower():
-                            print(f"  ⚠ EXCLUDED: Over 30 min cutoff ({driving_time_minutes} min)")
-                        else:
-                            print(f"  ⚠ EXCLUDED: Over 30 min cutoff ({driving_time_minutes} min)")
-                        dealer_info[dealer_name] = None
-                        # Save cache
-                        with open(CACHE_FILE, 'w') as f:
-                            json.dump(dealer_info, f, indent=2)
-                        continue
-                
-                # Store dealer info
-                dealer_info[dealer_name] = {
-                    'address': address,
-                    'rating': rating,
-                    'review_count': review_count,
-                    'distance_miles': distance_miles,
-                    'driving_time_minutes': driving_time_minutes
-                }
-                
-                # Save cache periodically
-                if i % 5 == 0:
-                    with open(CACHE_FILE, 'w') as f:
-                        json.dump(dealer_info, f, indent=2)
-                
-                # Rate limiting
-                time.sleep(1)
-            
-            browser.close()
-        
-        # Final cache save
-        with open(CACHE_FILE, 'w') as f:
-            json.dump(dealer_info, f, indent=2)
-        print(f"✓ Saved dealer info cache to {CACHE_FILE}")
+        planner = EnrichmentPlanner(CACHE_FILE)
+        asyncio.run(enrich_dealers(dealers_to_fetch, cache, geocoder, planner, router))
+        print(f"✓ Dealer info cached in {CACHE_FILE}")
+        planner.report()
+        planner.close()
+    
+    if multi_origin:
+        # Ignore ORIGIN-relative distance exclusions; each origin applies its own cutoff
+        all_info = {d: cache.get(d) for d in unique_dealers}
+        drive_times = drive_time_matrix(all_info, origins, geocoder, router)
+    
+    dealer_info = cache.snapshot(unique_dealers)
+    save_features(df, cache, geocoder)
+    geocoder.close()
+    if router is not None:
+        router.close()
+    cache.close()
+    
+    if multi_origin:
+        output_multi_origin(dealer_stats, all_info, drive_times)
+        return
     
     # Merge dealer info into stats
-    dealer_stats['address'] = dealer_stats['dealer_name'].map(lambda x: dealer_info.get(x, {}).get('address') if dealer_info.get(x) else None)
-    dealer_stats['google_rating'] = dealer_stats['dealer_name'].map(lambda x: dealer_info.get(x, {}).get('rating') if dealer_info.get(x) else None)
-    dealer_stats['google_review_count'] = dealer_stats['dealer_name'].map(lambda x: dealer_info.get(x, {}).get('review_count') if dealer_info.get(x) else None)
-    dealer_stats['distance_miles'] = dealer_stats['dealer_name'].map(lambda x: dealer_info.get(x, {}).get('distance_miles') if dealer_info.get(x) else None)
-    dealer_stats['driving_time_minutes'] = dealer_stats['dealer_name'].map(lambda x: dealer_info.get(x, {}).get('driving_time_minutes') if dealer_info.get(x) else None)
+    info_df = pd.DataFrame.from_dict(
+        {name: info for name, info in dealer_info.items() if info}, orient='index',
+        columns=['address', 'rating', 'review_count', 'distance_miles', 'driving_time_minutes']
+    ).rename(columns={'rating': 'google_rating', 'review_count': 'google_review_count'})
+    if engine:
+        from ranking_engines import get_engine, join_enrichment
+        dealer_stats = join_enrichment(dealer_stats, info_df, get_engine(engine))
+    else:
+        dealer_stats = dealer_stats.join(info_df, on='dealer_name')
     
     # Filter out excluded dealers (only those explicitly marked as None in cache)
     # Allow dealers with missing addresses but mark them
@@ -731,41 +1231,7 @@ def main():
     print("STEP 5 & 6: Computing Scores and Composite Ranking")
     print("="*80)
     
-    dealer_stats['reviews_score'] = dealer_stats.apply(
-        lambda row: compute_reviews_score(row['google_rating'], None),  # review_count removed - insufficient data
-        axis=1
-    )
-    dealer_stats['proximity_score'] = dealer_stats['driving_time_minutes'].apply(compute_proximity_score)
-    dealer_stats['inventory_score'] = dealer_stats['listings'].apply(
-        lambda x: compute_inventory_score(x, dealer_stats['listings'])
-    )
-    
-    # Apply STRICT 30-minute cutoff: filter out dealers with known distance > 30 min
-    # Also filter out dealers without distance data (can't verify they're within 30 min)
-    before_cutoff = len(dealer_stats)
-    dealer_stats = dealer_stats[
-        (dealer_stats['driving_time_minutes'].notna()) & 
-        (dealer_stats['driving_time_minutes'] <= DRIVING_TIME_CUTOFF)
-    ].copy()
-    after_cutoff = len(dealer_stats)
-    if before_cutoff > after_cutoff:
-        print(f"Filtered out {before_cutoff - after_cutoff} dealers (over 30-minute cutoff or missing distance data)")
-    
-    # Composite score
-    dealer_stats['composite_score'] = (
-        WEIGHT_REVIEWS * dealer_stats['reviews_score'] +
-        WEIGHT_FAIRNESS * dealer_stats['fairness_score'] +
-        WEIGHT_PROXIMITY * dealer_stats['proximity_score'] +
-        WEIGHT_INVENTORY * dealer_stats['inventory_score']
-    )
-    
-    # Sort by composite score (with tie-breakers)
-    dealer_stats = dealer_stats.sort_values(
-        by=['composite_score', 'reviews_score', 'median_rel_pct', 'listings'],
-        ascending=[False, False, True, False]
-    ).reset_index(drop=True)
-    
-    dealer_stats['rank'] = range(1, len(dealer_stats) + 1)
+    dealer_stats = score_and_rank(dealer_stats)
     
     # Step 7: Output results
     print("\n" + "="*80)
@@ -827,11 +1293,33 @@ def main():
         if reasons:
             print(f"   Why: {'; '.join(reasons)}")
     
+    if sensitivity_weights is not None:
+        output_sensitivity(dealer_stats, sensitivity_weights)
+    
     print("\n" + "="*80)
     print("RANKING COMPLETE")
     print("="*80)
 
 
 if __name__ == '__main__':
-    main()
+    import argparse
+    parser = argparse.ArgumentParser(description='Rank dealers by reviews, pricing fairness, proximity and inventory')
+    parser.add_argument('--origins', nargs='+', help=f'Origins to rank from (default: {ORIGIN})')
+    sensitivity = parser.add_mutually_exclusive_group()
+    sensitivity.add_argument('--sensitivity', type=int, metavar='N',
+                             help='Report rank stability over N random weight vectors around the current weights')
+    sensitivity.add_argument('--sensitivity-step', type=float, metavar='STEP',
+                             help='Report rank stability over every weight vector on a STEP grid (e.g. 0.05)')
+    parser.add_argument('--full', action='store_true', help='Rebuild the incremental pricing state from scratch')
+    parser.add_argument('--engine', choices=['auto', 'pandas', 'polars', 'duckdb'],
+                        help='Recompute Step 2 in full on a columnar engine (auto = Polars, then DuckDB, then pandas)')
+    parser.add_argument('--collapse-near-duplicates', action='store_true',
+                        help='Keep one listing per near-duplicate cluster (same car at sister dealers) before Step 2')
+    args = parser.parse_args()
+    weights = None
+    if args.sensitivity:
+        weights = sample_weight_vectors(args.sensitivity)
+    elif args.sensitivity_step:
+        weights = weight_grid(args.sensitivity_step)
+    main(args.origins, weights, args.full, args.engine, args.collapse_near_duplicates)
 
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Columnar engine backends for the heavy steps of the ranking pipeline.
+- pandas (always available), Polars and DuckDB (used when installed; both multi-threaded)
+- Each engine computes the per-spec median price, the per-dealer pricing aggregates and the
+  dealer -> enrichment join; everything around them (rel_pct, fairness score, sort order)
+  is shared, so every engine returns exactly what compute_pricing_fairness returns
+- Medians are the mean of the two middle values, written out explicitly for Polars and
+  DuckDB so they round exactly like pandas
+
+Usage: python3 ranking_engines.py   (lists the available engines)
+"""
+
+import importlib.util
+import numpy as np
+import pandas as pd
+from typing import List
+
+from rank_dealers import compute_fairness_score
+
+ENGINE_PREFERENCE = ['polars', 'duckdb', 'pandas']  # 'auto' picks the first installed
+AGGREGATE_COLUMNS = ['dealer', 'listings', 'unique_specs', 'median_rel_pct', 'pct_below_median', 'pct_within_1pct']
+
+
+def available_engines() -> List[str]:
+    return [name for name in ENGINE_PREFERENCE if name == 'pandas' or importlib.util.find_spec(name) is not None]
+
+
+class PandasEngine:
+    """Reference backend; the others must agree with it bit for bit."""
+
+    name = 'pandas'
+
+    def spec_medians(self, spec: np.ndarray, price: np.ndarray, n_specs: int) -> np.ndarray:
+        """Median price per spec code (indexed by code)."""
+        return pd.Series(price).groupby(spec).median().reindex(range(n_specs)).to_numpy(dtype='float64')
+
+    def dealer_aggregates(self, dealer: np.ndarray, spec: np.ndarray, rel_pct: np.ndarray) -> pd.DataFrame:
+        """Per dealer code: listings, unique_specs, median_rel_pct, pct_below_median, pct_within_1pct."""
+        listings = pd.DataFrame({
+            'dealer': dealer, 'spec': spec, 'rel_pct': rel_pct,
+            'below': (rel_pct < 0).astype('float64'), 'within': (np.abs(rel_pct) <= 0.01).astype('float64'),
+        })
+        return listings.groupby('dealer').agg(
+            listings=('rel_pct', 'size'),
+            unique_specs=('spec', 'nunique'),
+            median_rel_pct=('rel_pct', 'median'),
+            pct_below_median=('below', 'mean'),
+            pct_within_1pct=('within', 'mean'),
+        ).reset_index()[AGGREGATE_COLUMNS]
+
+    def join_positions(self, left: np.ndarray, right: np.ndarray) -> np.ndarray:
+        """Row in `right` matching each `left` key (-1 when none); right keys are unique."""
+        return pd.Index(right).get_indexer(left)
+
+
+class PolarsEngine(PandasEngine):
+    name = 'polars'
+
+    def __init__(self):
+        import polars
+        self.pl = polars
+
+    def _median(self, column: str):
+        """Mean of the two middle non-NaN values (null for an all-NaN group), like pandas."""
+        pl = self.pl
+        values = pl.col(column).fill_nan(None).sort(nulls_last=True)
+        n = pl.col(column).fill_nan(None).count().cast(pl.Int64)
+        return (values.get((n - 1) // 2) + values.get(n // 2)) / 2
+
+    def spec_medians(self, spec, price, n_specs):
+        pl = self.pl
+        medians = pl.DataFrame({'spec': spec, 'price': price}).group_by('spec').agg(median=self._median('price'))
+        out = np.full(n_specs, np.nan)
+        out[medians['spec'].to_numpy()] = medians['median'].to_numpy()
+        return out
+
+    def dealer_aggregates(self, dealer, spec, rel_pct):
+        pl = self.pl
+        rel = pl.col('rel_pct')  # NaN compares greater than everything, as a False comparison does in numpy
+        stats = pl.DataFrame({'dealer': dealer, 'spec': spec, 'rel_pct': rel_pct}).group_by('dealer').agg(
+            listings=pl.len(),
+            unique_specs=pl.col('spec').n_unique(),
+            median_rel_pct=self._median('rel_pct'),
+            pct_below_median=(rel < 0).cast(pl.Float64).mean(),
+            pct_within_1pct=(rel.abs() <= 0.01).cast(pl.Float64).mean(),
+        ).sort('dealer')
+        return pd.DataFrame({c: stats[c].to_numpy() for c in AGGREGATE_COLUMNS})
+
+    def join_positions(self, left, right):
+        pl = self.pl
+        joined = pl.DataFrame({'key': left, 'row': np.arange(len(left))}).join(
+            pl.DataFrame({'key': right, 'pos': np.arange(len(right))}), on='key', how='left'
+        ).sort('row')
+        return joined['pos'].fill_null(-1).to_numpy().astype('int64')
+
+
+class DuckDBEngine(PandasEngine):
+    name = 'duckdb'
+
+    def __init__(self):
+        import duckdb
+        self.conn = duckdb.connect()
+
+    def _query(self, sql: str, **tables) -> dict:
+        for name, frame in tables.items():
+            self.conn.register(name, frame)
+        try:
+            return self.conn.execute(sql).fetchnumpy()
+        finally:
+            for name in tables:
+                self.conn.unregister(name)
+
+    # Mean of the two middle non-NaN values of `v` per group, from a row_number() over the sorted group
+    MEDIAN_SQL = """
+        (MAX(v) FILTER (WHERE rn = (n + 1) // 2) + MAX(v) FILTER (WHERE rn = n // 2 + 1)) / 2
+    """
+    RANKED_SQL = """
+        SELECT *, row_number() OVER (PARTITION BY {key} ORDER BY v) AS rn,
+               count(*) OVER (PARTITION BY {key}) AS n
+        FROM {table} WHERE NOT isnan(v)
+    """
+
+    def spec_medians(self, spec, price, n_specs):
+        result = self._query(f"""
+            SELECT spec, {self.MEDIAN_SQL} AS median
+            FROM ({self.RANKED_SQL.format(key='spec', table='prices')}) GROUP BY spec
+        """, prices=pd.DataFrame({'spec': spec, 'v': price}))
+        out = np.full(n_specs, np.nan)
+        out[result['spec']] = result['median']
+        return out
+
+    def dealer_aggregates(self, dealer, spec, rel_pct):
+        result = self._query(f"""
+            WITH medians AS (
+                SELECT dealer, {self.MEDIAN_SQL} AS median_rel_pct
+                FROM ({self.RANKED_SQL.format(key='dealer', table='listings')}) GROUP BY dealer
+            )
+            SELECT l.dealer,
+                   count(*) AS listings,
+                   count(DISTINCT l.spec) AS unique_specs,
+                   any_value(m.median_rel_pct) AS median_rel_pct,
+                   avg(CASE WHEN l.v < 0 THEN 1.0::DOUBLE ELSE 0.0::DOUBLE END) AS pct_below_median,
+                   avg(CASE WHEN abs(l.v) <= 0.01 THEN 1.0::DOUBLE ELSE 0.0::DOUBLE END) AS pct_within_1pct
+            FROM listings l LEFT JOIN medians m USING (dealer)
+            GROUP BY l.dealer ORDER BY l.dealer
+        """, listings=pd.DataFrame({'dealer': dealer, 'spec': spec, 'v': rel_pct}))
+        stats = pd.DataFrame(result)
+        stats['median_rel_pct'] = stats['median_rel_pct'].astype('float64')  # NULL (all-NaN dealer) -> NaN
+        return stats[AGGREGATE_COLUMNS]
+
+    def join_positions(self, left, right):
+        result = self._query(
+            "SELECT r.pos FROM l LEFT JOIN r USING (key) ORDER BY l.row",
+            # DuckDB can't scan strided object arrays (e.g. an index sliced with [::2])
+            l=pd.DataFrame({'key': np.ascontiguousarray(left), 'row': np.arange(len(left))}),
+            r=pd.DataFrame({'key': np.ascontiguousarray(right), 'pos': np.arange(len(right))}),
+        )
+        return pd.Series(result['pos']).fillna(-1).to_numpy().astype('int64')
+
+
+ENGINES = {'pandas': PandasEngine, 'polars': PolarsEngine, 'duckdb': DuckDBEngine}
+
+
+def get_engine(name: str = 'auto') -> PandasEngine:
+    """Engine by name ('auto' = first installed in ENGINE_PREFERENCE); falls back to pandas."""
+    if name == 'auto':
+        name = available_engines()[0]
+    if name not in ENGINES:
+        raise ValueError(f"Unknown engine '{name}' (choose from auto, {', '.join(ENGINES)})")
+    if name not in available_engines():
+        print(f"⚠ {name} is not installed; using pandas")
+        name = 'pandas'
+    return ENGINES[name]()
+
+
+def _codes(values: pd.Series):
+    """Integer codes and their labels (categoricals reuse their codes)."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy(dtype='int64'), values.cat.categories
+    codes, labels = pd.factorize(values)
+    return codes.astype('int64'), labels
+
+
+def pricing_fairness(df: pd.DataFrame, engine: PandasEngine) -> pd.DataFrame:
+    """compute_pricing_fairness on `engine`: adds spec_median_price and rel_pct to `df`, returns dealer stats."""
+    spec, specs = _codes(df['spec_key'])
+    dealer, dealers = _codes(df['dealer_name'])
+    price = df['price'].to_numpy(dtype='float64')
+
+    medians = engine.spec_medians(spec, price, len(specs))[spec]
+    with np.errstate(divide='ignore', invalid='ignore'):  # a zero median gives inf/NaN, as in pandas
+        rel_pct = (price - medians) / medians
+    df['spec_median_price'] = medians
+    df['rel_pct'] = rel_pct
+
+    stats = engine.dealer_aggregates(dealer, spec, rel_pct)
+    stats.insert(0, 'dealer_name', np.asarray(dealers, dtype=object)[stats.pop('dealer').to_numpy()].astype(str))
+    stats['listings'] = stats['listings'].astype('int64')
+    stats['unique_specs'] = stats['unique_specs'].astype('int64')
+    stats = stats.sort_values('dealer_name', kind='stable').reset_index(drop=True)
+    stats['fairness_score'] = compute_fairness_score(stats['median_rel_pct'], stats['listings'])
+    return stats
+
+
+def join_enrichment(dealer_stats: pd.DataFrame, info_df: pd.DataFrame, engine: PandasEngine) -> pd.DataFrame:
+    """dealer_stats.join(info_df, on='dealer_name') with the key matching done on `engine`."""
+    positions = engine.join_positions(dealer_stats['dealer_name'].to_numpy(dtype=object),
+                                      info_df.index.to_numpy(dtype=object))
+    matched = info_df.reset_index(drop=True).reindex(positions)
+    matched.index = dealer_stats.index
+    return pd.concat([dealer_stats, matched], axis=1)
+
+
+if __name__ == '__main__':
+    installed = available_engines()
+    for name in ENGINES:
+        print(f"{'✓' if name in installed else '✗'} {name}")
+    print(f"auto -> {installed[0]}")
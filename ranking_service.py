@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Local dealer ranking query service over a precomputed feature table.
+rank_dealers.py saves the features (per-listing relative price, per-dealer
+reviews/drive time/coordinates) to the results store; queries then re-rank
+in milliseconds with any weights, cutoff, minimum rating or make/model
+filter - no browser, no Excel.
+
+Usage:
+  python3 ranking_service.py query [--weights R F P I] [--cutoff 30] [--min-rating 4.0]
+                                   [--make Honda] [--model Accord] [--top 5]
+  python3 ranking_service.py serve [--port 8765]
+      GET /rank?weights=0.35,0.35,0.25,0.05&cutoff=30&min_rating=4&make=Honda&top=5
+"""
+
+import argparse
+import json
+import sqlite3
+import time
+import numpy as np
+import pandas as pd
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Sequence
+from urllib.parse import parse_qs, urlparse
+
+import rank_dealers
+from rank_dealers import FEATURE_DEALERS_TABLE, FEATURE_LISTINGS_TABLE
+from results_store import RESULTS_DB
+
+DEFAULT_PORT = 8765
+
+
+class RankingService:
+    """Feature tables held in memory; each query is a filter + groupby + vectorized scoring."""
+
+    def __init__(self, path: str = RESULTS_DB):
+        conn = sqlite3.connect(path)
+        self.listings = pd.read_sql(f'SELECT * FROM "{FEATURE_LISTINGS_TABLE}"', conn)
+        self.dealers = pd.read_sql(f'SELECT * FROM "{FEATURE_DEALERS_TABLE}"', conn).set_index('dealer_name')
+        conn.close()
+        self.listings['_below_median'] = (self.listings['rel_pct'] < 0).astype('float64')
+        self.listings['_within_1pct'] = (self.listings['rel_pct'].abs() <= 0.01).astype('float64')
+        self._make = self.listings['make'].str.lower().to_numpy()
+        self._model = self.listings['model'].str.lower().to_numpy()
+
+    def query(self, weights: Optional[Sequence[float]] = None, cutoff: Optional[float] = None,
+              min_rating: Optional[float] = None, make: Optional[str] = None, model: Optional[str] = None,
+              top: int = 5) -> pd.DataFrame:
+        """Top-k dealers for the given weights (reviews, fairness, proximity, inventory) and filters.
+
+        Fairness and inventory are computed over the listings that pass the make/model filter.
+        Cached exclusions stand unless a wider cutoff than DRIVING_TIME_CUTOFF admits the
+        dealer's known driving time; the excluded address never ranks.
+        """
+        w_reviews, w_fairness, w_proximity, w_inventory = weights or (
+            rank_dealers.WEIGHT_REVIEWS, rank_dealers.WEIGHT_FAIRNESS,
+            rank_dealers.WEIGHT_PROXIMITY, rank_dealers.WEIGHT_INVENTORY,
+        )
+        cutoff = rank_dealers.DRIVING_TIME_CUTOFF if cutoff is None else cutoff
+
+        mask = np.ones(len(self.listings), dtype=bool)
+        if make:
+            mask &= self._make == make.lower()
+        if model:
+            mask &= self._model == model.lower()
+        listings = self.listings[mask]
+
+        stats = listings.groupby('dealer_name').agg(
+            listings=('price', 'count'),
+            unique_specs=('spec_key', 'nunique'),
+            median_rel_pct=('rel_pct', 'median'),
+            pct_below_median=('_below_median', 'mean'),
+            pct_within_1pct=('_within_1pct', 'mean'),
+        ).reset_index()
+        stats['fairness_score'] = rank_dealers.compute_fairness_score(stats['median_rel_pct'], stats['listings'])
+        stats = stats.join(self.dealers, on='dealer_name')
+        readmitted = (cutoff > rank_dealers.DRIVING_TIME_CUTOFF) & (stats['driving_time_minutes'] <= cutoff)
+        stats = stats[(stats['address_excluded'] != 1) & ((stats['excluded'] != 1) | readmitted)]
+
+        stats['reviews_score'] = rank_dealers.compute_reviews_score(stats['google_rating'])
+        stats['proximity_score'] = rank_dealers.compute_proximity_score(stats['driving_time_minutes'], cutoff)
+        stats['inventory_score'] = rank_dealers.compute_inventory_score(stats['listings'])
+
+        keep = stats['driving_time_minutes'].notna() & (stats['driving_time_minutes'] <= cutoff)
+        if min_rating is not None:
+            keep &= stats['google_rating'] >= min_rating
+        stats = stats[keep].copy()
+
+        stats['composite_score'] = (
+            w_reviews * stats['reviews_score'] +
+            w_fairness * stats['fairness_score'] +
+            w_proximity * stats['proximity_score'] +
+            w_inventory * stats['inventory_score']
+        )
+        stats = stats.sort_values(
+            by=['composite_score', 'reviews_score', 'median_rel_pct', 'listings'],
+            ascending=[False, False, True, False]
+        ).reset_index(drop=True)
+        stats['rank'] = range(1, len(stats) + 1)
+        return stats.head(top)[[
+            'rank', 'dealer_name', 'address', 'driving_time_minutes', 'google_rating', 'listings',
+            'median_rel_pct', 'fairness_score', 'reviews_score', 'proximity_score', 'inventory_score',
+            'composite_score',
+        ]]
+
+
+def _records(ranked: pd.DataFrame) -> list:
+    return json.loads(ranked.to_json(orient='records'))
+
+
+def make_handler(service: RankingService):
+    class RankingHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path != '/rank':
+                self.send_error(404, 'Use /rank')
+                return
+            params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            try:
+                start = time.perf_counter()
+                ranked = service.query(
+                    weights=[float(w) for w in params['weights'].split(',')] if 'weights' in params else None,
+                    cutoff=float(params['cutoff']) if 'cutoff' in params else None,
+                    min_rating=float(params['min_rating']) if 'min_rating' in params else None,
+                    make=params.get('make'),
+                    model=params.get('model'),
+                    top=int(params.get('top', 5)),
+                )
+                body = {'elapsed_ms': round((time.perf_counter() - start) * 1000, 2), 'dealers': _records(ranked)}
+            except (ValueError, TypeError) as e:
+                self.send_error(400, str(e))
+                return
+            data = json.dumps(body).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass  # Keep the console quiet
+
+    return RankingHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query dealer rankings from the precomputed feature table')
+    parser.add_argument('--db', default=RESULTS_DB)
+    sub = parser.add_subparsers(dest='command', required=True)
+    query = sub.add_parser('query', help='Print top-k dealers')
+    query.add_argument('--weights', type=float, nargs=4, metavar=('REVIEWS', 'FAIRNESS', 'PROXIMITY', 'INVENTORY'))
+    query.add_argument('--cutoff', type=float, help='Driving time cutoff in minutes')
+    query.add_argument('--min-rating', type=float)
+    query.add_argument('--make')
+    query.add_argument('--model')
+    query.add_argument('--top', type=int, default=5)
+    serve = sub.add_parser('serve', help='Serve GET /rank on localhost')
+    serve.add_argument('--port', type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+
+    service = RankingService(args.db)
+    if args.command == 'query':
+        start = time.perf_counter()
+        ranked = service.query(args.weights, args.cutoff, args.min_rating, args.make, args.model, args.top)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(ranked.round(2).to_string(index=False))
+        print(f"\n({elapsed:.1f} ms)")
+    else:
+        server = ThreadingHTTPServer(('127.0.0.1', args.port), make_handler(service))
+        print(f"Serving rankings on http://127.0.0.1:{args.port}/rank (Ctrl+C to stop)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Persisted pricing state for incremental dealer ranking.
+- Listings, per-spec median prices and per-dealer pricing aggregates live in scraped_car_data.db
+- update() diffs a run's listings against the state: only spec_keys with new, changed or
+  removed listings get a new median, and only dealers with listings in those specs are
+  re-aggregated
+- dealer_stats() returns the same frame compute_pricing_fairness does
+
+Usage: python3 ranking_state.py [--rebuild]
+"""
+
+import argparse
+import sqlite3
+import pandas as pd
+from typing import Iterable, Set, Tuple
+
+from rank_dealers import aggregate_dealer_pricing, load_and_normalize_data
+from results_store import RESULTS_DB
+
+SQL_CHUNK = 500  # Values per IN (...) clause (SQLite's variable limit)
+STATE_COLUMNS = ['listing_key', 'dealer_name', 'spec_key', 'price']
+DEALER_COLUMNS = ['dealer_name', 'listings', 'unique_specs', 'median_rel_pct',
+                  'pct_below_median', 'pct_within_1pct', 'fairness_score']
+
+
+def listing_keys(df: pd.DataFrame) -> pd.Series:
+    """Stable identity per listing: VIN, else listing URL, else dealer|spec|price.
+
+    Repeats of the same identity get an occurrence suffix (#1, #2, ...) so every row has its own key.
+    """
+    base = pd.Series(None, index=df.index, dtype=object)
+    for col in ('vin', 'listing_url'):
+        if col in df.columns:
+            values = df[col].astype(object).where(df[col].notna() & (df[col].astype(str).str.strip() != ''))
+            base = base.fillna(col + ':' + values.astype(str).where(values.notna()))
+    missing = base.isna()
+    if missing.any():
+        rows = df[missing]
+        base[missing] = 'row:' + rows['dealer_name'].astype(str) + '|' + rows['spec_key'].astype(str) + '|' + rows['price'].astype(str)
+    repeats = base.duplicated()
+    if repeats.any():
+        occurrence = base.groupby(base).cumcount()
+        base[repeats] = base[repeats] + '#' + occurrence[repeats].astype(str)
+    return base
+
+
+class RankingState:
+    """Listings, spec medians and dealer aggregates, updated in place from each run's delta."""
+
+    def __init__(self, path: str = RESULTS_DB):
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS rank_state_listings (
+                listing_key TEXT PRIMARY KEY,
+                dealer_name TEXT NOT NULL,
+                spec_key TEXT NOT NULL,
+                price REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_rank_state_listings_spec ON rank_state_listings(spec_key);
+            CREATE INDEX IF NOT EXISTS idx_rank_state_listings_dealer ON rank_state_listings(dealer_name);
+            CREATE TABLE IF NOT EXISTS rank_state_specs (
+                spec_key TEXT PRIMARY KEY,
+                median_price REAL NOT NULL,
+                listings INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS rank_state_dealers (
+                dealer_name TEXT PRIMARY KEY,
+                listings INTEGER NOT NULL,
+                unique_specs INTEGER NOT NULL,
+                median_rel_pct REAL,
+                pct_below_median REAL,
+                pct_within_1pct REAL,
+                fairness_score REAL
+            );
+        """)
+        self.conn.commit()
+
+    def _select_in(self, sql: str, values: Iterable[str], columns: list) -> pd.DataFrame:
+        """Run `sql` (with one `{}` placeholder for an IN list) over values in chunks."""
+        values = list(values)
+        frames = [
+            pd.DataFrame(self.conn.execute(
+                sql.format(', '.join('?' * len(values[i:i + SQL_CHUNK]))), values[i:i + SQL_CHUNK]
+            ).fetchall(), columns=columns)
+            for i in range(0, len(values), SQL_CHUNK)
+        ]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+
+    def _delete_in(self, table: str, column: str, values: Iterable[str]):
+        values = list(values)
+        for i in range(0, len(values), SQL_CHUNK):
+            chunk = values[i:i + SQL_CHUNK]
+            self.conn.execute(f"DELETE FROM {table} WHERE {column} IN ({', '.join('?' * len(chunk))})", chunk)
+
+    def update(self, df: pd.DataFrame) -> Tuple[int, Set[str], Set[str]]:
+        """Bring the state in line with `df` (normalized listings: dealer_name, spec_key, price).
+
+        Returns (changed listings, spec_keys re-medianed, dealers re-aggregated).
+        """
+        new = df[['dealer_name', 'spec_key', 'price']].assign(listing_key=listing_keys(df))[STATE_COLUMNS]
+        new = new.astype({'dealer_name': str, 'spec_key': str, 'price': 'float64'})
+        old = pd.read_sql("SELECT listing_key, dealer_name, spec_key, price FROM rank_state_listings", self.conn)
+
+        merged = old.merge(new, on='listing_key', how='outer', suffixes=('_old', '_new'), indicator=True)
+        changed = (merged['_merge'] != 'both') | (
+            (merged['dealer_name_old'] != merged['dealer_name_new']) |
+            (merged['spec_key_old'] != merged['spec_key_new']) |
+            (merged['price_old'] != merged['price_new'])
+        )
+        delta = merged[changed]
+        if delta.empty:
+            return 0, set(), set()
+
+        touched_specs = set(delta['spec_key_old'].dropna()) | set(delta['spec_key_new'].dropna())
+        moved_dealers = set(delta['dealer_name_old'].dropna()) | set(delta['dealer_name_new'].dropna())
+
+        # Apply the listing delta
+        self._delete_in('rank_state_listings', 'listing_key', delta.loc[delta['_merge'] != 'right_only', 'listing_key'])
+        inserts = new[new['listing_key'].isin(delta.loc[delta['_merge'] != 'left_only', 'listing_key'])]
+        self.conn.executemany(
+            "INSERT INTO rank_state_listings (listing_key, dealer_name, spec_key, price) VALUES (?, ?, ?, ?)",
+            inserts.itertuples(index=False, name=None)
+        )
+
+        # Re-median only the touched specs
+        spec_prices = self._select_in(
+            "SELECT spec_key, price FROM rank_state_listings WHERE spec_key IN ({})", touched_specs, ['spec_key', 'price']
+        )
+        medians = spec_prices.groupby('spec_key')['price'].agg(['median', 'count'])
+        self._delete_in('rank_state_specs', 'spec_key', touched_specs)
+        self.conn.executemany(
+            "INSERT INTO rank_state_specs (spec_key, median_price, listings) VALUES (?, ?, ?)",
+            ((spec, float(row['median']), int(row['count'])) for spec, row in medians.iterrows())
+        )
+
+        # Every dealer with a listing in a touched spec has new rel_pct values
+        affected = moved_dealers | set(self._select_in(
+            "SELECT DISTINCT dealer_name FROM rank_state_listings WHERE spec_key IN ({})", touched_specs, ['dealer_name']
+        )['dealer_name'])
+        listings = self._select_in(
+            """
+            SELECT l.dealer_name, l.spec_key, l.price, s.median_price
+            FROM rank_state_listings l JOIN rank_state_specs s ON s.spec_key = l.spec_key
+            WHERE l.dealer_name IN ({})
+            """,
+            affected, ['dealer_name', 'spec_key', 'price', 'spec_median_price']
+        )
+        listings['rel_pct'] = (listings['price'] - listings['spec_median_price']) / listings['spec_median_price']
+        dealer_stats = aggregate_dealer_pricing(listings)
+        self._delete_in('rank_state_dealers', 'dealer_name', affected)
+        self.conn.executemany(
+            f"INSERT INTO rank_state_dealers ({', '.join(DEALER_COLUMNS)}) VALUES ({', '.join('?' * len(DEALER_COLUMNS))})",
+            dealer_stats[DEALER_COLUMNS].astype(object).itertuples(index=False, name=None)
+        )
+        self.conn.commit()
+        return len(delta), touched_specs, affected
+
+    def spec_medians(self) -> pd.Series:
+        return pd.read_sql("SELECT spec_key, median_price FROM rank_state_specs", self.conn).set_index('spec_key')['median_price']
+
+    def dealer_stats(self) -> pd.DataFrame:
+        """Per-dealer pricing aggregates, sorted by dealer name like compute_pricing_fairness."""
+        dealer_stats = pd.read_sql(f"SELECT {', '.join(DEALER_COLUMNS)} FROM rank_state_dealers", self.conn)
+        return dealer_stats.sort_values('dealer_name').reset_index(drop=True)
+
+    def clear(self):
+        self.conn.executescript("DELETE FROM rank_state_listings; DELETE FROM rank_state_specs; DELETE FROM rank_state_dealers;")
+
+    def close(self):
+        self.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Incremental ranking state')
+    parser.add_argument('--db', default=RESULTS_DB)
+    parser.add_argument('--rebuild', action='store_true', help='Drop the state and rebuild it from the results store')
+    args = parser.parse_args()
+
+    state = RankingState(args.db)
+    if args.rebuild:
+        state.clear()
+        changed, specs, dealers = state.update(load_and_normalize_data(args.db))
+        print(f"✓ Rebuilt state: {changed} listings, {len(specs)} specs, {len(dealers)} dealers")
+    counts = [state.conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+              for t in ('rank_state_listings', 'rank_state_specs', 'rank_state_dealers')]
+    print(f"{counts[0]} listings, {counts[1]} specs, {counts[2]} dealers in {args.db}")
+    state.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Results store for scraped listings.
+full_scraper writes its results here (SQLite, typed columns, indexed);
+rank_dealers and the analysis scripts read them back through load_results().
+scraped_car_data.xlsx is still written, but only as an export.
+"""
+
+import sqlite3
+import pandas as pd
+from pathlib import Path
+from typing import List, Optional
+
+RESULTS_DB = 'scraped_car_data.db'
+LEGACY_EXCEL_FILE = 'scraped_car_data.xlsx'
+RESULTS_TABLE = 'listings'
+
+# Column -> SQLite type. Anything else the scraper produces is stored as TEXT.
+SCHEMA = {
+    'make': 'TEXT',
+    'model': 'TEXT',
+    'trim': 'TEXT',
+    'year': 'INTEGER',
+    'dealer_name': 'TEXT',
+    'dealer_address': 'TEXT',
+    'dealer_city': 'TEXT',
+    'dealer_state': 'TEXT',
+    'dealer_zip': 'TEXT',
+    'dealer_id': 'TEXT',
+    'lease_monthly': 'REAL',
+    'full_price': 'REAL',
+    'vin': 'TEXT',
+    'stock_number': 'TEXT',
+    'msrp': 'REAL',
+    'list_price': 'REAL',
+    'cash_price': 'REAL',
+    'your_price': 'REAL',
+    'dealer_discount': 'REAL',
+    'finance_monthly': 'REAL',
+    'exterior_color': 'TEXT',
+    'interior_color': 'TEXT',
+    'mpg': 'TEXT',
+    'source_file': 'TEXT',
+    'url': 'TEXT',
+    'scrape_timestamp': 'TEXT',
+    'error': 'TEXT',
+    'spec_key': 'TEXT',
+}
+
+INDEXED_COLUMNS = ['vin', 'dealer_name', 'spec_key', 'source_file']
+
+
+def build_spec_key(df: pd.DataFrame) -> pd.Series:
+    """year|make|model|trim (trim omitted when empty) - same key rank_dealers groups on."""
+    year = pd.to_numeric(df['year'], errors='coerce').astype('Int64').astype(str)
+    base = year + '|' + df['make'].astype(str) + '|' + df['model'].astype(str)
+    trim = df['trim'].fillna('').astype(str) if 'trim' in df.columns else pd.Series('', index=df.index)
+    key = base.where(trim == '', base + '|' + trim)
+    complete = df['year'].notna() & df['make'].notna() & df['model'].notna()
+    return key.where(complete, None)
+
+
+def _coerce_types(df: pd.DataFrame) -> pd.DataFrame:
+    """Cast scraper output (mostly strings) to the store's column types."""
+    df = df.copy()
+    for col, sql_type in SCHEMA.items():
+        if col not in df.columns:
+            continue
+        if sql_type == 'REAL':
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
+        elif sql_type == 'INTEGER':
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('Int64')
+        else:
+            df[col] = df[col].astype(object).where(df[col].notna(), None)
+    return df
+
+
+def save_results(df: pd.DataFrame, path: str = RESULTS_DB) -> int:
+    """Replace the stored results with `df`. Returns the number of rows written."""
+    df = _coerce_types(df)
+    if {'year', 'make', 'model'} <= set(df.columns):
+        df['spec_key'] = build_spec_key(df)
+
+    columns = list(df.columns)
+    column_defs = ', '.join(f'"{col}" {SCHEMA.get(col, "TEXT")}' for col in columns)
+
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute(f'DROP TABLE IF EXISTS {RESULTS_TABLE}')
+        conn.execute(f'CREATE TABLE {RESULTS_TABLE} ({column_defs})')
+        df.to_sql(RESULTS_TABLE, conn, if_exists='append', index=False, chunksize=10000)
+        for col in INDEXED_COLUMNS:
+            if col in columns:
+                conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{RESULTS_TABLE}_{col} ON {RESULTS_TABLE}("{col}")')
+        conn.commit()
+    finally:
+        conn.close()
+    return len(df)
+
+
+EXPORT_SUFFIXES = ('.xlsx', '.xls', '.csv')
+
+
+def is_results_store(path: str) -> bool:
+    """True if `path` is a SQLite file holding the listings table (not just feature/state tables)."""
+    if not Path(path).exists() or Path(path).suffix.lower() in EXPORT_SUFFIXES:
+        return False
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                            (RESULTS_TABLE,)).fetchone() is not None
+    except sqlite3.DatabaseError:
+        return False
+    finally:
+        conn.close()
+
+
+def resolve_results_path(path: Optional[str] = None) -> Optional[str]:
+    """Pick the results source: the store if it holds results, else the legacy Excel export."""
+    candidates = [path] if path else [RESULTS_DB, LEGACY_EXCEL_FILE]
+    for candidate in candidates:
+        if not candidate or not Path(candidate).exists():
+            continue
+        if Path(candidate).suffix.lower() in EXPORT_SUFFIXES or is_results_store(candidate):
+            return candidate
+    return None
+
+
+def load_results(path: Optional[str] = None, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Shared loader for scraped results (SQLite store, or .xlsx/.csv for old runs)."""
+    source = resolve_results_path(path)
+    if source is None:
+        raise FileNotFoundError(f"No scraped results found ({path or RESULTS_DB} / {LEGACY_EXCEL_FILE})")
+
+    suffix = Path(source).suffix.lower()
+    if suffix in ('.xlsx', '.xls'):
+        df = pd.read_excel(source)
+        return df[columns] if columns else df
+    if suffix == '.csv':
+        return pd.read_csv(source, usecols=columns)
+
+    conn = sqlite3.connect(source)
+    try:
+        select = ', '.join(f'"{col}"' for col in columns) if columns else '*'
+        cursor = conn.execute(f'SELECT {select} FROM {RESULTS_TABLE}')
+        names = [d[0] for d in cursor.description]
+        df = pd.DataFrame.from_records(cursor.fetchall(), columns=names)
+    finally:
+        conn.close()
+
+    # SQLite hands back Python objects; restore the declared column types
+    for col in df.columns:
+        sql_type = SCHEMA.get(col)
+        if sql_type == 'REAL':
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
+        elif sql_type == 'INTEGER':
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('Int64')
+    return df
+
+
+def export_excel(df: pd.DataFrame, output_file: str = LEGACY_EXCEL_FILE):
+    """Write the human-readable Excel export."""
+    df.to_excel(output_file, index=False, engine='openpyxl')
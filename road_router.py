@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Offline drive-time routing over a road-graph extract (no network needed).
+- Loads nodes/edges CSVs into a compact CSR adjacency structure
+- One-to-many Dijkstra from the origin gives every dealer's time in one pass
+- A* (haversine / top speed heuristic) for single origin->destination queries
+- Results cached in dealer_enrichment.db per graph version (hash of the files)
+
+Graph files (e.g. exported from an OSM extract of the metro area):
+  road_nodes.csv: node_id,lat,lon
+  road_edges.csv: u,v,length_miles,speed_mph[,oneway]   (or u,v,length_miles,minutes)
+"""
+
+import hashlib
+import heapq
+import sqlite3
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from enrichment_cache import ENRICHMENT_DB
+from geo import haversine_miles
+
+ROAD_NODES_FILE = 'road_nodes.csv'
+ROAD_EDGES_FILE = 'road_edges.csv'
+
+# Getting from the address to the nearest graph node (driveways, parking lots, local streets)
+SNAP_SPEED_MPH = 20
+# Further than this from the nearest node, a point is taken to be outside the extract (not routed)
+MAX_SNAP_MILES = 1.0
+
+
+def graph_version(*paths: str) -> str:
+    """Content hash of the graph files; cached routes are only valid for the same version."""
+    digest = hashlib.sha1()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+class RoadGraph:
+    """Directed road graph in CSR form (indptr/indices/minutes/miles arrays)."""
+
+    def __init__(self, node_ids, lat, lon, edges_u, edges_v, minutes, miles, version: str = ''):
+        self.node_ids = np.asarray(node_ids)
+        self.lat = np.asarray(lat, dtype='float64')
+        self.lon = np.asarray(lon, dtype='float64')
+        self.version = version
+
+        order = np.argsort(edges_u, kind='stable')
+        self.indices = np.asarray(edges_v, dtype='int32')[order]
+        self.minutes = np.asarray(minutes, dtype='float32')[order]
+        self.miles = np.asarray(miles, dtype='float32')[order]
+        counts = np.bincount(np.asarray(edges_u)[order], minlength=len(self.node_ids))
+        self.indptr = np.concatenate([[0], np.cumsum(counts)]).astype('int64')
+
+        # Fastest edge speed bounds the A* heuristic (keeps it admissible)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            speeds = np.where(self.minutes > 0, self.miles / self.minutes * 60, 0)
+        self.max_speed_mph = float(max(speeds.max(initial=0), SNAP_SPEED_MPH))
+
+        # Plain lists for the search loops (numpy scalar indexing is slow in pure Python)
+        self._indptr = self.indptr.tolist()
+        self._indices = self.indices.tolist()
+        self._minutes = self.minutes.tolist()
+        self._miles = self.miles.tolist()
+
+    @classmethod
+    def from_csv(cls, nodes_path: str = ROAD_NODES_FILE, edges_path: str = ROAD_EDGES_FILE) -> 'RoadGraph':
+        nodes = pd.read_csv(nodes_path)
+        edges = pd.read_csv(edges_path)
+
+        index = pd.Series(np.arange(len(nodes)), index=nodes['node_id'])
+        u = index.reindex(edges['u']).to_numpy()
+        v = index.reindex(edges['v']).to_numpy()
+        valid = ~(np.isnan(u) | np.isnan(v))
+        if not valid.all():
+            print(f"  ⚠ Dropping {(~valid).sum()} edges with unknown nodes")
+        edges = edges[valid]
+        u, v = u[valid].astype('int64'), v[valid].astype('int64')
+
+        miles = edges['length_miles'].to_numpy(dtype='float64')
+        if 'minutes' in edges.columns:
+            minutes = edges['minutes'].to_numpy(dtype='float64')
+        else:
+            minutes = miles / edges['speed_mph'].to_numpy(dtype='float64') * 60
+
+        # Two-way streets get the reverse edge too
+        oneway = edges['oneway'].fillna(0).astype(bool).to_numpy() if 'oneway' in edges.columns \
+            else np.zeros(len(edges), dtype=bool)
+        two_way = ~oneway
+        edges_u = np.concatenate([u, v[two_way]])
+        edges_v = np.concatenate([v, u[two_way]])
+        minutes = np.concatenate([minutes, minutes[two_way]])
+        miles = np.concatenate([miles, miles[two_way]])
+
+        return cls(nodes['node_id'], nodes['lat'], nodes['lon'], edges_u, edges_v, minutes, miles,
+                   version=graph_version(nodes_path, edges_path))
+
+    def nearest_nodes(self, lat, lon) -> Tuple[np.ndarray, np.ndarray]:
+        """Closest graph node (and its straight-line miles) for each query point."""
+        lat = np.atleast_1d(np.asarray(lat, dtype='float64'))
+        lon = np.atleast_1d(np.asarray(lon, dtype='float64'))
+        nodes = np.empty(len(lat), dtype='int64')
+        miles = np.empty(len(lat))
+        for i in range(len(lat)):
+            d = haversine_miles(lat[i], lon[i], self.lat, self.lon)
+            nodes[i] = int(d.argmin())
+            miles[i] = d[nodes[i]]
+        return nodes, miles
+
+    def shortest_times(self, source: int, targets=None) -> Tuple[np.ndarray, np.ndarray]:
+        """One-to-many Dijkstra from `source` (minutes, miles per node; inf if unreachable).
+
+        Stops early once every node in `targets` is settled.
+        """
+        n = len(self.node_ids)
+        best = [float('inf')] * n
+        dist = [float('inf')] * n
+        settled = [False] * n
+        remaining = set(int(t) for t in targets) if targets is not None else None
+        indptr, indices, minutes, miles = self._indptr, self._indices, self._minutes, self._miles
+
+        best[source] = 0.0
+        dist[source] = 0.0
+        heap = [(0.0, source)]
+        while heap:
+            t, node = heapq.heappop(heap)
+            if settled[node]:
+                continue
+            settled[node] = True
+            if remaining is not None:
+                remaining.discard(node)
+                if not remaining:
+                    break
+            for k in range(indptr[node], indptr[node + 1]):
+                nxt = indices[k]
+                cand = t + minutes[k]
+                if cand < best[nxt]:
+                    best[nxt] = cand
+                    dist[nxt] = dist[node] + miles[k]
+                    heapq.heappush(heap, (cand, nxt))
+        return np.array(best), np.array(dist)
+
+    def route_time(self, source: int, target: int) -> Tuple[float, float]:
+        """A* between two nodes -> (minutes, miles)."""
+        indptr, indices, minutes, miles = self._indptr, self._indices, self._minutes, self._miles
+        minutes_per_mile = 60 / self.max_speed_mph
+        target_lat, target_lon = self.lat[target], self.lon[target]
+        heuristic = haversine_miles(self.lat, self.lon, target_lat, target_lon) * minutes_per_mile
+        heuristic = heuristic.tolist()
+
+        best = {source: 0.0}
+        dist = {source: 0.0}
+        closed = set()
+        heap = [(heuristic[source], source)]
+        while heap:
+            _, node = heapq.heappop(heap)
+            if node == target:
+                return best[node], dist[node]
+            if node in closed:
+                continue
+            closed.add(node)
+            t = best[node]
+            for k in range(indptr[node], indptr[node + 1]):
+                nxt = indices[k]
+                cand = t + minutes[k]
+                if cand < best.get(nxt, float('inf')):
+                    best[nxt] = cand
+                    dist[nxt] = dist[node] + miles[k]
+                    heapq.heappush(heap, (cand + heuristic[nxt], nxt))
+        return float('inf'), float('inf')
+
+
+def _point_key(lat: float, lon: float) -> str:
+    return f"{lat:.5f},{lon:.5f}"
+
+
+class RoadRouter:
+    """Origin -> many destinations drive times, cached per graph version."""
+
+    def __init__(self, graph: RoadGraph, cache_path: str = ENRICHMENT_DB):
+        self.graph = graph
+        self.conn = sqlite3.connect(cache_path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS route_times (
+                graph_version TEXT NOT NULL,
+                origin_key TEXT NOT NULL,
+                dest_key TEXT NOT NULL,
+                distance_miles REAL,
+                minutes REAL,
+                computed_at TEXT NOT NULL,
+                PRIMARY KEY (graph_version, origin_key, dest_key)
+            )
+        """)
+        self.conn.commit()
+
+    def drive_times(self, origin: Tuple[float, float],
+                    destinations: Dict[str, Tuple[float, float]]) -> Dict[str, Tuple[Optional[float], Optional[float]]]:
+        """{key: (distance_miles, driving_time_minutes)}; (None, None) if unreachable or off the graph."""
+        origin_key = _point_key(*origin)
+        dest_keys = {key: _point_key(lat, lon) for key, (lat, lon) in destinations.items()}
+
+        cached = dict(
+            (dest_key, (miles, minutes)) for dest_key, miles, minutes in self.conn.execute(
+                "SELECT dest_key, distance_miles, minutes FROM route_times WHERE graph_version = ? AND origin_key = ?",
+                (self.graph.version, origin_key)
+            )
+        )
+        missing = [key for key, dest_key in dest_keys.items() if dest_key not in cached]
+
+        if missing:
+            (source,), (source_snap,) = self.graph.nearest_nodes(origin[0], origin[1])
+            targets, snap_miles = self.graph.nearest_nodes(
+                [destinations[k][0] for k in missing], [destinations[k][1] for k in missing]
+            )
+            times, miles = self.graph.shortest_times(int(source), targets)
+
+            now = datetime.now().isoformat()
+            rows = []
+            for key, node, snap in zip(missing, targets, snap_miles):
+                if np.isinf(times[node]) or max(source_snap, snap) > MAX_SNAP_MILES:
+                    result = (None, None)
+                else:
+                    connector = source_snap + snap
+                    result = (
+                        round(float(miles[node] + connector), 1),
+                        int(round(float(times[node] + connector / SNAP_SPEED_MPH * 60)))
+                    )
+                cached[dest_keys[key]] = result
+                rows.append((self.graph.version, origin_key, dest_keys[key], result[0], result[1], now))
+            self.conn.executemany(
+                """
+                INSERT INTO route_times (graph_version, origin_key, dest_key, distance_miles, minutes, computed_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(graph_version, origin_key, dest_key) DO UPDATE SET
+                    distance_miles = excluded.distance_miles, minutes = excluded.minutes,
+                    computed_at = excluded.computed_at
+                """,
+                rows
+            )
+            self.conn.commit()
+
+        return {key: cached[dest_key] for key, dest_key in dest_keys.items()}
+
+    def close(self):
+        self.conn.close()
+
+
+def load_router(nodes_path: str = ROAD_NODES_FILE, edges_path: str = ROAD_EDGES_FILE,
+                cache_path: str = ENRICHMENT_DB) -> Optional[RoadRouter]:
+    """RoadRouter if a graph extract is available, else None (callers fall back to Maps)."""
+    if not (Path(nodes_path).exists() and Path(edges_path).exists()):
+        return None
+    graph = RoadGraph.from_csv(nodes_path, edges_path)
+    print(f"✓ Road graph {graph.version}: {len(graph.node_ids):,} nodes, {len(graph.indices):,} edges")
+    return RoadRouter(graph, cache_path)
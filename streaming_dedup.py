@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Streaming deduplication for scraper results, applied as each result arrives.
+- A listing's identity is its VIN, or (no VIN passing the check digit)
+  make|model|year|trim|stock_number|dealer_name,
+  kept as a 64-bit digest rather than the string
+- Digests live in an in-memory set until MEMORY_KEY_LIMIT; past that they move to an on-disk
+  SQLite index fronted by a Bloom filter, so new keys (the common case) never touch disk and
+  a Bloom false positive is confirmed on disk instead of dropping a listing
+- Error results are always kept (they have no identity); duplicates are counted per source_file
+
+full_scraper drops duplicates before they're appended to the run's results, and skips the page
+load entirely when a URL's VIN was already kept.
+
+Usage: python3 streaming_dedup.py [--db scraped_car_data.db] [--memory-limit N]   (report for a stored run)
+"""
+
+import argparse
+import hashlib
+import math
+import os
+import sqlite3
+import tempfile
+import pandas as pd
+from collections import Counter, defaultdict
+from typing import Dict, Optional
+
+from results_store import RESULTS_DB, load_results
+from vin_decoder import is_valid_vin
+
+MEMORY_KEY_LIMIT = 2_000_000  # Digests kept in a set (~70 bytes each) before switching to disk
+BLOOM_FALSE_POSITIVE_RATE = 0.01  # Share of new keys that need a disk lookup once on disk
+DISK_COMMIT_EVERY = 10_000
+FALLBACK_KEY_COLUMNS = ['make', 'model', 'year', 'trim', 'stock_number', 'dealer_name']
+
+
+def _text(value) -> str:
+    """Key text for one field: '' for missing, integral floats without the .0 (2025.0 -> 2025)."""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def listing_key(result: Dict) -> Optional[int]:
+    """64-bit digest of a result's identity (valid VIN, else the fallback columns); None for error results."""
+    if result.get('error'):
+        return None
+    vin = _text(result.get('vin')).upper()
+    vin = vin if is_valid_vin(vin) else ''  # A mistyped VIN would split one listing into two identities
+    key = 'vin:' + vin if vin else 'key:' + '|'.join(_text(result.get(c)).lower() for c in FALLBACK_KEY_COLUMNS)
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little', signed=True)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over 64-bit keys (double hashing of the two 32-bit halves)."""
+
+    def __init__(self, capacity: int, false_positive_rate: float = BLOOM_FALSE_POSITIVE_RATE):
+        self.size = max(64, int(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: int):
+        h1, h2 = key & 0xFFFFFFFF, ((key >> 32) & 0xFFFFFFFF) | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key: int):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: int) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class DiskKeyIndex:
+    """Key set in SQLite, with a Bloom filter in front so only probable hits are looked up."""
+
+    def __init__(self, capacity: int, path: Optional[str] = None):
+        self.owns_file = path is None
+        if path is None:
+            fd, path = tempfile.mkstemp(prefix='dedup_', suffix='.db')
+            os.close(fd)
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS dedup_keys (key INTEGER PRIMARY KEY) WITHOUT ROWID")
+        self.bloom = BloomFilter(capacity)
+        self.count = 0
+        self.disk_lookups = 0
+        self.add_many(key for (key,) in self.conn.execute("SELECT key FROM dedup_keys").fetchall())  # Reopened index
+
+    def __contains__(self, key: int) -> bool:
+        if key not in self.bloom:
+            return False
+        self.disk_lookups += 1
+        return self.conn.execute("SELECT 1 FROM dedup_keys WHERE key = ?", (key,)).fetchone() is not None
+
+    def add(self, key: int):
+        self.bloom.add(key)
+        self.conn.execute("INSERT OR IGNORE INTO dedup_keys (key) VALUES (?)", (key,))
+        self.count += 1
+        if self.count % DISK_COMMIT_EVERY == 0:
+            self.conn.commit()
+
+    def add_many(self, keys):
+        keys = list(keys)
+        for key in keys:
+            self.bloom.add(key)
+        self.conn.executemany("INSERT OR IGNORE INTO dedup_keys (key) VALUES (?)", ((k,) for k in keys))
+        self.conn.commit()
+        self.count += len(keys)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+        if self.owns_file:
+            os.remove(self.path)
+
+
+class StreamingDeduplicator:
+    """Keeps the first result per listing identity; feed results in arrival order with add()."""
+
+    def __init__(self, memory_limit: int = MEMORY_KEY_LIMIT, index_path: Optional[str] = None):
+        self.memory_limit = memory_limit
+        self.index_path = index_path
+        self.keys = set()  # 64-bit keys while small; a DiskKeyIndex past memory_limit
+        self.counts = defaultdict(Counter)
+
+    @property
+    def on_disk(self) -> bool:
+        return not isinstance(self.keys, set)
+
+    def _remember(self, key: int):
+        self.keys.add(key)
+        if not self.on_disk and len(self.keys) > self.memory_limit:
+            # Bloom filter sized for 10x what we have so far
+            index = DiskKeyIndex(capacity=10 * len(self.keys), path=self.index_path)
+            index.add_many(self.keys)
+            print(f"Dedup index: {len(self.keys):,} keys moved to disk ({index.path})")
+            self.keys = index
+
+    def add(self, result: Dict) -> bool:
+        """True if `result` is new (keep it), False if it duplicates an earlier one."""
+        source = result.get('source_file') or 'unknown'
+        key = listing_key(result)
+        if key is None:
+            self.counts[source]['errors'] += 1
+            return True
+        if key in self.keys:
+            self.counts[source]['duplicates'] += 1
+            return False
+        self._remember(key)
+        self.counts[source]['kept'] += 1
+        return True
+
+    def drop_known_vin(self, vin: Optional[str], source_file: Optional[str] = None) -> bool:
+        """True (and counted as a duplicate) if a listing with this VIN was already kept - lets the
+        scraper skip the page load for URLs whose VIN it already has."""
+        if not is_valid_vin(vin) or listing_key({'vin': vin}) not in self.keys:
+            return False
+        self.counts[source_file or 'unknown']['duplicates'] += 1
+        return True
+
+    def report(self) -> pd.DataFrame:
+        """Per source_file: kept, duplicates, errors (plus a total row)."""
+        report = pd.DataFrame.from_dict(self.counts, orient='index').reindex(
+            columns=['kept', 'duplicates', 'errors']).fillna(0).astype(int).sort_index()
+        report.loc['total'] = report.sum()
+        return report
+
+    def print_report(self):
+        report = self.report()
+        print(f"\nDeduplicated {report.loc['total'].sum():,} results as they arrived"
+              f" ({len(self.keys):,} listing keys{', on disk' if self.on_disk else ''}):")
+        print(report.to_string())
+
+    def close(self):
+        if self.on_disk:
+            self.keys.close()
+
+
+def frame_results(df: pd.DataFrame):
+    """A frame's rows as result dicts holding only the columns dedup reads (much cheaper than to_dict)."""
+    columns = [c for c in ['error', 'vin', 'source_file'] + FALLBACK_KEY_COLUMNS if c in df.columns]
+    values = [df[c].to_numpy(dtype=object, na_value=None) for c in columns]
+    return (dict(zip(columns, row)) for row in zip(*values))
+
+
+def dedupe_frame(df: pd.DataFrame, memory_limit: int = MEMORY_KEY_LIMIT) -> pd.DataFrame:
+    """Stream a frame's rows through a StreamingDeduplicator (row order kept)."""
+    dedup = StreamingDeduplicator(memory_limit)
+    keep = [dedup.add(result) for result in frame_results(df)]
+    dedup.close()
+    return df[keep]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Streaming dedup report for stored results')
+    parser.add_argument('--db', default=RESULTS_DB)
+    parser.add_argument('--memory-limit', type=int, default=MEMORY_KEY_LIMIT)
+    args = parser.parse_args()
+
+    dedup = StreamingDeduplicator(args.memory_limit)
+    for result in frame_results(load_results(args.db)):
+        dedup.add(result)
+    dedup.print_report()
+    dedup.close()
+
+
+if __name__ == '__main__':
+    main()
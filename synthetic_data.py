@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Synthetic scraped_car_data-shaped listings and matching dealer enrichment, for scale testing.
+- make_dealers: franchise dealers (one brand each) in towns around the search area, with
+  heavy-tailed inventory sizes
+- make_listings: raw scraper rows (strings for year/prices, like full_scraper) over a
+  configurable number of specs, with re-scraped duplicate VINs, missing fields, scrape
+  errors, per-dealer markups and outlier prices
+- make_syndicated_copies: the same car re-listed at a sister dealer without its VIN (near duplicates)
+- make_enrichment / write_enrichment_cache: Google rating, review count and driving
+  distance/time per dealer, as a frame or as a dealer_enrichment.db cache
+
+Usage: python3 synthetic_data.py --listings 100000 [--dealers 2000] [--specs 80]
+           [--duplicate-rate 0.05] [--missing-rate 0.02] [--error-rate 0.01] [--out-dir synthetic]
+"""
+
+import argparse
+import functools
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from enrichment_cache import ENRICHMENT_DB, EnrichmentCache
+from geo import SEED_ZIP_CENTROIDS, haversine_miles
+from results_store import RESULTS_DB, save_results
+from vin_decoder import check_digits
+
+# (make, model) -> (base price, trims in price order)
+CATALOG = {
+    ('Honda', 'Accord'): (28000, ['LX', 'SE', 'Sport', 'EX-L', 'Touring']),
+    ('Toyota', 'Camry'): (28500, ['LE', 'SE', 'XLE', 'XSE']),
+    ('Nissan', 'Altima'): (27000, ['S', 'SV', 'SR', 'SL']),
+    ('Mazda', 'Mazda3'): (24500, ['', 'Select', 'Preferred', 'Premium']),
+    ('Subaru', 'Impreza'): (23500, ['', 'Sport', 'RS']),
+}
+WMI = {'Honda': '1HG', 'Toyota': '4T1', 'Nissan': '1N4', 'Mazda': '3MZ', 'Subaru': 'JF1'}
+VIN_CHARS = np.frombuffer(b'ABCDEFGHJKLMNPRSTUVWXYZ0123456789', dtype='S1')
+VIN_YEAR_CODES = {2020: 'L', 2021: 'M', 2022: 'N', 2023: 'P', 2024: 'R', 2025: 'S', 2026: 'T'}
+YEARS = [2026, 2025, 2024, 2023, 2022]  # Newest first; specs beyond the catalog reach back in years
+
+TOWNS = [  # (city, state, zip) - coordinates from geo.SEED_ZIP_CENTROIDS
+    ('White Plains', 'NY', '10601'), ('New Rochelle', 'NY', '10801'), ('Mount Vernon', 'NY', '10550'),
+    ('Yonkers', 'NY', '10701'), ('Yonkers', 'NY', '10710'), ('Mamaroneck', 'NY', '10543'),
+    ('Port Chester', 'NY', '10573'), ('Tarrytown', 'NY', '10591'), ('Peekskill', 'NY', '10566'),
+    ('Spring Valley', 'NY', '10977'), ('Bronx', 'NY', '10468'), ('Greenwich', 'CT', '06830'),
+    ('Stamford', 'CT', '06902'), ('Mineola', 'NY', '11501'), ('Hempstead', 'NY', '11550'),
+]
+STREETS = ['Central Ave', 'Boston Post Rd', 'Tarrytown Rd', 'Main St', 'Westchester Ave',
+           'Saw Mill River Rd', 'Route 9', 'Mamaroneck Ave', 'North Ave', 'Hempstead Tpke']
+SURNAMES = ['Smith', 'Rivera', 'DeMarco', 'Ferrara', 'Nielsen', 'Curry', 'Dalton', 'Bruno']
+COLORS = ['White', 'Black', 'Silver', 'Gray', 'Blue', 'Red']
+SCRAPE_ERRORS = ['Timeout 30000ms exceeded.', 'net::ERR_CONNECTION_RESET', 'Target page, context or browser has been closed']
+ORIGIN_LAT_LON = SEED_ZIP_CENTROIDS['10601']  # rank_dealers.ORIGIN (White Plains)
+URL_PREFIX = 'https://www.truecar.com/new-cars-for-sale/listing/'  # + VIN + '/', like the scraped URLs
+SCRAPE_START = '2026-01-05T09:00:00'
+LISTING_COLUMNS = ['make', 'model', 'trim', 'year', 'dealer_name', 'dealer_address', 'dealer_city', 'dealer_state',
+                   'dealer_zip', 'vin', 'stock_number', 'msrp', 'list_price', 'full_price', 'exterior_color',
+                   'url', 'source_file', 'scrape_timestamp', 'error']
+RANKING_COLUMNS = ['make', 'model', 'trim', 'year', 'dealer_name', 'full_price']  # What rank_dealers needs
+
+
+def make_specs(n_specs: Optional[int] = None) -> pd.DataFrame:
+    """year/make/model/trim combinations with an MSRP each (newest model year first)."""
+    rows = [
+        (year, make, model, trim, base * (1 + 0.07 * i) * (1 - 0.06 * age))
+        for age, year in enumerate(YEARS)
+        for (make, model), (base, trims) in CATALOG.items()
+        for i, trim in enumerate(trims)
+    ]
+    n_specs = n_specs or sum(len(trims) for _, trims in CATALOG.values()) * 2
+    if n_specs > len(rows):
+        raise ValueError(f"At most {len(rows)} specs ({len(YEARS)} model years of the catalog)")
+    specs = pd.DataFrame(rows[:n_specs], columns=['year', 'make', 'model', 'trim', 'msrp'])
+    specs['msrp'] = (specs['msrp'] / 5).round() * 5
+    return specs
+
+
+def make_dealers(n_dealers: int, seed: int = 0) -> pd.DataFrame:
+    """Franchise dealers: name, brand, address, city/state/zip, lat/lon and relative inventory size."""
+    rng = np.random.default_rng(seed)
+    makes = np.array(sorted({make for make, _ in CATALOG}))
+    towns = pd.DataFrame(TOWNS, columns=['city', 'state', 'zip'])
+    brand = makes[np.arange(n_dealers) % len(makes)]
+    town = towns.iloc[rng.integers(0, len(towns), n_dealers)].reset_index(drop=True)
+    surname = np.array(SURNAMES)[rng.integers(0, len(SURNAMES), n_dealers)]
+    pattern = rng.integers(0, 3, n_dealers)
+    names = pd.Series(np.select(
+        [pattern == 0, pattern == 1],
+        [town['city'] + ' ' + brand, brand + ' of ' + town['city']],
+        default=surname + ' ' + brand,
+    ))
+    repeat = names.groupby(names).cumcount()
+    names = names.where(repeat == 0, names + ' ' + (repeat + 1).astype(str))  # A second "Stamford Honda" is "Stamford Honda 2"
+
+    lat_lon = np.array([SEED_ZIP_CENTROIDS[z] for z in town['zip']])
+    street = np.array(STREETS)[rng.integers(0, len(STREETS), n_dealers)]
+    return pd.DataFrame({
+        'dealer_name': names,
+        'brand': brand,
+        'dealer_address': rng.integers(10, 2999, n_dealers).astype(str) + ' ' + street,
+        'dealer_city': town['city'],
+        'dealer_state': town['state'],
+        'dealer_zip': town['zip'],
+        'lat': lat_lon[:, 0] + rng.normal(0, 0.02, n_dealers),
+        'lon': lat_lon[:, 1] + rng.normal(0, 0.02, n_dealers),
+        'size': rng.lognormal(0, 1, n_dealers),
+    })
+
+
+def _vins(make: np.ndarray, year: np.ndarray, serial: np.ndarray, rng) -> np.ndarray:
+    """Valid 17-character VINs: WMI by make, random VDS, check digit, model-year code, plant, unique serial."""
+    n = len(make)
+    chars = VIN_CHARS[rng.integers(0, len(VIN_CHARS), (n, 17))]
+    chars[:, 0:3] = pd.Series(make).map(WMI).to_numpy().astype('S3').view('S1').reshape(n, 3)
+    chars[:, 6] = VIN_CHARS[rng.integers(0, 23, n)]  # A letter at position 7 puts the year code in the 2010+ cycle
+    chars[:, 9] = pd.Series(year).map(VIN_YEAR_CODES).to_numpy().astype('S1')
+    chars[:, 11:17] = np.char.zfill(serial.astype(str), 6).astype('S6').view('S1').reshape(n, 6)
+    chars[:, 8] = check_digits(pd.Series(chars.view('S17').ravel().astype(str))).to_numpy().astype('S1')
+    return chars.view('S17').ravel().astype(str).astype(object)
+
+
+def make_listings(n_listings: int, n_dealers: Optional[int] = None, n_specs: Optional[int] = None,
+                  dealers: Optional[pd.DataFrame] = None, duplicate_rate: float = 0.0,
+                  missing: Optional[Dict[str, float]] = None, error_rate: float = 0.0,
+                  price_spread: float = 0.04, dealer_markup: float = 0.02, outlier_rate: float = 0.0,
+                  columns: Optional[List[str]] = None, seed: int = 0) -> pd.DataFrame:
+    """Raw scraper rows (year and prices as strings, like full_scraper produces).
+
+    duplicate_rate: share of rows that re-scrape an earlier listing (same VIN, new timestamp,
+      sometimes repriced); missing: {column: share set to None}; error_rate: share of rows that
+      are failed scrapes (url/error only); price_spread / dealer_markup: sd of the per-listing
+      and per-dealer price factors; outlier_rate: share priced 15-30% off; columns: a subset of
+      LISTING_COLUMNS to build (string columns dominate the cost at millions of rows).
+    """
+    rng = np.random.default_rng(seed)
+    if dealers is None:
+        dealers = make_dealers(n_dealers or max(10, n_listings // 20), seed=seed)
+    specs = make_specs(n_specs)
+    n_unique = n_listings - int(round(n_listings * duplicate_rate))
+
+    # Specs by popularity (Zipf-like), then a dealer of that brand weighted by inventory size
+    popularity = 1 / np.arange(1, len(specs) + 1) ** 0.8
+    spec = rng.choice(len(specs), n_unique, p=popularity / popularity.sum())
+    dealer = np.empty(n_unique, dtype='int64')
+    spec_make = specs['make'].to_numpy()[spec]
+    for make in np.unique(spec_make):
+        rows = np.flatnonzero(spec_make == make)
+        pool = np.flatnonzero(dealers['brand'].to_numpy() == make) if 'brand' in dealers else np.array([], dtype='int64')
+        pool = pool if len(pool) else np.arange(len(dealers))
+        weight = dealers['size'].to_numpy()[pool] if 'size' in dealers else np.ones(len(pool))
+        dealer[rows] = pool[rng.choice(len(pool), len(rows), p=weight / weight.sum())]
+
+    markup = rng.normal(0, dealer_markup, len(dealers))
+    factor = 1 + markup[dealer] + rng.normal(0, price_spread, n_unique)
+    outliers = rng.random(n_unique) < outlier_rate
+    factor[outliers] *= 1 + rng.choice([-1, 1], outliers.sum()) * rng.uniform(0.15, 0.30, outliers.sum())
+    msrp = specs['msrp'].to_numpy()[spec]
+    price = np.maximum((msrp * factor).round(), 1000).astype('int64')
+
+    # Per-column generators, so a column's values don't depend on which other columns are built
+    column_rng = {column: np.random.default_rng([seed, i]) for i, column in enumerate(LISTING_COLUMNS)}
+    years = specs['year'].to_numpy()[spec]
+    vins = functools.lru_cache(lambda: _vins(spec_make, years, np.arange(n_unique), column_rng['vin']))  # vin and url share them
+    scraped_at = lambda: (np.datetime64(SCRAPE_START) + np.sort(
+        column_rng['scrape_timestamp'].integers(0, 6 * 3600, n_unique)).astype('timedelta64[s]'))
+    price_text = price.astype(str)
+    builders = {
+        'make': lambda: spec_make,
+        'model': lambda: specs['model'].to_numpy()[spec],
+        'trim': lambda: specs['trim'].to_numpy()[spec],
+        'year': lambda: years.astype(str),
+        'dealer_name': lambda: dealers['dealer_name'].to_numpy()[dealer],
+        'dealer_address': lambda: dealers['dealer_address'].to_numpy()[dealer],
+        'dealer_city': lambda: dealers['dealer_city'].to_numpy()[dealer],
+        'dealer_state': lambda: dealers['dealer_state'].to_numpy()[dealer],
+        'dealer_zip': lambda: dealers['dealer_zip'].to_numpy()[dealer],
+        'vin': vins,
+        'stock_number': lambda: 'S' + pd.Series(column_rng['stock_number'].integers(10000, 99999, n_unique)).astype(str),
+        'msrp': lambda: msrp.astype('int64').astype(str),
+        'list_price': lambda: price_text,
+        'full_price': lambda: price_text,
+        'exterior_color': lambda: np.array(COLORS)[column_rng['exterior_color'].integers(0, len(COLORS), n_unique)],
+        'url': lambda: URL_PREFIX + pd.Series(vins()) + '/',
+        'source_file': lambda: (specs['make'] + '_' + specs['model']).to_numpy()[spec],
+        'scrape_timestamp': lambda: scraped_at().astype(str).astype(object),
+        'error': lambda: np.full(n_unique, None, dtype=object),
+    }
+    listings = pd.DataFrame({column: builders[column]() for column in (columns or LISTING_COLUMNS)})
+
+    # Re-scrapes: same listing a few hours later; 30% of them repriced
+    n_dup = n_listings - n_unique
+    duplicate_of = rng.integers(0, n_unique, n_dup)
+    repriced = rng.random(n_dup) < 0.3
+    new_price = (price[duplicate_of] * (1 + rng.normal(0, 0.02, n_dup))).round().astype('int64').astype(str)
+    order = rng.permutation(n_listings)
+    if n_dup:
+        dup = listings.iloc[duplicate_of].copy()
+        for column in ('list_price', 'full_price'):
+            if column in dup:
+                dup.loc[repriced, column] = new_price[repriced]
+        if 'scrape_timestamp' in dup:
+            later = dup['scrape_timestamp'].to_numpy().astype('datetime64[s]') + np.timedelta64(6, 'h')
+            dup['scrape_timestamp'] = later.astype(str).astype(object)
+        listings = pd.concat([listings, dup], ignore_index=True)
+        listings = listings.iloc[order].reset_index(drop=True)
+
+    for column, share in (missing or {}).items():
+        listings.loc[rng.random(len(listings)) < share, column] = None
+
+    errors = rng.random(len(listings)) < error_rate
+    if errors.any() and 'error' in listings:
+        keep = ['url', 'scrape_timestamp', 'source_file']
+        listings.loc[errors, [c for c in listings.columns if c not in keep]] = None
+        listings.loc[errors, 'error'] = np.array(SCRAPE_ERRORS)[rng.integers(0, len(SCRAPE_ERRORS), errors.sum())]
+    return listings
+
+
+def make_syndicated_copies(listings: pd.DataFrame, dealers: pd.DataFrame, rate: float = 0.02,
+                           seed: int = 0) -> pd.DataFrame:
+    """Near-duplicate re-listings of `rate` of the valid listings: the same car at a sister dealer
+    (same brand), with no VIN and one of: stock number without its letter prefix, a trim suffix,
+    or a price nudged by up to 1%. Indexed by the listing each row copies."""
+    rng = np.random.default_rng(seed)
+    valid = listings.index[listings['error'].isna() & listings['stock_number'].notna()]
+    copies = listings.loc[rng.choice(valid, int(round(len(listings) * rate)), replace=False)].copy()
+    sisters = dealers.groupby('brand')['dealer_name'].agg(list)
+    located = dealers.set_index('dealer_name')
+    copies['dealer_name'] = [rng.choice(sisters[make]) for make in copies['make']]
+    for column in ('dealer_address', 'dealer_city', 'dealer_state', 'dealer_zip'):
+        copies[column] = located.loc[copies['dealer_name'], column].to_numpy()
+    copies['vin'] = None
+    copies['url'] = copies['url'].str.replace('/listing/', '/listing/syndicated/', regex=False)
+
+    change = rng.integers(0, 3, len(copies))
+    copies.loc[change == 0, 'stock_number'] = copies.loc[change == 0, 'stock_number'].str.lstrip('S')
+    copies.loc[change == 1, 'trim'] = (copies.loc[change == 1, 'trim'].fillna('') + ' CVT').str.strip()
+    nudged = copies.loc[change == 2, 'full_price'].astype(float) * rng.uniform(0.99, 1.01, (change == 2).sum())
+    copies.loc[change == 2, 'full_price'] = nudged.round().astype('int64').astype(str)
+    return copies
+
+
+def make_enrichment(dealers: pd.DataFrame, missing_rating: float = 0.2, missing_drive: float = 0.1,
+                    seed: int = 0) -> pd.DataFrame:
+    """Google rating / review count and road distance / driving time from ORIGIN per dealer, with gaps like the real cache."""
+    rng = np.random.default_rng(seed)
+    n = len(dealers)
+    rating = rng.uniform(2.5, 5.0, n).round(1)
+    rating[rng.random(n) < missing_rating] = np.nan
+    miles = (haversine_miles(ORIGIN_LAT_LON[0], ORIGIN_LAT_LON[1], dealers['lat'], dealers['lon'])
+             * rng.uniform(1.15, 1.4, n)).round(1)
+    drive = (miles / rng.uniform(22, 38, n) * 60 + 3).round()
+    gaps = rng.random(n) < missing_drive
+    miles[gaps] = np.nan
+    drive[gaps] = np.nan
+    return pd.DataFrame({
+        'dealer_name': dealers['dealer_name'].to_numpy(),
+        'address': (dealers['dealer_address'] + ', ' + dealers['dealer_city'] + ', ' +
+                    dealers['dealer_state'] + ' ' + dealers['dealer_zip']).to_numpy(),
+        'google_rating': rating,
+        'google_review_count': np.where(np.isnan(rating), np.nan, rng.lognormal(5, 1, n).round()),
+        'distance_miles': miles,
+        'driving_time_minutes': drive,
+    })
+
+
+def write_enrichment_cache(enrichment: pd.DataFrame, path: str = ENRICHMENT_DB) -> int:
+    """Store make_enrichment output as a dealer_enrichment.db cache (fresh values). Returns dealers written."""
+    fields = {'address': 'address', 'google_rating': 'rating', 'google_review_count': 'review_count',
+              'distance_miles': 'distance_miles', 'driving_time_minutes': 'driving_time_minutes'}
+    values = (
+        (name, field, value.item() if hasattr(value, 'item') else value)
+        for column, field in fields.items()
+        for name, value in zip(enrichment['dealer_name'], enrichment[column])
+        if pd.notna(value)
+    )
+    cache = EnrichmentCache(path)
+    cache.put_many(values)
+    cache.close()
+    return len(enrichment)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Synthetic scraped listings and dealer enrichment')
+    parser.add_argument('--listings', type=int, required=True)
+    parser.add_argument('--dealers', type=int, help='Default: one per 20 listings')
+    parser.add_argument('--specs', type=int, help='Default: two model years of the catalog')
+    parser.add_argument('--duplicate-rate', type=float, default=0.05)
+    parser.add_argument('--missing-rate', type=float, default=0.02, help='Share of dealer_name / full_price / trim / dealer_address left empty')
+    parser.add_argument('--error-rate', type=float, default=0.01)
+    parser.add_argument('--outlier-rate', type=float, default=0.01)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out-dir', default='synthetic', help=f'Writes {RESULTS_DB} and {ENRICHMENT_DB} here')
+    args = parser.parse_args()
+
+    dealers = make_dealers(args.dealers or max(10, args.listings // 20), seed=args.seed)
+    missing = {column: args.missing_rate for column in ('dealer_name', 'full_price', 'trim', 'dealer_address')}
+    listings = make_listings(args.listings, n_specs=args.specs, dealers=dealers, duplicate_rate=args.duplicate_rate,
+                             missing=missing, error_rate=args.error_rate, outlier_rate=args.outlier_rate, seed=args.seed)
+    out = Path(args.out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    save_results(listings, str(out / RESULTS_DB))
+    write_enrichment_cache(make_enrichment(dealers, seed=args.seed), str(out / ENRICHMENT_DB))
+    print(f"✓ {len(listings):,} listings ({listings['vin'].dropna().duplicated().sum():,} duplicate VINs, "
+          f"{listings['error'].notna().sum():,} errors) from {len(dealers):,} dealers -> {out / RESULTS_DB}")
+    print(f"✓ Enrichment for {len(dealers):,} dealers -> {out / ENRICHMENT_DB}")
+
+
+if __name__ == '__main__':
+    main()
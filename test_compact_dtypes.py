@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Tests for the compact typed schema applied by normalize_data."""
+
+import contextlib
+import io
+import os
+import tempfile
+import pandas as pd
+
+import rank_dealers
+from enrichment_cache import EnrichmentCache
+from benchmark_ranking import reference_normalize, reference_pricing_fairness
+from test_vectorized_scoring import _synthetic
+
+
+def _normalize(raw):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return rank_dealers.normalize_data(raw.copy())
+
+
+def test_schema_is_compact():
+    df = _normalize(_synthetic()[0])
+    for col in ('dealer_name', 'make', 'model', 'trim', 'spec_key'):
+        assert isinstance(df[col].dtype, pd.CategoricalDtype), col
+    assert df['price'].dtype == 'float32'
+    assert df['year'].dtype == 'int32'
+    assert df['spec_code'].dtype == 'int32'
+    # spec_code is the category code of spec_key
+    assert (df['spec_key'].cat.categories[df['spec_code']] == df['spec_key'].astype(str)).all()
+
+
+def test_memory_report_shows_reduction():
+    raw = _synthetic(20000)[0]
+    report = rank_dealers.memory_report(reference_normalize(raw.copy()), _normalize(raw))
+    assert report.loc['total', 'mb_after'] < report.loc['total', 'mb_before'] / 4
+    assert report.loc['spec_key', 'dtype_after'] == 'category'
+
+
+def test_fairness_unchanged_by_compact_dtypes():
+    raw = _synthetic()[0]
+    with contextlib.redirect_stdout(io.StringIO()):
+        got = rank_dealers.compute_pricing_fairness(_normalize(raw))
+    expected = reference_pricing_fairness(reference_normalize(raw.copy()))
+    pd.testing.assert_frame_equal(got, expected, check_dtype=False, check_exact=True)
+
+
+def test_unparseable_year_falls_back_to_float32():
+    raw = _synthetic()[0]
+    raw.loc[raw.index[:10], 'year'] = 'N/A'
+    df = _normalize(raw)
+    assert df['year'].dtype == 'float32'
+
+
+def test_seed_addresses_with_categorical_dealer_names():
+    # A dealer whose rows have no scraped address is still a category of dealer_name; grouping
+    # without observed=True would hand it an empty group (IndexError on pandas 2)
+    raw = _synthetic()[0]
+    raw['dealer_address'] = raw['dealer_name'] + ', 1 Main St, Scarsdale, NY 10583'
+    no_address = raw['dealer_name'].dropna().iat[0]
+    raw.loc[raw['dealer_name'] == no_address, 'dealer_address'] = None
+    df = _normalize(raw)
+    assert isinstance(df['dealer_name'].dtype, pd.CategoricalDtype) and no_address in df['dealer_name'].cat.categories
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = EnrichmentCache(os.path.join(tmp, 'e.db'))
+        changed = rank_dealers.seed_scraped_addresses(df, cache)
+        seeded = {d: cache.get(d).get('address') for d in df['dealer_name'].cat.categories}
+        cache.close()
+    assert changed == df['dealer_name'].nunique() - 1
+    assert seeded[no_address] is None
+    assert all(address == f'{d}, 1 Main St, Scarsdale, NY 10583' for d, address in seeded.items() if d != no_address)
+
+
+def test_fairness_on_categorical_spec_key_alone():
+    df = _normalize(_synthetic()[0])
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected = rank_dealers.compute_pricing_fairness(df.copy())
+        got = rank_dealers.compute_pricing_fairness(df.drop(columns='spec_code'))
+    pd.testing.assert_frame_equal(got, expected, check_exact=True)
+
+
+if __name__ == '__main__':
+    for name, fn in list(globals().items()):
+        if name.startswith('test_') and callable(fn):
+            fn()
+            print(f"✓ {name}")
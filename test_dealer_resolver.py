@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""Tests for dealer name resolution and the persisted alias table."""
+
+import contextlib
+import io
+import os
+import tempfile
+import pandas as pd
+
+from dealer_resolver import DealerResolver
+
+
+def _resolver(tmp):
+    return DealerResolver(os.path.join(tmp, 'aliases.db'))
+
+
+def test_variants_collapse_to_most_common_name():
+    with tempfile.TemporaryDirectory() as tmp:
+        resolver = _resolver(tmp)
+        names = ['Honda of New Rochelle', 'New Rochelle Honda', 'HONDA OF NEW ROCHELLE, INC.',
+                 'Honda of New Rochele', 'Honda of Yonkers', 'Toyota of New Rochelle']
+        counts = {'New Rochelle Honda': 10, 'Honda of New Rochelle': 3}
+        mapping = resolver.resolve(names, counts)
+        resolver.close()
+    assert {mapping[n] for n in names[:4]} == {'New Rochelle Honda'}
+    assert mapping['Honda of Yonkers'] == 'Honda of Yonkers'
+    assert mapping['Toyota of New Rochelle'] == 'Toyota of New Rochelle'
+
+
+def test_aliases_persist_and_manual_wins():
+    with tempfile.TemporaryDirectory() as tmp:
+        resolver = _resolver(tmp)
+        resolver.resolve(['Curry Honda', 'Honda Curry'], {'Curry Honda': 5})
+        resolver.add_alias('Curry Honda', 'Curry Honda Yorktown', 'manual')
+        resolver.close()
+
+        resolver = _resolver(tmp)
+        mapping = resolver.resolve(['CURRY HONDA INC', 'Honda Curry'])
+        resolver.close()
+    assert mapping['CURRY HONDA INC'] == 'Curry Honda Yorktown'
+    assert mapping['Honda Curry'] == 'Curry Honda Yorktown'  # Follows the renamed canonical
+
+
+def test_apply_keeps_missing_names():
+    with tempfile.TemporaryDirectory() as tmp:
+        resolver = _resolver(tmp)
+        df = pd.DataFrame({'dealer_name': ['Nissan of Mamaroneck', 'Mamaroneck Nissan', None, '---']})
+        with contextlib.redirect_stdout(io.StringIO()):
+            out = resolver.apply(df)
+        resolver.close()
+    assert out['dealer_name'].iloc[0] == out['dealer_name'].iloc[1]
+    assert pd.isna(out['dealer_name'].iloc[2])
+    assert out['dealer_name'].iloc[3] == '---'
+
+
+if __name__ == '__main__':
+    for name, fn in list(globals().items()):
+        if name.startswith('test_') and callable(fn):
+            fn()
+            print(f"✓ {name}")
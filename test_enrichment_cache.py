@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""Tests for the per-field enrichment cache: TTL expiry, negative-cache backoff, put_many, JSON migration."""
+
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import enrichment_cache
+from enrichment_cache import EnrichmentCache
+
+
+def _age(cache, dealer_name, field, **delta):
+    """Pretend `field` was fetched (and, for a miss, due for retry) `delta` earlier."""
+    shift = timedelta(**delta)
+    fetched_at, next_retry_at = cache.conn.execute(
+        "SELECT fetched_at, next_retry_at FROM dealer_fields WHERE dealer_name = ? AND field = ?",
+        (dealer_name, field)
+    ).fetchone()
+    cache.conn.execute(
+        "UPDATE dealer_fields SET fetched_at = ?, next_retry_at = ? WHERE dealer_name = ? AND field = ?",
+        ((datetime.fromisoformat(fetched_at) - shift).isoformat(),
+         next_retry_at and (datetime.fromisoformat(next_retry_at) - shift).isoformat(), dealer_name, field)
+    )
+
+
+def _retry_hours(cache, dealer_name, field):
+    fetched_at, next_retry_at = cache.conn.execute(
+        "SELECT fetched_at, next_retry_at FROM dealer_fields WHERE dealer_name = ? AND field = ?",
+        (dealer_name, field)
+    ).fetchone()
+    return round((datetime.fromisoformat(next_retry_at) - datetime.fromisoformat(fetched_at)) / timedelta(hours=1))
+
+
+def test_each_field_expires_on_its_own_ttl():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = EnrichmentCache(os.path.join(tmp, 'e.db'))
+        assert cache.stale_fields('Honda of Rye') == set(enrichment_cache.ENRICHMENT_FIELDS)  # Never fetched
+        for field, value in [('address', '1 Main St'), ('rating', 4.5), ('review_count', 120),
+                             ('distance_miles', 9.5), ('driving_time_minutes', 18)]:
+            cache.put('Honda of Rye', field, value)
+        assert cache.stale_fields('Honda of Rye') == set()
+        for field in enrichment_cache.ENRICHMENT_FIELDS:
+            _age(cache, 'Honda of Rye', field, days=31)
+        assert cache.stale_fields('Honda of Rye') == {'rating', 'review_count'}  # 30-day fields only
+        _age(cache, 'Honda of Rye', 'address', days=150)
+        assert cache.stale_fields('Honda of Rye') == {'rating', 'review_count', 'address'}
+        assert cache.stale_fields('Honda of Rye', ['distance_miles']) == set()
+        assert cache.get('Honda of Rye')['rating'] == 4.5  # Stale values are still readable
+        cache.close()
+
+
+def test_missing_value_backs_off_exponentially():
+    base, cap = enrichment_cache.NEGATIVE_BACKOFF_BASE_HOURS, enrichment_cache.NEGATIVE_BACKOFF_MAX_HOURS
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = EnrichmentCache(os.path.join(tmp, 'e.db'))
+        cache.put('Kia of Yonkers', 'rating', 4.1)
+        hours = []
+        for _ in range(8):
+            cache.put('Kia of Yonkers', 'rating', None)
+            hours.append(_retry_hours(cache, 'Kia of Yonkers', 'rating'))
+        assert hours == [min(base * 2 ** i, cap) for i in range(8)] and hours[-1] == cap
+        assert cache.get('Kia of Yonkers')['rating'] == 4.1  # A miss keeps the last good value
+        assert 'rating' not in cache.stale_fields('Kia of Yonkers')  # Not due yet
+        _age(cache, 'Kia of Yonkers', 'rating', hours=cap)
+        assert 'rating' in cache.stale_fields('Kia of Yonkers')  # Due for retry
+
+        # A success resets the backoff
+        cache.put('Kia of Yonkers', 'rating', 4.3)
+        cache.put('Kia of Yonkers', 'rating', None)
+        assert _retry_hours(cache, 'Kia of Yonkers', 'rating') == base
+        cache.close()
+
+
+def test_put_many_matches_put():
+    values = [('A Honda', 'address', '1 Main St'), ('A Honda', 'rating', 4.2), ('B Toyota', 'review_count', 88)]
+    with tempfile.TemporaryDirectory() as tmp:
+        one, many = EnrichmentCache(os.path.join(tmp, 'one.db')), EnrichmentCache(os.path.join(tmp, 'many.db'))
+        for value in values:
+            one.put(*value)
+        many.put('A Honda', 'rating', None)  # An earlier miss is overwritten by the success
+        many.put_many(values)
+        for cache in (one, many):
+            assert cache.get('A Honda') == {'address': '1 Main St', 'rating': 4.2}
+            assert cache.get('B Toyota') == {'review_count': 88}
+            assert cache.stale_fields('A Honda', ['address', 'rating']) == set()
+        assert sorted(many.dealers()) == ['A Honda', 'B Toyota']
+        one.close()
+        many.close()
+
+
+def test_migrate_json_imports_once():
+    legacy = {
+        'A Honda': {'address': '1 Main St', 'rating': 4.6, 'distance_miles': None, 'driving_time_minutes': 14},
+        'Far Nissan': None,  # Excluded in the old cache
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, 'dealer_info_cache.json')
+        with open(json_path, 'w') as f:
+            json.dump(legacy, f)
+        cache = EnrichmentCache(os.path.join(tmp, 'e.db'))
+        assert cache.migrate_json(os.path.join(tmp, 'absent.json')) == 0
+        assert cache.migrate_json(json_path) == 2
+        assert cache.get('A Honda') == {'address': '1 Main St', 'rating': 4.6, 'driving_time_minutes': 14}
+        assert 'distance_miles' in cache.stale_fields('A Honda')  # null in the JSON -> still to look up
+        assert cache.is_excluded('Far Nissan') and cache.snapshot(['Far Nissan']) == {'Far Nissan': None}
+        cache.put('A Honda', 'rating', 4.8)
+        assert cache.migrate_json(json_path) == 0  # Non-empty cache: never re-imported over newer values
+        assert cache.get('A Honda')['rating'] == 4.8
+        cache.close()
+
+
+def test_exclusions_expire_and_can_be_lifted():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = EnrichmentCache(os.path.join(tmp, 'e.db'))
+        cache.exclude('Far Nissan', 'straight-line 52.0 mi')
+        assert cache.exclusion_reason('Far Nissan') == 'straight-line 52.0 mi'
+        old = (datetime.now() - timedelta(days=enrichment_cache.EXCLUSION_TTL_DAYS)).isoformat()
+        cache.conn.execute("UPDATE dealer_exclusions SET excluded_at = ?", (old,))
+        assert not cache.is_excluded('Far Nissan') and cache.exclusion_reason('Far Nissan') is None
+        cache.exclude('Far Nissan', 'exclude address')
+        cache.unexclude('Far Nissan')
+        assert not cache.is_excluded('Far Nissan')
+        cache.close()
+
+
+if __name__ == '__main__':
+    for name, fn in list(globals().items()):
+        if name.startswith('test_') and callable(fn):
+            fn()
+            print(f"✓ {name}")
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""Tests for parsing the single-pass Google Maps/Search extraction payloads."""
+
+import rank_dealers
+
+
+def _empty_result():
+    return {'address': None, 'rating': None, 'review_count': None, 'lat': None, 'lon': None}
+
+
+def _payload(**fields):
+    payload = {'url': '', 'rating': None, 'reviews': None, 'address': None,
+               'route': [], 'labels': [], 'jsonld': '', 'text': None}
+    payload.update(fields)
+    return payload
+
+
+def test_place_panel_fields():
+    result = _empty_result()
+    rank_dealers.parse_place_payload(_payload(
+        url='https://www.google.com/maps/place/Honda+of+New+Rochelle/@40.912,-73.781,17z/data=x',
+        rating='4.6', reviews='1,234 reviews', address='Address: 25 Laurel Ave, New Rochelle, NY 10801',
+    ), result)
+    assert result == {'address': '25 Laurel Ave, New Rochelle, NY 10801', 'rating': 4.6,
+                      'review_count': 1234, 'lat': 40.912, 'lon': -73.781}
+
+
+def test_text_fallback_and_existing_values_kept():
+    result = _empty_result()
+    result['rating'] = 4.9
+    rank_dealers.parse_place_payload(_payload(
+        text='Curry Honda\n4.3 stars (512)\n3026 Crompond Rd, Yorktown Heights, NY 10598\n'
+    ), result)
+    assert result['rating'] == 4.9
+    assert result['review_count'] == 512
+    assert result['address'] == '3026 Crompond Rd, Yorktown Heights, NY 10598'
+
+
+def test_route_summary():
+    assert rank_dealers.parse_route_payload(_payload(route=['via I-287 E\n1 hr 5 min\n48.2 miles'])) == (48.2, 65)
+    assert rank_dealers.parse_route_payload(_payload(text='Best route\n22 min\n12.4 mi\n')) == (12.4, 22)
+    # A distance with no time next to it isn't a route
+    assert rank_dealers.parse_route_payload(_payload(labels=['Zoom out 5 mi'])) == (None, None)
+
+
+if __name__ == '__main__':
+    for name, fn in list(globals().items()):
+        if name.startswith('test_') and callable(fn):
+            fn()
+            print(f"✓ {name}")
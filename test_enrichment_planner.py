@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Tests for the enrichment planner's cost/success bookkeeping and ordering."""
+
+import asyncio
+import contextlib
+import io
+import os
+import tempfile
+import numpy as np
+
+import rank_dealers
+from enrichment_cache import EnrichmentCache
+from enrichment_planner import EnrichmentPlanner
+from geo import Geocoder
+from road_router import RoadGraph, RoadRouter
+
+
+class _FakeBrowser:
+    """Just enough of async_playwright for enrich_dealers' page pool (no page is actually loaded)."""
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    @property
+    def chromium(self):
+        return self
+
+    async def launch(self, **kwargs):
+        return self
+
+    async def new_context(self):
+        return self
+
+    async def new_page(self):
+        return self
+
+    async def close(self):
+        pass
+
+
+def test_variants_ordered_by_cost_per_success():
+    with tempfile.TemporaryDirectory() as tmp:
+        planner = EnrichmentPlanner(os.path.join(tmp, 'e.db'))
+        variants = ['maps:dealership', 'maps:auto dealer', 'search:reviews']
+        # Unmeasured -> given order
+        assert planner.order_variants('reviews', variants) == variants
+        planner.record('reviews', 'maps:dealership', 60.0, 1, attempts=10)   # 6s, 10% success
+        planner.record('reviews', 'search:reviews', 50.0, 9, attempts=10)    # 5s, 90% success
+        order = planner.order_variants('reviews', variants)
+        planner.close()
+    assert order[0] == 'search:reviews'
+    assert order[-1] == 'maps:dealership'
+
+
+def test_exclusion_steps_first_then_cheapest():
+    with tempfile.TemporaryDirectory() as tmp:
+        planner = EnrichmentPlanner(os.path.join(tmp, 'e.db'))
+        steps = [('reviews', False), ('maps_distance', True), ('straight_line', True), ('exclude_address', True)]
+        assert planner.order_steps(steps) == ['exclude_address', 'straight_line', 'maps_distance', 'reviews']
+        # Even if reviews turn out cheap, they can't disqualify anyone, so they stay last
+        planner.record('reviews', '', 0.5, 100, attempts=100)
+        assert planner.order_steps(steps)[-1] == 'reviews'
+
+        with planner.timed('maps_distance', 'maps:directions') as outcome:
+            outcome['success'] = True
+        row = planner.conn.execute(
+            "SELECT attempts, successes FROM lookup_stats WHERE step = 'maps_distance' AND variant = 'maps:directions'"
+        ).fetchone()
+        planner.close()
+    assert row == (1, 1)
+
+
+def test_dealer_outside_road_graph_gets_maps_lookup():
+    # Two-node road graph next to the origin; the 'island' node has no road to it
+    graph = RoadGraph(np.array([1, 2, 3]), np.array([41.03, 41.04, 41.10]), np.array([-73.77, -73.77, -73.70]),
+                      np.array([0, 1]), np.array([1, 0]), np.array([2.0, 2.0]), np.array([0.7, 0.7]))
+    maps_lookups = []
+
+    async def directions(origin, address, pool, planner):
+        maps_lookups.append(address)
+        return 6.5, 14
+
+    original = rank_dealers.async_playwright, rank_dealers.get_distance_and_time
+    rank_dealers.async_playwright, rank_dealers.get_distance_and_time = _FakeBrowser, directions
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'e.db')
+            cache, geocoder = EnrichmentCache(path), Geocoder(path, zip_centroids={})
+            planner, router = EnrichmentPlanner(path), RoadRouter(graph, path)
+            geocoder.put(rank_dealers.ORIGIN, 41.03, -73.77, 'maps')
+            for dealer_name, address, lat, lon in [('On Graph Honda', '1 Main St, Scarsdale, NY', 41.04, -73.77),
+                                                   ('Island Toyota', '9 Shore Rd, Rye, NY', 41.10, -73.70)]:
+                cache.put_many([(dealer_name, 'address', address), (dealer_name, 'rating', 4.5)])
+                geocoder.put(address, lat, lon, 'maps')
+            with contextlib.redirect_stdout(io.StringIO()):
+                asyncio.run(rank_dealers.enrich_dealers(['On Graph Honda', 'Island Toyota'], cache, geocoder,
+                                                        planner, router))
+            on_graph, island = cache.get('On Graph Honda'), cache.get('Island Toyota')
+            for closeable in (cache, geocoder, planner, router):
+                closeable.close()
+    finally:
+        rank_dealers.async_playwright, rank_dealers.get_distance_and_time = original
+    assert maps_lookups == ['9 Shore Rd, Rye, NY']  # Only the dealer the road graph can't reach
+    assert island['driving_time_minutes'] == 14
+    assert on_graph['driving_time_minutes'] is not None
+
+
+if __name__ == '__main__':
+    for name, fn in list(globals().items()):
+        if name.startswith('test_') and callable(fn):
+            fn()
+            print(f"✓ {name}")
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""Tests for great-circle distances and the straight-line pre-filter's exclusion boundary."""
+
+import os
+import tempfile
+import numpy as np
+
+import rank_dealers
+from enrichment_cache import EnrichmentCache
+from geo import EARTH_RADIUS_MILES, Geocoder, haversine_miles
+
+ORIGIN_LAT, ORIGIN_LON = 41.033, -73.765
+MILES_PER_DEGREE_LAT = EARTH_RADIUS_MILES * np.pi / 180
+# Furthest a dealer can be and still (possibly) be within the cutoff
+MAX_MILES = rank_dealers.DRIVING_TIME_CUTOFF / 60 * rank_dealers.PREFILTER_MAX_SPEED_MPH
+
+
+def test_haversine():
+    assert haversine_miles(ORIGIN_LAT, ORIGIN_LON, ORIGIN_LAT, ORIGIN_LON) == 0
+    assert np.isclose(haversine_miles(41.0, -73.8, 42.0, -73.8), MILES_PER_DEGREE_LAT)
+    # White Plains -> Stamford, about 12 miles; symmetric; broadcasts over arrays
+    miles = haversine_miles(ORIGIN_LAT, ORIGIN_LON, np.array([41.053, ORIGIN_LAT]), np.array([-73.540, ORIGIN_LON]))
+    assert 11.5 < miles[0] < 12.5 and miles[1] == 0
+    assert np.isclose(haversine_miles(41.053, -73.540, ORIGIN_LAT, ORIGIN_LON), miles[0])
+
+
+def _prefilter(dealers, origin_source='maps'):
+    """dealers: {name: (miles north of the origin or None for no coordinates, geocode source)}."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'e.db')
+        cache, geocoder = EnrichmentCache(path), Geocoder(path, zip_centroids={})
+        if origin_source:
+            geocoder.put(rank_dealers.ORIGIN, ORIGIN_LAT, ORIGIN_LON, origin_source)
+        for name, (miles, source) in dealers.items():
+            address = f'{len(name)} {name} Rd, Somewhere, NY'
+            cache.put(name, 'address', address)
+            if miles is not None:
+                geocoder.put(address, ORIGIN_LAT + miles / MILES_PER_DEGREE_LAT, ORIGIN_LON, source)
+        result = rank_dealers.straight_line_prefilter(list(dealers), cache, geocoder)
+        cache.close()
+        geocoder.close()
+    return result
+
+
+def test_exclusion_boundary():
+    to_route, too_far = _prefilter({'Inside': (MAX_MILES - 0.1, 'maps'), 'Outside': (MAX_MILES + 0.1, 'maps'),
+                                    'Near': (3.0, 'maps')})
+    assert to_route == ['Inside', 'Near'] and list(too_far) == ['Outside']
+    assert np.isclose(too_far['Outside'], MAX_MILES + 0.1)
+
+
+def test_zip_centroids_get_a_margin():
+    margin = rank_dealers.ZIP_CENTROID_MARGIN_MILES
+    to_route, too_far = _prefilter({'Zip inside': (MAX_MILES + margin - 0.1, 'zip'),
+                                    'Zip outside': (MAX_MILES + margin + 0.1, 'zip'),
+                                    'Exact': (MAX_MILES + margin - 0.1, 'maps')})
+    assert to_route == ['Zip inside'] and sorted(too_far) == ['Exact', 'Zip outside']
+    # A ZIP-centroid origin widens everyone's margin
+    to_route, too_far = _prefilter({'Exact': (MAX_MILES + margin - 0.1, 'maps')}, origin_source='zip')
+    assert to_route == ['Exact'] and not too_far
+
+
+def test_unlocated_dealers_pass_through():
+    to_route, too_far = _prefilter({'No coords': (None, None), 'Far': (80.0, 'maps')})
+    assert to_route == ['No coords'] and list(too_far) == ['Far']  # Never excluded without a position
+    assert _prefilter({'No coords': (None, None)}) == (['No coords'], {})
+    # Origin can't be located: nothing can be ruled out
+    assert _prefilter({'Far': (80.0, 'maps')}, origin_source=None) == (['Far'], {})
+    assert _prefilter({}) == ([], {})
+
+
+if __name__ == '__main__':
+    for name, fn in list(globals().items()):
+        if name.startswith('test_') and callable(fn):
+            fn()
+            print(f"✓ {name}")
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Tests for the listing cache: VINs from URLs, the pricing probe, TTL freshness and unchanged re-checks."""
+
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+from listing_cache import ListingCache, compute_probe, vin_from_url
+
+VIN = '1HGCY2F73TA000001'
+PAGE = 'MSRP: $32,000\nList price $31,500\nYour price: $30,900\n$389/mo lease'
+
+
+def test_vin_from_url():
+    assert vin_from_url(f'https://www.truecar.com/new-cars-for-sale/listing/{VIN.lower()}/2026-honda-accord/') == VIN
+    assert vin_from_url(f'/listing/{VIN}/') == VIN
+    assert vin_from_url(f'/listing/{VIN}0/') is None  # 18 characters
+    assert vin_from_url('/listing/1HGCY2F73TA00000I/') is None  # I is never a VIN character
+    assert vin_from_url('https://www.truecar.com/overview/') is None and vin_from_url(None) is None
+
+
+def test_probe_tracks_prices_only():
+    probe = compute_probe(PAGE)
+    assert probe == compute_probe(PAGE.replace('$32,000', '$32000') + '\nViewed 12 times today')  # Formatting, noise
+    assert probe != compute_probe(PAGE.replace('$30,900', '$30,400'))  # Repriced
+    assert probe != compute_probe(PAGE.replace('$389/mo', '$379/mo'))
+    assert compute_probe('No prices on this page') is None
+
+
+def test_ttl_and_unchanged_recheck():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ListingCache(os.path.join(tmp, 'listings.db'), ttl_hours=24)
+        assert cache.get(VIN) is None and cache.get(None) is None and not cache.is_fresh(None)
+        result = {'url': f'/listing/{VIN}/', 'vin': VIN, 'full_price': '30900', 'error': None}
+        cache.put(VIN, result, compute_probe(PAGE))
+        entry = cache.get(VIN)
+        assert entry['result'] == result and entry['probe'] == compute_probe(PAGE) and cache.is_fresh(entry)
+
+        stale = (datetime.now() - timedelta(hours=25)).isoformat()
+        cache.conn.execute("UPDATE listings SET scraped_at = ?, checked_at = ?", (stale, stale))
+        entry = cache.get(VIN)
+        assert not cache.is_fresh(entry)
+        # Probe matched on re-check: only checked_at (and the URL) move, the extraction is kept
+        cache.put(VIN, {**result, 'url': '/listing/moved/'}, entry['probe'], unchanged=True)
+        rechecked = cache.get(VIN)
+        assert cache.is_fresh(rechecked) and rechecked['scraped_at'] == stale
+        assert rechecked['url'] == '/listing/moved/' and rechecked['result'] == result
+        # Probe changed: full re-extraction replaces the entry
+        repriced = {**result, 'full_price': '30400'}
+        cache.put(VIN, repriced, compute_probe(PAGE.replace('$30,900', '$30,400')))
+        assert cache.get(VIN)['result'] == repriced and cache.get(VIN)['scraped_at'] != stale
+        cache.close()
+
+
+def test_errors_and_missing_vins_not_cached():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ListingCache(os.path.join(tmp, 'listings.db'), ttl_hours=0.5)
+        cache.put(VIN, {'url': 'u', 'error': 'Timeout'}, None)
+        cache.put(None, {'url': 'u', 'error': None}, None)
+        assert cache.conn.execute("SELECT COUNT(*) FROM listings").fetchone()[0] == 0
+        assert not cache.is_fresh({'checked_at': (datetime.now() - timedelta(hours=1)).isoformat()})
+        assert not cache.is_fresh({'checked_at': 'not a timestamp'})
+        cache.close()
+
+
+if __name__ == '__main__':
+    for name, fn in list(globals().items()):
+        if name.startswith('test_') and callable(fn):
+            fn()
+            print(f"✓ {name}")
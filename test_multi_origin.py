@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Tests for multi-origin ranking: matrix ranking vs score_and_rank, grid index, drive-time matrix."""
+
+import contextlib
+import io
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+
+import rank_dealers
+from geo import Geocoder, GridIndex, haversine_miles
+from test_vectorized_scoring import _synthetic
+
+
+def _dealer_stats():
+    raw, enrichment = _synthetic()
+    with contextlib.redirect_stdout(io.StringIO()):
+        stats = rank_dealers.compute_pricing_fairness(rank_dealers.normalize_data(raw.copy()))
+    return stats.merge(enrichment, on='dealer_name', how='left')
+
+
+def test_each_origin_matches_single_origin_ranking():
+    stats = _dealer_stats()
+    rng = np.random.default_rng(1)
+    second = (stats['driving_time_minutes'] + rng.integers(-10, 10, len(stats))).clip(lower=1)
+    drive_times = pd.DataFrame(
+        {'A': stats['driving_time_minutes'].to_numpy(), 'B': second.to_numpy()},
+        index=stats['dealer_name']
+    )
+    ranked = rank_dealers.rank_for_origins(stats, drive_times)
+
+    cols = ['dealer_name', 'driving_time_minutes', 'reviews_score', 'proximity_score',
+            'inventory_score', 'composite_score', 'rank']
+    for origin in ['A', 'B']:
+        single = stats.assign(driving_time_minutes=drive_times[origin].to_numpy())
+        with contextlib.redirect_stdout(io.StringIO()):
+            expected = rank_dealers.score_and_rank(single)
+        got = ranked[ranked['origin'] == origin].reset_index(drop=True)
+        pd.testing.assert_frame_equal(got[cols], expected[cols], check_dtype=False, check_exact=True)
+
+
+def test_grid_index_matches_brute_force():
+    rng = np.random.default_rng(0)
+    lat = rng.uniform(40.5, 41.5, 2000)
+    lon = rng.uniform(-74.3, -73.3, 2000)
+    lat[::50] = np.nan
+    index = GridIndex(lat, lon)
+    for miles in (2, 15, 40):
+        got = index.within(41.03, -73.76, miles)
+        expected = np.flatnonzero(haversine_miles(41.03, -73.76, lat, lon) <= miles)
+        assert got.tolist() == expected.tolist()
+
+
+def test_drive_time_matrix_uses_cached_maps_time_for_origin():
+    with tempfile.TemporaryDirectory() as tmp:
+        geocoder = Geocoder(os.path.join(tmp, 'e.db'))
+        geocoder.put('1 Main St, Greenwich, CT 06830', 41.03, -73.63, 'maps')
+        info = {
+            'Near': {'address': '1 Main St, Greenwich, CT 06830', 'driving_time_minutes': 17},
+            'Nowhere': {},
+            'Far': {'address': '5 Elm, Albany, NY 12203'},
+        }
+        origins = [rank_dealers.ORIGIN, 'Stamford, CT 06902']
+        with contextlib.redirect_stdout(io.StringIO()):
+            matrix = rank_dealers.drive_time_matrix(info, origins, geocoder)
+        geocoder.close()
+    assert matrix.loc['Near', rank_dealers.ORIGIN] == 17
+    assert 0 < matrix.loc['Near', 'Stamford, CT 06902'] < 30
+    assert matrix.loc[['Nowhere', 'Far']].isna().all().all()
+
+
+if __name__ == '__main__':
+    for name, fn in list(globals().items()):
+        if name.startswith('test_') and callable(fn):
+            fn()
+            print(f"✓ {name}")
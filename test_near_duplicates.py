@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Tests for near-duplicate detection: planted syndicated copies, LSH vs exhaustive, clusters and collapse."""
+
+import contextlib
+import io
+import numpy as np
+import pandas as pd
+
+import near_duplicates
+import rank_dealers
+import synthetic_data
+
+
+def _syndicated(n=6000, rate=0.03, seed=1):
+    """Listings plus planted copies; returns (rows, {(original, copy)})."""
+    dealers = synthetic_data.make_dealers(n // 8, seed=seed)
+    listings = synthetic_data.make_listings(n, dealers=dealers, error_rate=0.01, seed=seed)
+    copies = synthetic_data.make_syndicated_copies(listings, dealers, rate, seed=seed)
+    rows = pd.concat([listings, copies], ignore_index=True)
+    return rows, set(zip(copies.index, range(len(listings), len(rows))))
+
+
+def _indistinguishable(rows, a, b):
+    """Same stock number (normalized), spec and color - a planted copy and its original can't be told apart either."""
+    stock = near_duplicates._stock(rows['stock_number'])
+    same = lambda column: rows.at[a, column] == rows.at[b, column]
+    return stock[a] == stock[b] and same('model') and same('year') and same('exterior_color')
+
+
+def test_finds_planted_copies():
+    rows, planted = _syndicated()
+    found = set(zip(*near_duplicates.find_near_duplicates(rows)[['left', 'right']].to_numpy().T))
+    assert len(planted & found) / len(planted) >= 0.99
+    assert all(_indistinguishable(rows, a, b) for a, b in found - planted)  # Stock number collisions only
+
+
+def test_lsh_matches_exhaustive_comparison():
+    rows, _ = _syndicated(1500, rate=0.05, seed=2)
+    lsh = near_duplicates.find_near_duplicates(rows)
+    exhaustive = near_duplicates.find_near_duplicates(rows, exhaustive=True)
+    lsh_pairs, all_pairs = set(zip(lsh['left'], lsh['right'])), set(zip(exhaustive['left'], exhaustive['right']))
+    assert lsh_pairs <= all_pairs and len(lsh_pairs) >= 0.98 * len(all_pairs)
+    assert (exhaustive['similarity'] >= near_duplicates.SIMILARITY_THRESHOLD).all()
+
+
+def test_guards_reject_different_cars():
+    base = {'year': '2026', 'make': 'Honda', 'model': 'Accord', 'trim': 'EX-L', 'exterior_color': 'Gray',
+            'stock_number': 'S12345', 'full_price': '31000', 'msrp': '32000'}
+    rows = pd.DataFrame([
+        base,
+        {**base, 'stock_number': '12345', 'trim': 'EX L'},  # Same car, reformatted
+        {**base, 'model': 'Civic'},  # Different model
+        {**base, 'full_price': '33000'},  # More than MAX_PRICE_GAP apart
+        {**base, 'stock_number': None},  # No identifier
+    ], index=list('abcde'))
+    pairs = near_duplicates.find_near_duplicates(rows)
+    assert list(zip(pairs['left'], pairs['right'])) == [('a', 'b')] and pairs['similarity'].iat[0] == 1.0
+    vins = rows.loc[['a', 'b']].assign(vin=['1HGCY2F73TA000001', '1HGCY2F75TA000002'])
+    assert near_duplicates.find_near_duplicates(vins).empty  # Two real VINs settle it
+    vins['vin'] = ['1HGCY2F73TA000001', 'NOT-A-VIN']
+    assert len(near_duplicates.find_near_duplicates(vins)) == 1
+    vins['vin'] = ['1HGCY2F73TA000001', '1HGCY2F70TA000002']  # Fails its check digit - proves nothing
+    assert len(near_duplicates.find_near_duplicates(vins)) == 1
+
+
+def test_clusters_are_connected_components():
+    i, j = np.array([0, 2, 5, 6]), np.array([1, 3, 6, 7])
+    assert near_duplicates._components(9, i, j).tolist() == [0, 0, 2, 2, 4, 5, 5, 5, 8]
+    rows, planted = _syndicated(3000, seed=3)
+    clusters = near_duplicates.near_duplicate_clusters(rows)
+    assert all(clusters[a] == clusters[b] >= 0 for a, b in planted)
+    first = clusters[clusters >= 0].drop_duplicates()
+    assert first.tolist() == list(range(len(first)))  # Numbered in row order
+    report = near_duplicates.cluster_report(rows, clusters)
+    assert report['size'].sum() == (clusters >= 0).sum() and (report['price_max'] >= report['price_min']).all()
+
+
+def test_collapse_before_fairness():
+    rows, planted = _syndicated(4000, seed=4)
+    with contextlib.redirect_stdout(io.StringIO()):
+        df = rank_dealers.normalize_data(rows)
+        collapsed = near_duplicates.collapse_near_duplicates(df)
+        stats = rank_dealers.compute_pricing_fairness(collapsed)
+    copies_of_kept = {copy for original, copy in planted if original in df.index}
+    assert copies_of_kept and not copies_of_kept & set(collapsed.index)  # The later listing of a cluster goes
+    assert stats['listings'].sum() == len(collapsed)
+
+
+if __name__ == '__main__':
+    for name, fn in list(globals().items()):
+        if name.startswith('test_') and callable(fn):
+            fn()
+            print(f"✓ {name}")
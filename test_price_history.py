@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""Tests for price history: change classification between runs and one row per (run_id, VIN)."""
+
+import contextlib
+import io
+import os
+import sqlite3
+import tempfile
+import pandas as pd
+
+import price_history
+
+A, B, C, D, E = (f'1HGCY2F7{i}TA00000{i}' for i in range(1, 6))
+
+
+def _run(*rows):
+    """Scraper results: (vin, full_price) for a good scrape, (vin, 'error') for a failed one."""
+    return pd.DataFrame([
+        {'url': f'https://www.truecar.com/new-cars-for-sale/listing/{vin}/', 'vin': vin, 'make': 'Honda',
+         'model': 'Accord', 'year': '2026', 'dealer_name': 'Honda of Rye',
+         'full_price': None if price == 'error' else str(price), 'error': 'Timeout' if price == 'error' else None}
+        for vin, price in rows
+    ])
+
+
+def _record(path, run_id, results):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return price_history.record_and_diff(results, run_id, db_path=path, changes_file=None)
+
+
+def test_changes_between_runs():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'history.db')
+        first = _record(path, '2026-01-01T00:00:00', _run((A, 30000), (B, 25000), (C, 20000), (D, 18000)))
+        assert first.empty  # First snapshot has nothing to diff against
+        changes = _record(path, '2026-01-02T00:00:00', _run((A, 29500), (B, 25500), (D, 'error'), (E, 27000)))
+    by_vin = changes.set_index('vin')
+    assert by_vin['change_type'].to_dict() == {A: 'price_drop', B: 'price_increase', C: 'delisted', E: 'new'}
+    assert by_vin.loc[A, ['old_price', 'new_price', 'price_delta']].tolist() == [30000, 29500, -500]
+    assert by_vin.loc[C, 'old_price'] == 20000 and pd.isna(by_vin.loc[C, 'new_price'])
+    assert (changes['run_id'] == '2026-01-02T00:00:00').all()  # D failed to scrape: attempted, so not delisted
+
+
+def test_unchanged_run_reports_nothing():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'history.db')
+        _record(path, '2026-01-01T00:00:00', _run((A, 30000), (B, 25000)))
+        assert _record(path, '2026-01-02T00:00:00', _run((B, '25000'), (A, 30000.0))).empty
+
+
+def test_one_row_per_run_and_vin():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'history.db')
+        # Same VIN twice in a run (re-scrape after an error) - the good scrape is kept
+        _record(path, '2026-01-01T00:00:00', _run((A, 'error'), (A, 30000), (B, 25000)))
+        # Re-recording a run replaces its rows instead of adding to them
+        _record(path, '2026-01-01T00:00:00', _run((A, 31000), (B, 25000), (B, 25000)))
+        conn = sqlite3.connect(path)
+        rows = conn.execute("SELECT vin, status, full_price FROM listing_history ORDER BY vin").fetchall()
+        runs = conn.execute("SELECT run_id, listings FROM runs").fetchall()
+        try:
+            conn.execute("INSERT INTO listing_history (run_id, vin, status) VALUES ('2026-01-01T00:00:00', ?, 'ok')", (A,))
+        except sqlite3.IntegrityError:
+            pass
+        else:
+            raise AssertionError('duplicate (run_id, vin) accepted')
+        conn.close()
+    assert rows == [(A, 'ok', 31000.0), (B, 'ok', 25000.0)]
+    assert runs == [('2026-01-01T00:00:00', 2)]
+
+
+def test_url_vin_wins_over_page_text():
+    results = _run((A, 30000)).assign(vin='PARTNUMBER1234567')
+    snapshot = price_history._snapshot_frame(results, 'r1')
+    assert snapshot['vin'].tolist() == [A] and snapshot['year'].dtype == 'Int64'
+
+
+if __name__ == '__main__':
+    for name, fn in list(globals().items()):
+        if name.startswith('test_') and callable(fn):
+            fn()
+            print(f"✓ {name}")
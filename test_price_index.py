@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Tests for the per-spec price index: percentiles and rel_pct vs brute force and compute_pricing_fairness."""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+
+import price_index
+import rank_dealers
+from price_index import PriceIndex, listing_by_vin, spec_key_for
+from results_store import save_results
+from test_vectorized_scoring import _synthetic
+
+
+def _listings():
+    raw, _ = _synthetic()
+    with contextlib.redirect_stdout(io.StringIO()):
+        return rank_dealers.normalize_data(raw.copy())
+
+
+def test_annotate_matches_brute_force_and_fairness_rel_pct():
+    df = _listings()
+    index = PriceIndex.from_listings(df)
+    got = index.annotate(df['spec_key'], df['price'])
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        rank_dealers.compute_pricing_fairness(df)
+    assert np.array_equal(got['rel_pct'].to_numpy(), df['rel_pct'].to_numpy())
+    assert np.array_equal(got['spec_median_price'].to_numpy(), df['spec_median_price'].to_numpy())
+
+    for i in np.random.default_rng(0).choice(len(df), 50, replace=False):
+        row = df.iloc[i]
+        peers = df.loc[df['spec_key'] == row['spec_key'], 'price']
+        expected = ((peers < row['price']).sum() + (peers <= row['price']).sum()) / 2 / len(peers) * 100
+        assert np.isclose(got['price_percentile'].iat[i], expected)
+
+
+def test_lookup_unknown_spec_and_extremes():
+    df = _listings()
+    index = PriceIndex.from_listings(df)
+    spec = df['spec_key'].iat[0]
+    assert index.lookup(spec, 1)['price_percentile'] == 0
+    assert index.lookup(spec, 10 ** 7)['price_percentile'] == 100
+    assert index.lookup('1999|Yugo|GV', 5000) is None
+    unknown = index.annotate(pd.Series(['1999|Yugo|GV', spec]), pd.Series([5000, None]))
+    assert unknown.isna().all().all()
+
+
+def test_save_load_and_vin_lookup():
+    raw, _ = _synthetic()
+    raw['vin'] = [f'VIN{i:07d}' for i in range(len(raw))]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'r.db')
+        save_results(raw, path)
+        with contextlib.redirect_stdout(io.StringIO()):
+            df = rank_dealers.normalize_data(raw.copy())
+        PriceIndex.from_listings(df).save(path)
+        index = PriceIndex.load(path)
+        row = raw.dropna(subset=['dealer_name', 'full_price']).iloc[3]
+        listing = listing_by_vin(row['vin'], path)
+    assert listing['spec_key'] == spec_key_for(row['year'], row['make'], row['model'], row['trim'])
+    assert listing['price'] == float(row['full_price'])
+    result = index.lookup(listing['spec_key'], listing['price'])
+    assert 0 <= result['price_percentile'] <= 100
+    assert index.spec_keys == sorted(df['spec_key'].unique())
+
+
+def test_vin_lookup_without_stored_price():
+    raw, _ = _synthetic()
+    raw['vin'] = [f'VIN{i:07d}' for i in range(len(raw))]
+    unpriced = raw.dropna(subset=['dealer_name', 'full_price']).index[0]
+    raw.loc[unpriced, 'full_price'] = None
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'r.db')
+        save_results(raw, path)
+        out, argv = io.StringIO(), sys.argv
+        try:
+            with contextlib.redirect_stdout(out):
+                price_index.build(path)
+                sys.argv = ['price_index.py', '--db', path, 'lookup', '--vin', raw.loc[unpriced, 'vin']]
+                price_index.main()
+                sys.argv += ['--price', '30000']
+                price_index.main()
+        finally:
+            sys.argv = argv
+    lines = out.getvalue().splitlines()
+    assert lines[-2].startswith('No price stored for VIN') and ' at $30,000: percentile ' in lines[-1]
+
+
+if __name__ == '__main__':
+    for name, fn in list(globals().items()):
+        if name.startswith('test_') and callable(fn):
+            fn()
+            print(f"✓ {name}")
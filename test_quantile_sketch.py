@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Tests for the KLL sketch and sketch-backed pricing fairness."""
+
+import contextlib
+import io
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+
+import rank_dealers
+from quantile_sketch import GroupedSketches, KLLSketch, SpecSketchStore, sketch_pricing_fairness
+from test_vectorized_scoring import _synthetic
+
+
+def _partitions(n_parts=4):
+    raw, _ = _synthetic()
+    with contextlib.redirect_stdout(io.StringIO()):
+        df = rank_dealers.normalize_data(raw.copy())
+    parts = np.array_split(np.arange(len(df)), n_parts)
+    return df, lambda: ((f'run{i}', lambda idx=idx: df.iloc[idx]) for i, idx in enumerate(parts))
+
+
+def test_small_inputs_are_exact():
+    sketch = KLLSketch()
+    values = np.random.default_rng(0).normal(30000, 2000, 150)
+    sketch.update(values)
+    assert sketch.is_exact and sketch.rank_error() == 0
+    assert sketch.median() == np.median(values)
+
+
+def test_rank_error_within_bound():
+    values = np.random.default_rng(1).lognormal(10, 0.3, 300000)
+    sketch = KLLSketch(k=200, seed=0)
+    for chunk in np.array_split(values, 30):
+        sketch.update(chunk)
+    ordered = np.sort(values)
+    for q in (0.05, 0.25, 0.5, 0.75, 0.95):
+        true_rank = np.searchsorted(ordered, sketch.quantile(q)) / len(values)
+        assert abs(true_rank - q) <= sketch.rank_error()
+    low, high = sketch.median_bounds()
+    assert low <= np.median(values) <= high
+    assert sum(len(level) for level in sketch.levels) < 1000
+
+
+def test_merge_and_serialization():
+    rng = np.random.default_rng(2)
+    parts = [rng.normal(25000, 1500, 50000) for _ in range(4)]
+    merged = KLLSketch(seed=1)
+    for part in parts:
+        partial = KLLSketch(seed=2)
+        partial.update(part)
+        merged.merge(KLLSketch.from_bytes(partial.to_bytes()))
+    values = np.concatenate(parts)
+    assert merged.n == len(values)
+    true_rank = np.searchsorted(np.sort(values), merged.median()) / len(values)
+    assert abs(true_rank - 0.5) <= merged.rank_error()
+
+
+def test_exact_sketches_match_compute_pricing_fairness():
+    df, partitions = _partitions()
+    got, report = sketch_pricing_fairness(partitions, k=10000)
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected = rank_dealers.compute_pricing_fairness(df.copy())
+    assert report['specs']['exact'].all()
+    pd.testing.assert_frame_equal(got, expected, check_dtype=False, check_exact=True)
+
+
+def test_small_k_reports_bounds_that_hold():
+    df, partitions = _partitions()
+    got, report = sketch_pricing_fairness(partitions, k=16)
+    specs = report['specs'].set_index('key')
+    assert not specs['exact'].all()
+    true = df.groupby('spec_key')['price'].median().reindex(specs.index)
+    inside = (specs['median_low'] <= true) & (true <= specs['median_high'])
+    assert inside.mean() >= 0.95
+    assert len(got) == df['dealer_name'].nunique()
+
+
+def test_cached_run_sketches_skip_loading():
+    df, partitions = _partitions()
+    loaded = []
+
+    def counting():
+        for run_id, load in partitions():
+            yield run_id, lambda run_id=run_id, load=load: loaded.append(run_id) or load()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SpecSketchStore(os.path.join(tmp, 'history.db'))
+        first, _ = sketch_pricing_fairness(counting, k=10000, store=store)
+        assert loaded == ['run0', 'run1', 'run2', 'run3'] * 2  # Sketch pass + dealer pass
+        loaded.clear()
+        second, _ = sketch_pricing_fairness(counting, k=10000, store=store)
+        store.close()
+    assert loaded == ['run0', 'run1', 'run2', 'run3']  # Dealer pass only: every run's spec sketch was cached
+    pd.testing.assert_frame_equal(first, second)
+
+
+def test_grouped_update_splits_by_key():
+    grouped = GroupedSketches()
+    grouped.update(pd.Series(['a', 'b', 'a', 'c', 'b']), pd.Series([1.0, 10.0, 3.0, 7.0, 20.0]))
+    assert grouped.medians().to_dict() == {'a': 2.0, 'b': 15.0, 'c': 7.0}
+
+
+if __name__ == '__main__':
+    for name, fn in list(globals().items()):
+        if name.startswith('test_') and callable(fn):
+            fn()
+            print(f"✓ {name}")
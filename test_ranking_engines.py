@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Tests for the columnar engine backends: every installed engine vs compute_pricing_fairness."""
+
+import contextlib
+import io
+import os
+import numpy as np
+import pandas as pd
+
+import rank_dealers
+import ranking_engines
+from test_vectorized_scoring import _synthetic
+
+
+def _listings(raw=None):
+    raw = _synthetic()[0] if raw is None else raw
+    with contextlib.redirect_stdout(io.StringIO()):
+        return rank_dealers.normalize_data(raw.copy())
+
+
+# Engines that must be tested, e.g. REQUIRE_ENGINES=polars,duckdb in CI - fail instead of skipping them
+REQUIRED_ENGINES = [name for name in os.environ.get('REQUIRE_ENGINES', '').split(',') if name]
+
+
+def _full(df):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return rank_dealers.compute_pricing_fairness(df)
+
+
+def test_every_engine_matches_compute_pricing_fairness():
+    for name in ranking_engines.available_engines():
+        expected_df = _listings()
+        expected = _full(expected_df)
+        df = _listings()
+        got = ranking_engines.pricing_fairness(df, ranking_engines.get_engine(name))
+        pd.testing.assert_frame_equal(got, expected, check_exact=True)
+        assert np.array_equal(df['rel_pct'].to_numpy(), expected_df['rel_pct'].to_numpy(), equal_nan=True), name
+
+
+def test_zero_priced_spec_matches():
+    # A spec whose median is 0 gives NaN/inf rel_pct; engines must skip NaN in medians like pandas
+    raw = _synthetic()[0]
+    raw.loc[raw['model'] == 'Altima', 'full_price'] = '0'
+    for name in ranking_engines.available_engines():
+        expected = _full(_listings(raw))
+        got = ranking_engines.pricing_fairness(_listings(raw), ranking_engines.get_engine(name))
+        pd.testing.assert_frame_equal(got, expected, check_exact=True)
+
+
+def test_join_enrichment_matches_pandas_join():
+    stats = _full(_listings())
+    info = pd.DataFrame({
+        'address': [f'{i} Main St' for i in range(0, len(stats), 2)],
+        'google_rating': np.linspace(3, 5, len(range(0, len(stats), 2))),
+    }, index=stats['dealer_name'].iloc[::2].to_numpy()[::-1])
+    expected = stats.join(info, on='dealer_name')
+    for name in ranking_engines.available_engines():
+        got = ranking_engines.join_enrichment(stats, info, ranking_engines.get_engine(name))
+        pd.testing.assert_frame_equal(got, expected, check_exact=True)
+
+
+def test_middle_pair_median_matches_pandas():
+    # The explicit median written out for Polars/DuckDB: mean of the two middle sorted values
+    rng = np.random.default_rng(3)
+    for n in (1, 2, 5, 8, 101):
+        values = rng.normal(0, 0.05, n)
+        ordered = np.sort(values)
+        assert (ordered[(n - 1) // 2] + ordered[n // 2]) / 2 == pd.Series(values).groupby(np.zeros(n)).median().iat[0]
+
+
+def test_required_engines_are_installed():
+    missing = [name for name in REQUIRED_ENGINES if name not in ranking_engines.available_engines()]
+    assert not missing, f"required engines not installed: {', '.join(missing)}"
+
+
+def test_missing_engine_falls_back_to_pandas():
+    missing = [name for name in ('polars', 'duckdb') if name not in ranking_engines.available_engines()]
+    for name in missing:
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert ranking_engines.get_engine(name).name == 'pandas'
+    try:
+        ranking_engines.get_engine('spark')
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('unknown engine accepted')
+
+
+if __name__ == '__main__':
+    print(f"Engines: {', '.join(ranking_engines.available_engines())}")
+    skipped = [name for name in ranking_engines.ENGINES if name not in ranking_engines.available_engines()]
+    if skipped:
+        print(f"⚠ Not installed, not tested: {', '.join(skipped)} (set REQUIRE_ENGINES to fail instead)")
+    for name, fn in list(globals().items()):
+        if name.startswith('test_') and callable(fn):
+            fn()
+            print(f"✓ {name}")
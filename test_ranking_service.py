@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Tests for the ranking query service: default query vs score_and_rank, weights, cutoff and filters."""
+
+import contextlib
+import io
+import os
+import tempfile
+import pandas as pd
+
+import rank_dealers
+from enrichment_cache import EnrichmentCache
+from geo import Geocoder
+from ranking_service import RankingService
+from test_vectorized_scoring import _synthetic
+
+COLS = ['dealer_name', 'listings', 'median_rel_pct', 'fairness_score', 'reviews_score',
+        'proximity_score', 'inventory_score', 'composite_score', 'rank']
+
+
+def _service(tmp):
+    """Feature tables saved the way rank_dealers.main does (over-cutoff dealers excluded in the cache)."""
+    raw, enrichment = _synthetic()
+    path = os.path.join(tmp, 'e.db')
+    cache, geocoder = EnrichmentCache(path), Geocoder(path)
+    for row in enrichment.itertuples():
+        if pd.notna(row.google_rating):
+            cache.put(row.dealer_name, 'rating', float(row.google_rating))
+        if pd.notna(row.driving_time_minutes):
+            cache.put(row.dealer_name, 'driving_time_minutes', int(row.driving_time_minutes))
+            if row.driving_time_minutes > rank_dealers.DRIVING_TIME_CUTOFF:
+                cache.exclude(row.dealer_name, 'over cutoff')
+    with contextlib.redirect_stdout(io.StringIO()):
+        df = rank_dealers.normalize_data(raw.copy())
+        stats = rank_dealers.compute_pricing_fairness(df)
+        rank_dealers.save_features(df, cache, geocoder, path)
+    kept = enrichment[~(enrichment['driving_time_minutes'] > rank_dealers.DRIVING_TIME_CUTOFF)]
+    stats = stats[stats['dealer_name'].isin(kept['dealer_name'])].merge(enrichment, on='dealer_name', how='left')
+    cache.close()
+    geocoder.close()
+    return RankingService(path), df, stats
+
+
+def test_default_query_matches_score_and_rank():
+    with tempfile.TemporaryDirectory() as tmp:
+        service, _, stats = _service(tmp)
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected = rank_dealers.score_and_rank(stats)
+    got = service.query(top=len(expected) + 10)
+    pd.testing.assert_frame_equal(got[COLS], expected[COLS], check_dtype=False, check_exact=True)
+
+
+def test_weights_and_min_rating():
+    with tempfile.TemporaryDirectory() as tmp:
+        service, _, _ = _service(tmp)
+    by_reviews = service.query(weights=(1, 0, 0, 0), top=20)
+    assert by_reviews['reviews_score'].is_monotonic_decreasing
+    rated = service.query(min_rating=4.5, top=1000)
+    assert len(rated) and (rated['google_rating'] >= 4.5).all()
+
+
+def test_wider_cutoff_readmits_cached_exclusions():
+    with tempfile.TemporaryDirectory() as tmp:
+        service, _, _ = _service(tmp)
+    default = service.query(top=10000)
+    wide = service.query(cutoff=45, top=10000)
+    assert default['driving_time_minutes'].max() <= rank_dealers.DRIVING_TIME_CUTOFF
+    assert wide['driving_time_minutes'].max() > rank_dealers.DRIVING_TIME_CUTOFF
+    assert (wide['driving_time_minutes'] <= 45).all()
+
+
+def test_make_filter_scores_only_matching_listings():
+    with tempfile.TemporaryDirectory() as tmp:
+        service, df, _ = _service(tmp)
+    make = df['make'].iloc[0]
+    got = service.query(make=make.upper(), top=10000)
+    counts = df[df['make'] == make].groupby('dealer_name').size()
+    assert (got.set_index('dealer_name')['listings'] == counts.reindex(got['dealer_name'])).all()
+
+
+if __name__ == '__main__':
+    for name, fn in list(globals().items()):
+        if name.startswith('test_') and callable(fn):
+            fn()
+            print(f"✓ {name}")
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Tests for incremental ranking: state updates vs a full compute_pricing_fairness recompute."""
+
+import contextlib
+import io
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+
+import rank_dealers
+from ranking_state import RankingState, listing_keys
+from results_store import save_results
+from test_vectorized_scoring import _synthetic
+
+
+def _listings(raw):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return rank_dealers.normalize_data(raw.copy())
+
+
+def _full(df):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return rank_dealers.compute_pricing_fairness(df.copy())
+
+
+def _raw():
+    raw, _ = _synthetic()
+    raw['vin'] = [f'VIN{i:07d}' for i in range(len(raw))]
+    return raw
+
+
+def _daily_delta(raw, seed=5):
+    """20 new listings, 5 repriced, 5 sold, 1 moved to another dealer."""
+    rng = np.random.default_rng(seed)
+    complete = raw.dropna(subset=['dealer_name', 'full_price'])  # Rows normalize_data keeps
+    new = complete.sample(20, random_state=seed).copy()
+    new['vin'] = [f'NEW{i:07d}' for i in range(len(new))]
+    sold = complete.sample(5, random_state=seed + 1).index
+    repriced = complete.drop(sold).sample(5, random_state=seed + 2).index
+    moved = complete.index.difference(sold.union(repriced))[0]
+    raw = raw.drop(sold)
+    raw.loc[repriced, 'full_price'] = (raw.loc[repriced, 'full_price'].astype(float) + rng.integers(1, 900, 5)).astype(str)
+    raw.loc[moved, 'dealer_name'] = 'Dealer 1'
+    return pd.concat([raw, new], ignore_index=True)
+
+
+def test_first_run_matches_full_recompute():
+    df = _listings(_raw())
+    with tempfile.TemporaryDirectory() as tmp:
+        state = RankingState(os.path.join(tmp, 'r.db'))
+        changed, _, dealers = state.update(df)
+        got = state.dealer_stats()
+        state.close()
+    assert changed == len(df) and len(dealers) == df['dealer_name'].nunique()
+    pd.testing.assert_frame_equal(got, _full(df), check_dtype=False, check_exact=True)
+
+
+def test_delta_matches_full_recompute_and_touches_only_affected():
+    raw = _raw()
+    before, after = _listings(raw), _listings(_daily_delta(raw))
+    with tempfile.TemporaryDirectory() as tmp:
+        state = RankingState(os.path.join(tmp, 'r.db'))
+        state.update(before)
+        changed, specs, dealers = state.update(after)
+        got = state.dealer_stats()
+        medians = state.spec_medians()
+        state.close()
+    assert changed == 20 + 5 + 5 + 1
+    assert len(specs) < after['spec_key'].nunique()
+    assert dealers == set(after.loc[after['spec_key'].isin(specs), 'dealer_name']) | {'Dealer 1'} | (
+        set(before['dealer_name']) - set(after['dealer_name']))
+    pd.testing.assert_frame_equal(got, _full(after), check_dtype=False, check_exact=True)
+    expected_medians = after.groupby('spec_key')['price'].median()
+    assert medians.sort_index().equals(expected_medians.astype('float64'))
+
+
+def test_unchanged_run_does_no_work():
+    df = _listings(_raw())
+    with tempfile.TemporaryDirectory() as tmp:
+        state = RankingState(os.path.join(tmp, 'r.db'))
+        state.update(df)
+        assert state.update(df.sample(frac=1, random_state=0)) == (0, set(), set())
+        state.close()
+
+
+def test_listing_keys_are_unique_without_vins():
+    df = _listings(_synthetic()[0])
+    keys = listing_keys(df)
+    assert keys.is_unique
+    assert keys.str.startswith('row:').all()
+
+
+def test_state_stays_out_of_an_excel_inputs_db():
+    with tempfile.TemporaryDirectory() as tmp:
+        excel, store = os.path.join(tmp, 'scraped_car_data.xlsx'), os.path.join(tmp, 'scraped_car_data.db')
+        assert rank_dealers.ranking_state_path(excel) == rank_dealers.RANKING_STATE_DB
+        save_results(_raw().head(3), store)
+        assert rank_dealers.ranking_state_path(store) == store
+
+
+if __name__ == '__main__':
+    for name, fn in list(globals().items()):
+        if name.startswith('test_') and callable(fn):
+            fn()
+            print(f"✓ {name}")
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""Tests for the SQLite results store: save/load round trip, column types, NULLs and replace-on-save."""
+
+import os
+import sqlite3
+import tempfile
+import numpy as np
+import pandas as pd
+
+from results_store import (LEGACY_EXCEL_FILE, RESULTS_DB, RESULTS_TABLE, is_results_store, load_results,
+                           resolve_results_path, save_results)
+
+
+def _scraped():
+    """Scraper-shaped rows: numbers as strings, gaps, an error row and a column outside SCHEMA."""
+    return pd.DataFrame({
+        'url': ['u1', 'u2', 'u3'],
+        'year': ['2025', '2026', None],
+        'make': ['Honda', 'Toyota', None],
+        'model': ['Accord', 'Camry', None],
+        'trim': ['EX-L', None, None],
+        'full_price': ['31,000', '28500', None],
+        'msrp': [32000, np.nan, None],
+        'vin': ['1HGCY2F73TA000001', None, None],
+        'error': [None, None, 'Timeout'],
+        'cache_status': ['fresh', 'unchanged', None],
+    })
+
+
+def test_round_trip_types_and_nulls():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'results.db')
+        assert save_results(_scraped(), path) == 3
+        df = load_results(path)
+    assert df['year'].dtype == 'Int64' and df['year'].tolist()[:2] == [2025, 2026] and df['year'].isna().iat[2]
+    assert df['msrp'].dtype == 'float64' and df['msrp'].isna().tolist() == [False, True, True]
+    assert df['full_price'].isna().tolist() == [True, False, True]  # '31,000' isn't numeric; the store doesn't guess
+    assert df['spec_key'].tolist()[:2] == ['2025|Honda|Accord|EX-L', '2026|Toyota|Camry']
+    # NULLs come back as missing, never as the text 'None' / 'nan'
+    assert df['trim'].isna().tolist() == [False, True, True] and df['vin'].isna().tolist() == [False, True, True]
+    assert df['spec_key'].isna().tolist() == [False, False, True]
+    assert not df.astype(str).isin(['None', 'nan']).to_numpy()[df.notna().to_numpy()].any()
+    assert df['error'].tolist()[2] == 'Timeout' and df['cache_status'].tolist()[:2] == ['fresh', 'unchanged']
+
+
+def test_declared_column_types_and_indexes():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'results.db')
+        save_results(_scraped(), path)
+        conn = sqlite3.connect(path)
+        types = {name: sql_type for _, name, sql_type, *_ in conn.execute(f'PRAGMA table_info({RESULTS_TABLE})')}
+        indexes = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        conn.close()
+    assert (types['year'], types['full_price'], types['vin'], types['cache_status']) == ('INTEGER', 'REAL', 'TEXT', 'TEXT')
+    assert {f'idx_{RESULTS_TABLE}_vin', f'idx_{RESULTS_TABLE}_spec_key'} <= indexes
+
+
+def test_save_replaces_previous_run():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'results.db')
+        save_results(_scraped(), path)
+        second = _scraped().iloc[:1].drop(columns=['cache_status']).assign(url='u9')
+        assert save_results(second, path) == 1
+        df = load_results(path)
+        subset = load_results(path, columns=['url', 'year'])
+    assert df['url'].tolist() == ['u9']  # Not appended to the first run
+    assert 'cache_status' not in df.columns  # The table is recreated with the new run's columns
+    assert list(subset.columns) == ['url', 'year'] and subset['year'].dtype == 'Int64'
+
+
+def test_falls_back_to_legacy_exports():
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'old_run.csv')
+        _scraped().to_csv(csv_path, index=False)
+        assert resolve_results_path(csv_path) == csv_path
+        assert resolve_results_path(os.path.join(tmp, 'missing.db')) is None
+        assert len(load_results(csv_path, columns=['url', 'make'])) == 3
+        try:
+            load_results(os.path.join(tmp, 'missing.db'))
+        except FileNotFoundError:
+            pass
+        else:
+            raise AssertionError('missing store loaded')
+
+
+def test_db_without_listings_is_not_a_results_store():
+    # Features/ranking state saved next to an Excel input must not shadow that input on the next run
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            _scraped().to_excel(LEGACY_EXCEL_FILE, index=False, engine='openpyxl')
+            conn = sqlite3.connect(RESULTS_DB)
+            conn.execute('CREATE TABLE feature_dealers (dealer_name TEXT)')
+            conn.close()
+            assert not is_results_store(RESULTS_DB) and resolve_results_path(RESULTS_DB) is None
+            assert resolve_results_path() == LEGACY_EXCEL_FILE and len(load_results()) == 3
+            save_results(_scraped(), RESULTS_DB)
+            assert is_results_store(RESULTS_DB) and resolve_results_path() == RESULTS_DB
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == '__main__':
+    for name, fn in list(globals().items()):
+        if name.startswith('test_') and callable(fn):
+            fn()
+            print(f"✓ {name}")
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Tests for the offline road router (synthetic grid graph, no network)."""
+
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+
+from road_router import RoadGraph, RoadRouter
+
+
+def _grid_graph(n=12, seed=3):
+    """n x n street grid around White Plains with random speeds (a few one-way streets)."""
+    rng = np.random.default_rng(seed)
+    ids = np.arange(n * n)
+    lat = 41.0 + (ids // n) * 0.01
+    lon = -73.8 + (ids % n) * 0.01
+    u, v = [], []
+    for i in ids:
+        if i % n < n - 1:
+            u.append(i); v.append(i + 1)
+        if i // n < n - 1:
+            u.append(i); v.append(i + n)
+    u, v = np.array(u), np.array(v)
+    edges = pd.DataFrame({
+        'u': u, 'v': v,
+        'length_miles': np.full(len(u), 0.6),
+        'speed_mph': rng.choice([25, 35, 45, 55], len(u)),
+        'oneway': rng.random(len(u)) < 0.1,
+    })
+    nodes = pd.DataFrame({'node_id': ids, 'lat': lat, 'lon': lon})
+    return nodes, edges
+
+
+def _write_graph(tmp):
+    nodes, edges = _grid_graph()
+    nodes_path, edges_path = os.path.join(tmp, 'nodes.csv'), os.path.join(tmp, 'edges.csv')
+    nodes.to_csv(nodes_path, index=False)
+    edges.to_csv(edges_path, index=False)
+    return nodes_path, edges_path
+
+
+def _bellman_ford(graph, source):
+    """Brute-force reference over the CSR arrays."""
+    n = len(graph.node_ids)
+    best = np.full(n, np.inf)
+    best[source] = 0
+    src = np.repeat(np.arange(n), np.diff(graph.indptr))
+    for _ in range(n):
+        cand = best[src] + graph.minutes
+        updated = best.copy()
+        np.minimum.at(updated, graph.indices, cand)
+        if np.array_equal(updated, best):
+            break
+        best = updated
+    return best
+
+
+def test_dijkstra_and_astar_match_reference():
+    with tempfile.TemporaryDirectory() as tmp:
+        graph = RoadGraph.from_csv(*_write_graph(tmp))
+    ref = _bellman_ford(graph, 0)
+    times, _ = graph.shortest_times(0)
+    assert np.allclose(times, ref, rtol=1e-5)
+    for target in (5, 77, len(ref) - 1):
+        minutes, _ = graph.route_time(0, target)
+        assert np.isclose(minutes, ref[target], rtol=1e-5)
+
+
+def test_early_stop_gives_same_target_times():
+    with tempfile.TemporaryDirectory() as tmp:
+        graph = RoadGraph.from_csv(*_write_graph(tmp))
+    full, _ = graph.shortest_times(10)
+    partial, _ = graph.shortest_times(10, targets=[11, 30])
+    assert np.allclose(partial[[11, 30]], full[[11, 30]])
+
+
+def test_router_caches_per_graph_version():
+    with tempfile.TemporaryDirectory() as tmp:
+        graph = RoadGraph.from_csv(*_write_graph(tmp))
+        router = RoadRouter(graph, os.path.join(tmp, 'cache.db'))
+        dests = {'A': (41.05, -73.75), 'B': (41.10, -73.70)}
+        first = router.drive_times((41.0, -73.8), dests)
+        rows = router.conn.execute("SELECT COUNT(*) FROM route_times").fetchone()[0]
+        assert rows == 2
+        assert router.drive_times((41.0, -73.8), dests) == first
+
+        # A destination sitting on a node gets the plain graph time
+        times, _ = graph.shortest_times(0)
+        node = 5 * 12 + 5
+        assert first['A'][1] == int(round(times[node]))
+
+        graph.version = 'other'
+        router.drive_times((41.0, -73.8), dests)
+        assert router.conn.execute("SELECT COUNT(*) FROM route_times").fetchone()[0] == 4
+        router.close()
+
+
+def test_points_off_the_graph_are_not_routed():
+    with tempfile.TemporaryDirectory() as tmp:
+        graph = RoadGraph.from_csv(*_write_graph(tmp))
+        router = RoadRouter(graph, os.path.join(tmp, 'cache.db'))
+        # Grid spans 41.00-41.11 N; 41.30 N snaps to the top edge ~13 miles away
+        routes = router.drive_times((41.0, -73.8), {'In': (41.05, -73.75), 'Outside': (41.30, -73.75)})
+        assert routes['In'][1] is not None and routes['Outside'] == (None, None)
+        # An origin outside the extract can't route anyone
+        assert router.drive_times((40.70, -73.8), {'In': (41.05, -73.75)}) == {'In': (None, None)}
+        router.close()
+
+
+if __name__ == '__main__':
+    for name, fn in list(globals().items()):
+        if name.startswith('test_') and callable(fn):
+            fn()
+            print(f"✓ {name}")
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Tests for dealer addresses harvested by the scraper: VDP extraction and seeding the enrichment cache."""
+
+import contextlib
+import io
+import os
+import tempfile
+import pandas as pd
+
+import rank_dealers
+from enrichment_cache import EnrichmentCache
+from full_scraper import extract_dealer_location
+
+
+def test_location_from_embedded_json():
+    content = ('<script>{"dealer":{"dealerId":"D-4411","name":"Honda of New Rochelle",'
+               '"address1":"25 Laurel Ave","city":"New Rochelle","state":"ny","zip":"10801"}}</script>'
+               '<script>{"city":"Elsewhere"}</script>')
+    location = extract_dealer_location(content, 'Visit us at 1 Other St, Rye, NY 10580')
+    assert location == {'dealer_address': '25 Laurel Ave, New Rochelle, NY 10801', 'dealer_city': 'New Rochelle',
+                        'dealer_state': 'NY', 'dealer_zip': '10801', 'dealer_id': 'D-4411'}
+
+
+def test_location_from_page_text():
+    location = extract_dealer_location('<html></html>', 'Curry Honda\n3026 Crompond Rd, Yorktown Heights, NY 10598\n')
+    assert location['dealer_address'] == '3026 Crompond Rd, Yorktown Heights, NY 10598'
+    assert (location['dealer_city'], location['dealer_state'], location['dealer_zip']) == ('Yorktown Heights', 'NY', '10598')
+    assert location['dealer_id'] is None
+    no_zip = extract_dealer_location(None, '88 Main St, Mount Kisco, NY')
+    assert no_zip['dealer_address'] == '88 Main St, Mount Kisco, NY' and no_zip['dealer_zip'] is None
+    assert extract_dealer_location('', 'No address here') == dict.fromkeys(
+        ['dealer_address', 'dealer_city', 'dealer_state', 'dealer_zip', 'dealer_id'])
+
+
+def _seed(cache, rows):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return rank_dealers.seed_scraped_addresses(pd.DataFrame(rows, columns=['dealer_name', 'dealer_address']), cache)
+
+
+def test_seeding_uses_most_common_address_and_invalidates_distance():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = EnrichmentCache(os.path.join(tmp, 'e.db'))
+        cache.put_many([('A Honda', 'address', '1 Old Rd, Rye, NY 10580'), ('A Honda', 'distance_miles', 9.0),
+                        ('A Honda', 'driving_time_minutes', 20), ('B Toyota', 'address', '5 Elm St, Harrison, NY'),
+                        ('B Toyota', 'driving_time_minutes', 12)])
+        changed = _seed(cache, [('A Honda', '2 New Rd, Rye, NY 10580'), ('A Honda', '2 New Rd, Rye, NY 10580'),
+                                ('A Honda', 'Typo Rd'), ('B Toyota', '5 Elm St, Harrison, NY'),
+                                ('C Mazda', ' '), ('C Mazda', None)])
+        a, b = cache.get('A Honda'), cache.get('B Toyota')
+        assert changed == 1
+        assert a == {'address': '2 New Rd, Rye, NY 10580'}  # Distance was for the old address
+        assert b['driving_time_minutes'] == 12  # Unchanged address keeps its distance
+        assert cache.get('C Mazda') == {}  # Blank addresses aren't seeded
+        cache.close()
+
+
+def test_address_change_lifts_distance_exclusions_only():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = EnrichmentCache(os.path.join(tmp, 'e.db'))
+        reasons = {'Far Honda': 'straight-line 48.0 mi', 'Slow Kia': 'over 30 min cutoff (41 min)',
+                   'Outlet Ford': 'exclude address', 'Legacy Nissan': 'migrated from dealer_info_cache.json',
+                   'Same Mazda': 'over 30 min cutoff (35 min)'}
+        for dealer_name, reason in reasons.items():
+            cache.put(dealer_name, 'address', '1 Old Rd, Rye, NY 10580')
+            cache.exclude(dealer_name, reason)
+        _seed(cache, [(d, '1 Old Rd, Rye, NY 10580' if d == 'Same Mazda' else '9 New Rd, Rye, NY 10580')
+                      for d in reasons])
+        excluded = {d for d in reasons if cache.is_excluded(d)}
+        assert excluded == {'Legacy Nissan', 'Same Mazda'}
+        assert cache.exclusion_reason('Same Mazda') == 'over 30 min cutoff (35 min)'
+        # Lifted dealers are enriched again for the new address
+        assert rank_dealers.needs_enrichment('Far Honda', cache) and not rank_dealers.needs_enrichment('Same Mazda', cache)
+        cache.close()
+
+
+if __name__ == '__main__':
+    for name, fn in list(globals().items()):
+        if name.startswith('test_') and callable(fn):
+            fn()
+            print(f"✓ {name}")
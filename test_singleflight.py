@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""Tests for request coalescing (SingleFlight)."""
+
+import asyncio
+
+from enrichment_pool import SingleFlight
+
+
+def test_concurrent_and_repeated_calls_share_one_lookup():
+    calls = []
+
+    async def lookup(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return (12.0, 20)
+
+    async def run():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.do('1 main st rye ny 10580', lambda: lookup('a')) for _ in range(5)))
+        again = await flight.do('1 main st rye ny 10580', lambda: lookup('a'))
+        other = await flight.do('2 elm st rye ny 10580', lambda: lookup('b'))
+        return flight, results, again, other
+
+    flight, results, again, other = asyncio.run(run())
+    assert calls == ['a', 'b']
+    assert results == [(12.0, 20)] * 5 and again == (12.0, 20) and other == (12.0, 20)
+    assert flight.calls == 2 and flight.coalesced == 5
+
+
+def test_failures_are_shared_but_not_cached():
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        await asyncio.sleep(0.01)
+        if len(attempts) == 1:
+            raise RuntimeError('page crashed')
+        return 'ok'
+
+    async def run():
+        flight = SingleFlight({'known': 'cached'})
+        first = await asyncio.gather(flight.do('k', flaky), flight.do('k', flaky), return_exceptions=True)
+        second = await flight.do('k', flaky)
+        return first, second, await flight.do('known', flaky)
+
+    first, second, known = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in first)
+    assert second == 'ok' and known == 'cached'
+    assert len(attempts) == 2
+
+
+if __name__ == '__main__':
+    for name, fn in list(globals().items()):
+        if name.startswith('test_') and callable(fn):
+            fn()
+            print(f"✓ {name}")
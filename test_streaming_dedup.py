@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Tests for streaming dedup: agreement with the batch dedup, disk spill, Bloom filter, per-source report."""
+
+import contextlib
+import io
+import os
+import tempfile
+import numpy as np
+
+import synthetic_data
+from full_scraper import deduplicate_results
+from streaming_dedup import BloomFilter, DiskKeyIndex, StreamingDeduplicator, dedupe_frame, listing_key
+
+
+def _rows(n=20000, seed=7):
+    return synthetic_data.make_listings(n, duplicate_rate=0.08, error_rate=0.01,
+                                        missing={'trim': 0.02}, seed=seed)
+
+
+def _quiet(fn, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args, **kwargs)
+
+
+def test_keeps_the_first_scrape_of_each_vin():
+    rows = _rows()
+    streamed = _quiet(dedupe_frame, rows)
+    valid = rows[rows['error'].isna()]
+    expected = rows[rows['error'].notna()].index.union(valid.drop_duplicates('vin').index)
+    assert streamed.index.equals(expected)  # Arrival order kept, errors kept
+    # The batch dedup also collapses distinct VINs sharing make/model/.../stock_number/dealer;
+    # streaming only falls back to those fields when there's no VIN
+    batch = _quiet(deduplicate_results, rows)
+    assert set(batch['url']) <= set(streamed['url'])
+
+
+def test_disk_index_matches_memory():
+    rows = _rows()
+    in_memory = _quiet(dedupe_frame, rows)
+    dedup = StreamingDeduplicator(memory_limit=1000)
+    keep = _quiet(lambda: [dedup.add(r) for r in rows.to_dict('records')])
+    assert dedup.on_disk and len(dedup.keys) == len(in_memory) - rows['error'].notna().sum()
+    dedup.close()
+    assert rows.index[keep].equals(in_memory.index)
+
+
+def test_missing_vin_falls_back_to_listing_fields():
+    a = {'make': 'Toyota', 'model': 'Camry', 'year': '2025', 'trim': 'LE', 'stock_number': 'S1', 'dealer_name': 'X'}
+    assert listing_key(a) == listing_key({**a, 'year': 2025.0, 'make': 'toyota '})
+    assert listing_key(a) != listing_key({**a, 'stock_number': 'S2'})
+    vin = '1HGCY2F73TA000001'
+    assert listing_key({**a, 'vin': vin}) == listing_key({'vin': vin.lower()})  # VIN wins over the fields
+    assert listing_key({**a, 'vin': '1HGCY2F70TA000001'}) == listing_key(a)  # Unless it fails its check digit
+    assert listing_key({**a, 'error': 'timeout'}) is None
+
+
+def test_bloom_filter_has_no_false_negatives():
+    rng = np.random.default_rng(8)
+    keys = [int(k) for k in rng.integers(-2**63, 2**63 - 1, 60000, dtype=np.int64)]
+    bloom = BloomFilter(capacity=30000, false_positive_rate=0.01)
+    for key in keys[:30000]:
+        bloom.add(key)
+    assert all(key in bloom for key in keys[:30000])
+    false_positive_rate = np.mean([key in bloom for key in keys[30000:]])
+    assert false_positive_rate < 0.02
+
+
+def test_disk_index_reopens_and_removes_its_temp_file():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'keys.db')
+        index = DiskKeyIndex(capacity=100, path=path)
+        index.add_many([1, 2, 3])
+        index.add(-4)
+        index.close()
+        reopened = DiskKeyIndex(capacity=100, path=path)
+        assert len(reopened) == 4 and -4 in reopened and 5 not in reopened
+        reopened.close()
+        assert os.path.exists(path)  # Caller-owned file is kept
+    temp = DiskKeyIndex(capacity=100)
+    temp.close()
+    assert not os.path.exists(temp.path)
+
+
+def test_known_vin_skips_and_report_counts_per_source():
+    rows = _rows(5000, seed=9)
+    dedup = StreamingDeduplicator()
+    for result in rows.to_dict('records'):
+        dedup.add(result)
+    vin = rows['vin'].dropna().iat[0]
+    assert dedup.drop_known_vin(vin, 'rescan.csv') and not dedup.drop_known_vin('NOTSEENVIN', 'rescan.csv')
+    assert not dedup.drop_known_vin(None)
+    report = dedup.report()
+    dedup.close()
+
+    total = report.loc['total']
+    valid = rows[rows['error'].isna()]
+    assert total['kept'] == valid['vin'].nunique()
+    assert total['duplicates'] == len(valid) - valid['vin'].nunique() + 1
+    assert total['errors'] == rows['error'].notna().sum()
+    assert report.loc['rescan.csv', 'duplicates'] == 1
+    by_source = valid.groupby('source_file')['vin'].apply(lambda v: (~v.duplicated()).sum())
+    assert (report.loc[by_source.index, 'kept'] <= by_source).all()  # A VIN is kept under its first source only
+
+
+if __name__ == '__main__':
+    for name, fn in list(globals().items()):
+        if name.startswith('test_') and callable(fn):
+            fn()
+            print(f"✓ {name}")
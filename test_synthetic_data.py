@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Tests for the synthetic listing/dealer generator used by the benchmarks."""
+
+import contextlib
+import io
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+
+import rank_dealers
+import synthetic_data
+from enrichment_cache import EnrichmentCache
+from listing_cache import vin_from_url
+from results_store import SCHEMA
+
+
+def test_shape_matches_the_scraper():
+    rows = synthetic_data.make_listings(2000, seed=1)
+    assert list(rows.columns) == synthetic_data.LISTING_COLUMNS
+    assert set(rows.columns) <= set(SCHEMA)
+    assert rows['year'].map(type).eq(str).all() and rows['full_price'].map(type).eq(str).all()
+    assert rows['vin'].str.len().eq(17).all() and rows['vin'].is_unique
+    assert (rows['url'].map(vin_from_url) == rows['vin']).all()
+
+
+def test_configured_counts():
+    dealers = synthetic_data.make_dealers(150, seed=2)
+    rows = synthetic_data.make_listings(10000, dealers=dealers, n_specs=30, duplicate_rate=0.1,
+                                        missing={'trim': 0.05}, error_rate=0.02, seed=2)
+    assert len(rows) == 10000
+    assert dealers['dealer_name'].is_unique
+    valid = rows[rows['error'].isna()]
+    assert abs(valid['vin'].duplicated().mean() - 0.1) < 0.02
+    assert abs(rows['error'].notna().mean() - 0.02) < 0.005
+    assert abs(valid['trim'].isna().mean() - 0.05) < 0.01
+    assert rows['error'].notna().sum() == rows['make'].isna().sum()  # Failed scrapes carry no listing fields
+    assert len(valid.groupby(['year', 'make', 'model', 'trim'], dropna=False)) <= 30 * 2  # Missing trim splits a spec
+    brand = dealers.set_index('dealer_name')['brand']
+    assert (valid['dealer_name'].map(brand) == valid['make']).all()  # Franchise dealers sell their own brand
+
+
+def test_same_seed_same_rows_and_column_subsets_agree():
+    a = synthetic_data.make_listings(3000, duplicate_rate=0.05, seed=3)
+    b = synthetic_data.make_listings(3000, duplicate_rate=0.05, seed=3)
+    pd.testing.assert_frame_equal(a, b)
+    subset = synthetic_data.make_listings(3000, duplicate_rate=0.05, columns=synthetic_data.RANKING_COLUMNS, seed=3)
+    pd.testing.assert_frame_equal(subset, a[synthetic_data.RANKING_COLUMNS])
+
+
+def test_prices_follow_spec_msrp_and_dealer_markup():
+    rows = synthetic_data.make_listings(20000, price_spread=0.02, dealer_markup=0.0, seed=4)
+    ratio = rows['full_price'].astype(float) / rows['msrp'].astype(float)
+    assert abs(ratio.median() - 1) < 0.005 and 0.015 < ratio.std() < 0.025
+    outliers = synthetic_data.make_listings(20000, price_spread=0.02, dealer_markup=0.0, outlier_rate=0.05, seed=4)
+    ratio = outliers['full_price'].astype(float) / outliers['msrp'].astype(float)
+    assert abs((abs(ratio - 1) > 0.12).mean() - 0.05) < 0.01
+
+
+def test_dedup_removes_the_generated_rescrapes():
+    from full_scraper import deduplicate_results
+    rows = synthetic_data.make_listings(5000, duplicate_rate=0.08, error_rate=0.01, seed=5)
+    with contextlib.redirect_stdout(io.StringIO()):
+        deduped = deduplicate_results(rows)
+    valid = deduped[deduped['error'].isna()]
+    assert valid['vin'].is_unique
+    assert len(valid) == rows.loc[rows['error'].isna(), 'vin'].nunique()
+
+
+def test_enrichment_cache_feeds_the_ranking():
+    dealers = synthetic_data.make_dealers(40, seed=6)
+    enrichment = synthetic_data.make_enrichment(dealers, seed=6)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'enrichment.db')
+        synthetic_data.write_enrichment_cache(enrichment, path)
+        cache = EnrichmentCache(path)
+        snapshot = cache.snapshot(dealers['dealer_name'])
+        stale = [cache.stale_fields(name) for name in dealers['dealer_name']]
+        cache.close()
+    assert snapshot[enrichment['dealer_name'].iat[0]]['address'] == enrichment['address'].iat[0]
+    rated = enrichment['google_rating'].notna()
+    assert all(not (s & {'rating', 'address'}) for s, r in zip(stale, rated) if r)
+    assert np.allclose([snapshot[n].get('driving_time_minutes', np.nan) for n in enrichment['dealer_name']],
+                       enrichment['driving_time_minutes'], equal_nan=True)
+
+    raw = synthetic_data.make_listings(2000, dealers=dealers, columns=synthetic_data.RANKING_COLUMNS, seed=6)
+    with contextlib.redirect_stdout(io.StringIO()):
+        stats = rank_dealers.compute_pricing_fairness(rank_dealers.normalize_data(raw))
+        ranked = rank_dealers.score_and_rank(stats.merge(enrichment, on='dealer_name', how='left'))
+    assert len(ranked) > 0 and (ranked['driving_time_minutes'] <= rank_dealers.DRIVING_TIME_CUTOFF).all()
+
+
+if __name__ == '__main__':
+    for name, fn in list(globals().items()):
+        if name.startswith('test_') and callable(fn):
+            fn()
+            print(f"✓ {name}")
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""Equivalence test: vectorized rank_dealers pipeline vs the original row-wise implementation."""
+
+import contextlib
+import io
+import numpy as np
+import pandas as pd
+
+import rank_dealers
+
+
+# --- Original row-wise implementation (kept here as the reference) ---
+
+def reference_normalize(df):
+    df = df.rename(columns={'full_price': 'price'})
+    df = df.dropna(subset=['dealer_name', 'price', 'year', 'make', 'model'])
+    df['trim'] = df.get('trim', '').fillna('')
+    df['spec_key'] = df.apply(
+        lambda row: f"{row['year']}|{row['make']}|{row['model']}|{row['trim']}" if row['trim']
+        else f"{row['year']}|{row['make']}|{row['model']}",
+        axis=1
+    )
+    df['price'] = pd.to_numeric(df['price'], errors='coerce')
+    return df.dropna(subset=['price'])
+
+
+def reference_pricing_fairness(df):
+    spec_medians = df.groupby('spec_key')['price'].median().to_dict()
+    df['spec_median_price'] = df['spec_key'].map(spec_medians)
+    df['rel_pct'] = (df['price'] - df['spec_median_price']) / df['spec_median_price']
+    dealer_stats = df.groupby('dealer_name').agg({
+        'price': 'count',
+        'spec_key': 'nunique',
+        'rel_pct': ['median', lambda x: (x < 0).sum() / len(x), lambda x: (x.abs() <= 0.01).sum() / len(x)]
+    }).reset_index()
+    dealer_stats.columns = ['dealer_name', 'listings', 'unique_specs', 'median_rel_pct',
+                            'pct_below_median', 'pct_within_1pct']
+
+    def calc_fairness_score(row):
+        clamped = max(-0.10, min(0.10, row['median_rel_pct']))
+        score = 50 - (clamped / 0.10) * 50
+        if row['listings'] < 3:
+            score *= 0.8
+        elif row['listings'] < 5:
+            score *= 0.9
+        return max(0, min(100, score))
+
+    dealer_stats['fairness_score'] = dealer_stats.apply(calc_fairness_score, axis=1)
+    return dealer_stats
+
+
+def reference_reviews_score(rating, review_count):
+    if rating is None:
+        return 0.0
+    rating_score = ((rating - 3.0) / (5.0 - 3.0)) * 100
+    return max(0, min(100, rating_score))
+
+
+def reference_proximity_score(driving_time_minutes):
+    if driving_time_minutes is None or pd.isna(driving_time_minutes):
+        return 50.0
+    if driving_time_minutes > rank_dealers.DRIVING_TIME_CUTOFF:
+        return 0.0
+    score = 100 - (driving_time_minutes / rank_dealers.DRIVING_TIME_CUTOFF) * 100
+    return max(0, min(100, score))
+
+
+def reference_inventory_score(listings, all_listings):
+    if len(all_listings) == 0:
+        return 50.0
+    min_listings = all_listings.min()
+    max_listings = all_listings.max()
+    if min_listings == max_listings:
+        return 50.0
+    score = ((listings - min_listings) / (max_listings - min_listings)) * 100
+    return max(0, min(100, score))
+
+
+def reference_score_and_rank(dealer_stats):
+    dealer_stats = dealer_stats.copy()
+    # The original passed NaN straight through, where max/min turned a missing rating into 100.
+    # The documented behaviour (and the vectorized code) is: no rating -> 0.
+    dealer_stats['reviews_score'] = dealer_stats.apply(
+        lambda row: reference_reviews_score(None if pd.isna(row['google_rating']) else row['google_rating'], None),
+        axis=1
+    )
+    dealer_stats['proximity_score'] = dealer_stats['driving_time_minutes'].apply(reference_proximity_score)
+    dealer_stats['inventory_score'] = dealer_stats['listings'].apply(
+        lambda x: reference_inventory_score(x, dealer_stats['listings'])
+    )
+    dealer_stats = dealer_stats[
+        (dealer_stats['driving_time_minutes'].notna()) &
+        (dealer_stats['driving_time_minutes'] <= rank_dealers.DRIVING_TIME_CUTOFF)
+    ].copy()
+    dealer_stats['composite_score'] = (
+        rank_dealers.WEIGHT_REVIEWS * dealer_stats['reviews_score'] +
+        rank_dealers.WEIGHT_FAIRNESS * dealer_stats['fairness_score'] +
+        rank_dealers.WEIGHT_PROXIMITY * dealer_stats['proximity_score'] +
+        rank_dealers.WEIGHT_INVENTORY * dealer_stats['inventory_score']
+    )
+    dealer_stats = dealer_stats.sort_values(
+        by=['composite_score', 'reviews_score', 'median_rel_pct', 'listings'],
+        ascending=[False, False, True, False]
+    ).reset_index(drop=True)
+    dealer_stats['rank'] = range(1, len(dealer_stats) + 1)
+    return dealer_stats
+
+
+# --- Tests ---
+
+def _synthetic(n_listings=5000, seed=7):
+    from synthetic_data import RANKING_COLUMNS, make_dealers, make_enrichment, make_listings
+    dealers = make_dealers(n_listings // 8, seed=seed)
+    # Missing required fields, like real scrapes
+    raw = make_listings(n_listings, dealers=dealers, missing={'dealer_name': 0.02, 'full_price': 0.02},
+                        columns=RANKING_COLUMNS, seed=seed)
+    enrichment = make_enrichment(dealers, seed=seed)[['dealer_name', 'google_rating', 'driving_time_minutes']]
+    return raw, enrichment
+
+
+def test_spec_key_matches_reference():
+    raw, _ = _synthetic()
+    with contextlib.redirect_stdout(io.StringIO()):
+        vec = rank_dealers.normalize_data(raw.copy())
+    ref = reference_normalize(raw.copy())
+    assert vec['spec_key'].tolist() == ref['spec_key'].tolist()
+
+
+def test_pricing_fairness_matches_reference():
+    raw, _ = _synthetic()
+    with contextlib.redirect_stdout(io.StringIO()):
+        vec = rank_dealers.compute_pricing_fairness(rank_dealers.normalize_data(raw.copy()))
+    ref = reference_pricing_fairness(reference_normalize(raw.copy()))
+    pd.testing.assert_frame_equal(vec, ref, check_dtype=False, check_exact=True)
+
+
+def test_scores_match_reference():
+    raw, enrichment = _synthetic()
+    with contextlib.redirect_stdout(io.StringIO()):
+        stats = rank_dealers.compute_pricing_fairness(rank_dealers.normalize_data(raw.copy()))
+        stats = stats.merge(enrichment, on='dealer_name', how='left')
+        vec = rank_dealers.score_and_rank(stats)
+    ref = reference_score_and_rank(stats)
+    pd.testing.assert_frame_equal(vec, ref, check_dtype=False, check_exact=True)
+
+
+def test_single_dealer_inventory_is_neutral():
+    stats = pd.DataFrame({
+        'dealer_name': ['A'], 'listings': [4], 'median_rel_pct': [0.0], 'fairness_score': [45.0],
+        'google_rating': [np.nan], 'driving_time_minutes': [12.0],
+    })
+    with contextlib.redirect_stdout(io.StringIO()):
+        ranked = rank_dealers.score_and_rank(stats)
+    assert ranked.loc[0, 'inventory_score'] == 50.0
+    assert ranked.loc[0, 'reviews_score'] == 0.0
+
+
+if __name__ == '__main__':
+    for name, fn in list(globals().items()):
+        if name.startswith('test_') and callable(fn):
+            fn()
+            print(f"✓ {name}")
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Tests for offline VIN validation/decoding: check digit, vectorized vs scalar, synthetic VINs, page text."""
+
+import numpy as np
+import pandas as pd
+
+import synthetic_data
+import vin_decoder
+
+
+def test_check_digit():
+    assert vin_decoder.is_valid_vin('1HGCM82633A004352') and vin_decoder.is_valid_vin('1hgcm82633a004352')
+    assert not vin_decoder.is_valid_vin('1HGCM82623A004352')  # One digit off
+    assert vin_decoder.is_valid_vin('1M8GDM9AXKP042788')  # Remainder 10 -> 'X'
+    for bad in [None, '', '1HGCM82633A00435', '1HGCM82633A0043521', '1HGCM82633A00435O', 12345]:
+        assert not vin_decoder.is_valid_vin(bad)
+    digits = vin_decoder.check_digits(pd.Series(['1HGCM82603A004352', 'TOO-SHORT']))
+    assert digits.iat[0] == '3' and pd.isna(digits.iat[1])
+
+
+def test_vectorized_matches_scalar():
+    rng = np.random.default_rng(3)
+    vins = synthetic_data.make_listings(3000, seed=3)['vin'].dropna()
+    chars = np.array(list(vin_decoder.TRANSLITERATION))
+    noise = [''.join(rng.choice(chars, 17)) for _ in range(3000)]  # ~1 in 11 passes by chance
+    values = pd.Series(list(vins) + noise + [None, 'ÄBCDEFGH123456789', ' 1HGCM82633A004352'], dtype=object)
+    valid = vin_decoder.valid_vins(values)
+    assert valid.tolist() == [vin_decoder.is_valid_vin(v) for v in values]
+    assert valid[:len(vins)].all() and 0 < valid[len(vins):].sum() < 600
+
+
+def test_decodes_synthetic_listings():
+    listings = synthetic_data.make_listings(5000, seed=4)
+    listings = listings[listings['vin'].notna()]
+    decoded = vin_decoder.decode_vins(listings['vin'])
+    assert decoded.index.equals(listings.index) and decoded['valid'].all()
+    assert (decoded['make'] == listings['make']).all()
+    assert (decoded['model_year'] == pd.to_numeric(listings['year']).astype('Int64')).all()
+    assert (decoded['country'].notna() & (decoded['serial'].str.len() == 6)).all()
+    assert vin_decoder.field_mismatches(listings).empty
+    wrong = listings.head(3).assign(make='Mazda')
+    assert len(vin_decoder.field_mismatches(wrong)) == (listings.head(3)['make'] != 'Mazda').sum()
+
+
+def test_decode_fields():
+    decoded = vin_decoder.decode_vin('1HGCM82633A004352')
+    assert decoded == {'vin': '1HGCM82633A004352', 'valid': True, 'wmi': '1HG', 'make': 'Honda',
+                       'country': 'United States', 'region': 'North America', 'model_year': 2003,
+                       'plant_code': 'A', 'plant': 'Marysville, OH', 'serial': '004352'}
+    invalid = vin_decoder.decode_vin('1HGCM82623A004352')
+    assert invalid['valid'] is False and all(v is None for k, v in invalid.items() if k != 'valid')
+
+
+def test_model_year_cycle():
+    def year(position_7, code):
+        vin = f'1HGCM8{position_7}30{code}A004352'
+        vin = vin[:8] + vin_decoder.check_digits(pd.Series([vin])).iat[0] + vin[9:]
+        return vin_decoder.decode_vin(vin)['model_year']
+    assert year('2', 'A') == 1980 and year('2', '3') == 2003  # Digit at position 7: 1980-2009
+    assert year('A', 'A') == 2010 and year('A', 'T') == 2026  # Letter: 2010-2039
+    assert year('A', 'Y') == 2030 - 30 * (vin_decoder.MAX_MODEL_YEAR < 2030)  # Too far ahead -> previous cycle
+
+
+def test_find_vin_skips_false_matches():
+    text = 'Part no. ABCDEFGH123456789 | VIN 1HGCM82633A004352 | Stock S123'
+    assert vin_decoder.VIN_PATTERN.search(text).group(1) == 'ABCDEFGH123456789'
+    assert vin_decoder.find_vin(text) == '1HGCM82633A004352'
+    assert vin_decoder.find_vin('no vin here') is None and vin_decoder.find_vin(None) is None
+
+
+def test_decode_listing_urls():
+    urls = pd.Series(['https://www.truecar.com/new-cars-for-sale/listing/1hgcm82633a004352/2003-honda-accord/',
+                      'https://www.truecar.com/new-cars-for-sale/listing/1HGCM82623A004352/',
+                      'https://www.truecar.com/overview/'])
+    decoded = vin_decoder.decode_listing_urls(urls)
+    assert decoded['valid'].tolist() == [True, False, False]
+    assert decoded.at[0, 'make'] == 'Honda' and decoded.at[0, 'model_year'] == 2003
+
+
+if __name__ == '__main__':
+    for name, fn in list(globals().items()):
+        if name.startswith('test_') and callable(fn):
+            fn()
+            print(f"✓ {name}")
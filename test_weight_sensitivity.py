@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""Tests for the weight-sensitivity mode: matrix ranks vs re-running score_and_rank per weight vector."""
+
+import contextlib
+import io
+import numpy as np
+import pandas as pd
+
+import rank_dealers
+from test_multi_origin import _dealer_stats
+
+
+def _ranked():
+    with contextlib.redirect_stdout(io.StringIO()):
+        return rank_dealers.score_and_rank(_dealer_stats())
+
+
+def _reference_ranks(ranked, w):
+    """Rank under weights w exactly as score_and_rank sorts."""
+    stats = ranked.assign(composite_score=(
+        w[0] * ranked['reviews_score'] + w[1] * ranked['fairness_score'] +
+        w[2] * ranked['proximity_score'] + w[3] * ranked['inventory_score']
+    ))
+    stats = stats.sort_values(
+        by=['composite_score', 'reviews_score', 'median_rel_pct', 'listings'],
+        ascending=[False, False, True, False]
+    )
+    return pd.Series(np.arange(1, len(stats) + 1), index=stats['dealer_name'])
+
+
+def test_ranks_match_score_and_rank_order():
+    ranked = _ranked()
+    weights = np.vstack([rank_dealers.sample_weight_vectors(3, seed=4), [[1, 0, 0, 0], [0, 0, 0, 1]]])
+    for w in weights:
+        stability, _ = rank_dealers.weight_sensitivity(ranked, w[None, :])
+        got = stability.set_index('dealer_name')['best_rank']
+        expected = _reference_ranks(ranked, w)
+        assert (got.reindex(expected.index) == expected).all()
+
+
+def test_current_weights_reproduce_base_ranking():
+    ranked = _ranked()
+    base = [[rank_dealers.WEIGHT_REVIEWS, rank_dealers.WEIGHT_FAIRNESS,
+             rank_dealers.WEIGHT_PROXIMITY, rank_dealers.WEIGHT_INVENTORY]]
+    stability, same_top = rank_dealers.weight_sensitivity(ranked, base)
+    assert same_top == 1.0
+    assert (stability['best_rank'] == stability['base_rank']).all()
+    assert set(stability.loc[stability['top5_pct'] == 100, 'base_rank']) == {1, 2, 3, 4, 5}
+
+
+def test_weight_grid_is_on_the_simplex():
+    grid = rank_dealers.weight_grid(0.1)
+    assert len(grid) == 286  # C(13, 3)
+    assert np.allclose(grid.sum(axis=1), 1) and (grid >= 0).all()
+    samples = rank_dealers.sample_weight_vectors(1000)
+    assert np.allclose(samples.sum(axis=1), 1)
+
+
+def test_tens_of_thousands_of_weight_vectors():
+    # Timing lives in benchmark_ranking.py --sensitivity; this checks the chunked accumulation
+    ranked = _ranked()
+    weights = rank_dealers.sample_weight_vectors(20000)
+    stability, same_top = rank_dealers.weight_sensitivity(ranked, weights)
+    assert len(stability) == len(ranked) and 0 <= same_top <= 1
+    assert (stability['best_rank'] <= stability['rank_p5']).all()
+    assert (stability['rank_p5'] <= stability['rank_p95']).all() and (stability['rank_p95'] <= stability['worst_rank']).all()
+    assert np.isclose(stability['top5_pct'].sum(), 500)  # Every weight vector has a top 5
+
+
+if __name__ == '__main__':
+    for name, fn in list(globals().items()):
+        if name.startswith('test_') and callable(fn):
+            fn()
+            print(f"✓ {name}")
@@ -1,21 +1,20 @@
 #!/usr/bin/env python3
 """Verify scraper results quality."""
-import pandas as pd
-from pathlib import Path
+from results_store import RESULTS_DB, load_results, resolve_results_path
 
 def verify_results():
     """Verify the scraper results."""
-    output_file = 'scraped_car_data.xlsx'
+    output_file = resolve_results_path()
     
-    if not Path(output_file).exists():
-        print(f"ERROR: {output_file} not found!")
+    if output_file is None:
+        print(f"ERROR: {RESULTS_DB} not found!")
         return
     
     print("="*80)
     print("SCRAPER RESULTS VERIFICATION")
     print("="*80)
     
-    df = pd.read_excel(output_file)
+    df = load_results(output_file)
     
     print(f"\n1. BASIC STATS")
     print(f"   Total records: {len(df)}")